@@ -1,3 +1,5 @@
+from itertools import accumulate
+
 horarios = {
     'María':  ('08', '16'),
     'Juan':   ('09', '17'),
@@ -18,6 +20,38 @@ def mostrar_registros():
         print(f"{i}. {nombre} -> Entrada: {entrada}h | Salida: {salida}h")
     print()
 
+_entradas_acumuladas = None  # (horarios, sus valores, acumulado) de la última llamada
+
+
+def entradas_acumuladas(registros=None):
+    """
+    Devuelve el histograma acumulado de horas de entrada de registros (por
+    defecto, horarios): acumuladas[h] = empleados que entran a las h o antes.
+    Se guarda junto con los horarios de los que sale y solo se rehace si se
+    pasan otros o si han cambiado, así cada consulta es una lectura de la lista.
+    """
+    global _entradas_acumuladas
+    if registros is None:
+        registros = horarios
+    valores = tuple(registros.values())
+    if (_entradas_acumuladas is None or _entradas_acumuladas[0] is not registros
+            or _entradas_acumuladas[1] != valores):
+        histograma = [0] * 24
+        for entrada, _ in valores:
+            histograma[min(max(int(entrada), 0), 23)] += 1
+        _entradas_acumuladas = (registros, valores, list(accumulate(histograma)))
+    return _entradas_acumuladas[2]
+
+
+def contar_entradas_lote(horas):
+    """
+    Devuelve, para cada hora de la lista, cuántos empleados entraron
+    antes o a esa hora.
+    """
+    acumuladas = entradas_acumuladas()
+    return [acumuladas[min(h, 23)] if h >= 0 else 0 for h in horas]
+
+
 def contar_entradas():
     """
     Solicita una hora al usuario y cuenta cuántas personas
@@ -32,10 +66,7 @@ def contar_entradas():
         print("Debes introducir un número entero válido.\n")
         return
 
-    contador = 0
-    for nombre, (entrada, _) in horarios.items():
-        if int(entrada) <= hora_ref:
-            contador += 1
+    contador = entradas_acumuladas()[hora_ref]
 
     print(f"{contador} empleados entraron antes o a las {hora_ref}h.\n")
  
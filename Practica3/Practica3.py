@@ -1,15 +1,80 @@
 import csv
+import glob
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+import unicodedata
+from enum import IntEnum
+from itertools import accumulate
+
+# exportacion.py, en la raíz del repositorio, escribe los informes de forma atómica
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import exportacion
 
 # ============================================================
 # 1. Clase RegistroHorario
 # ============================================================
+# Nombres de los días cuando un registro se crea a partir de un Dia; los
+# leídos de un CSV conservan la grafía del fichero ("Sabado", "Sábado"...)
+NOMBRES_DIAS = ('Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo')
+_DIAS_POR_TEXTO = {}  # Texto ya visto -> Dia (en un fichero hay pocas grafías distintas)
+
+
+class Dia(IntEnum):
+    """Día de la semana (7 valores); se admite el nombre con o sin tilde."""
+    LUNES = 0
+    MARTES = 1
+    MIERCOLES = 2
+    JUEVES = 3
+    VIERNES = 4
+    SABADO = 5
+    DOMINGO = 6
+
+    @property
+    def nombre(self) -> str:
+        return NOMBRES_DIAS[self]
+
+    @classmethod
+    def desde_texto(cls, texto: str) -> "Dia":
+        """Convierte 'Lunes', 'miércoles', 'SÁBADO'... en un Dia (ValueError si no es un día)."""
+        dia = _DIAS_POR_TEXTO.get(texto)
+        if dia is not None:
+            return dia
+        sin_tildes = unicodedata.normalize('NFKD', texto.strip()).encode('ascii', 'ignore').decode()
+        try:
+            dia = _DIAS_POR_TEXTO[texto] = cls[sin_tildes.upper()]
+        except KeyError:
+            raise ValueError(f"Día no válido: {texto!r}") from None
+        return dia
+
+
 class RegistroHorario:
-    def __init__(self, empleado: str, dia: str, entrada: int, salida: int):
-        self.empleado = empleado
-        self.dia = dia
+    """Un turno de un empleado.
+
+    Usa __slots__ (sin __dict__ por instancia) y el nombre del empleado y el
+    del día se internan para que todos los turnos compartan las mismas
+    cadenas. r.dia es el día tal como venía en el fichero; se comprueba que
+    sea un día válido y r.dia_semana da su Dia para comparar.
+    """
+    __slots__ = ('empleado', 'dia', 'entrada', 'salida')
+
+    def __init__(self, empleado: str, dia, entrada: int, salida: int):
+        self.empleado = sys.intern(empleado)
+        if isinstance(dia, Dia):
+            self.dia = dia.nombre
+        else:
+            Dia.desde_texto(dia)  # ValueError si no es un día
+            self.dia = sys.intern(dia)
         self.entrada = entrada
         self.salida = salida
 
+    @property
+    def dia_semana(self) -> Dia:
+        return Dia.desde_texto(self.dia)
+
     def duracion(self) -> int:
         """Devuelve la cantidad de horas trabajadas en este registro"""
         return self.salida - self.entrada
@@ -19,24 +84,479 @@ class RegistroHorario:
 # 2. Funciones principales
 # ============================================================
 
-def leer_csv(nombre_archivo='horarios.csv'):
-    """Lee el archivo CSV y crea una lista de objetos RegistroHorario"""
-    registros = []
+FICHERO_HORARIOS = 'horarios.csv'
+PROGRESO_CADA = 100_000   # filas entre dos líneas de progreso
+
+
+def expandir_rutas(rutas):
+    """
+    Convierte un nombre, un patrón glob (p. ej. 'horarios_2024-*.csv') o una
+    lista de ellos en la lista ordenada de ficheros a leer. Un patrón sin
+    coincidencias se conserva tal cual para avisar luego de que no existe.
+    """
+    if isinstance(rutas, (str, os.PathLike)):
+        rutas = [rutas]
+    ficheros = []
+    for ruta in rutas:
+        ruta = os.fspath(ruta)
+        coincidencias = sorted(glob.glob(ruta)) if glob.has_magic(ruta) else []
+        ficheros.extend(coincidencias or [ruta])
+    return ficheros
+
+
+def huella_entrada(rutas, *parametros):
+    """Huella de los ficheros de entrada (tamaño y fecha, sin leerlos) y de los parámetros.
+
+    Se toma antes de leer; los informes generados con la misma huella no se
+    vuelven a escribir (ver exportacion).
+    """
+    return exportacion.huella(exportacion.huella_ficheros(expandir_rutas(rutas)), *parametros)
+
+
+class ContadoresLectura:
+    """Contadores de una lectura en streaming (ficheros, filas, descartes)."""
+    def __init__(self):
+        self.ficheros = 0
+        self.no_encontrados = []
+        self.registros = 0
+        self.descartadas = 0
+        self.segundos = 0.0
+
+    def resumen(self):
+        texto = f"Se han leído {self.registros} registros correctamente"
+        if self.ficheros > 1:
+            texto += f" de {self.ficheros} ficheros"
+        if self.descartadas:
+            texto += f" ({self.descartadas} filas mal formadas descartadas)"
+        return texto + "."
+
+
+def _fila_a_registro(fila):
+    """Devuelve el RegistroHorario de una fila o None si está mal formada."""
+    if len(fila) != 4:
+        return None
+    nombre, dia, h_entrada, h_salida = fila
     try:
-        with open(nombre_archivo, newline='', encoding='utf-8') as f:
+        return RegistroHorario(nombre, dia, int(h_entrada), int(h_salida))
+    except ValueError:
+        return None
+
+
+def iter_registros(rutas=FICHERO_HORARIOS, contadores=None, progreso=True):
+    """
+    Genera los RegistroHorario de uno o varios CSV sin guardarlos en memoria.
+
+    rutas admite lo mismo que expandir_rutas. Las filas mal formadas (número
+    de columnas incorrecto, horas no numéricas o día desconocido) se cuentan
+    en contadores.descartadas y se saltan. Con progreso=True se informa cada
+    PROGRESO_CADA filas y al terminar cada fichero, con su ritmo en filas/s.
+    """
+    if contadores is None:
+        contadores = ContadoresLectura()
+    for ruta in expandir_rutas(rutas):
+        try:
+            f = open(ruta, newline='', encoding='utf-8')
+        except FileNotFoundError:
+            contadores.no_encontrados.append(ruta)
+            print(f"❌ No se encontró el archivo {ruta}.\n")
+            continue
+        inicio = time.perf_counter()
+        leidos = descartadas = 0
+        with f:
             lector = csv.reader(f, delimiter=';', quotechar='"')
             next(lector, None)  # Saltar cabecera si existe
             for fila in lector:
-                nombre, dia, h_entrada, h_salida = fila
-                entrada = int(h_entrada)
-                salida = int(h_salida)
-                registros.append(RegistroHorario(nombre, dia, entrada, salida))
-        print(f"Se han leído {len(registros)} registros correctamente.\n")
-    except FileNotFoundError:
-        print("❌ No se encontró el archivo horarios.csv.\n")
+                registro = _fila_a_registro(fila)
+                if registro is None:
+                    descartadas += 1
+                    continue
+                leidos += 1
+                if progreso and leidos % PROGRESO_CADA == 0:
+                    ritmo = leidos / max(time.perf_counter() - inicio, 1e-9)
+                    print(f"  {ruta}: {leidos} filas ({ritmo:,.0f} filas/s)", flush=True)
+                yield registro
+        segundos = time.perf_counter() - inicio
+        contadores.ficheros += 1
+        contadores.registros += leidos
+        contadores.descartadas += descartadas
+        contadores.segundos += segundos
+        if progreso and (leidos >= PROGRESO_CADA or contadores.ficheros > 1 or descartadas):
+            ritmo = leidos / max(segundos, 1e-9)
+            print(f"  {ruta}: {leidos} registros, {descartadas} descartadas "
+                  f"en {segundos:.2f} s ({ritmo:,.0f} filas/s)", flush=True)
+
+
+def leer_csv(nombre_archivo=FICHERO_HORARIOS, contadores=None):
+    """Lee uno o varios CSV (admite patrones glob) y crea una lista de objetos RegistroHorario"""
+    if contadores is None:
+        contadores = ContadoresLectura()
+    registros = list(iter_registros(nombre_archivo, contadores))
+    if contadores.ficheros:
+        print(contadores.resumen() + "\n")
     return registros
 
 
+class IndiceDias:
+    """Índice de bits por día para consultar qué empleados trabajaron qué días.
+
+    Cada empleado recibe un id denso (su posición de aparición) y cada día es
+    un conjunto de bits sobre esos ids. Mientras se carga, cada día es un
+    bytearray (marcar un bit es O(1)); al consultar se convierte a un entero
+    de Python, de modo que &, |, - y ~ operan palabra a palabra en C.
+
+    Expresiones admitidas (ver consultar):
+        Lunes & Viernes
+        Lunes & Martes & Miercoles & ~Viernes
+        almenos(3, Lunes, Martes, Miercoles, Jueves, Viernes)
+        (Sabado | Domingo) - Lunes
+        todos                      (todos los empleados)
+    """
+    _TOKEN = re.compile(r"\s*(\d+|\w+|[&|~(),-])", re.UNICODE)
+
+    def __init__(self):
+        self.ids = {}                               # empleado -> id denso
+        self.empleados = []                         # id -> empleado
+        self._marcas = [bytearray() for _ in Dia]   # un bit por empleado y día
+        self._cache = None
+
+    @classmethod
+    def desde_empleados_por_dia(cls, empleados_por_dia):
+        indice = cls()
+        for dia, empleados in empleados_por_dia.items():
+            d = Dia.desde_texto(dia)
+            for empleado in empleados:
+                indice.agregar(empleado, d)
+        return indice
+
+    def agregar(self, empleado: str, dia: Dia):
+        i = self.ids.get(empleado)
+        if i is None:
+            i = self.ids[empleado] = len(self.empleados)
+            self.empleados.append(empleado)
+        marcas = self._marcas[dia]
+        byte = i >> 3
+        if byte >= len(marcas):
+            marcas.extend(bytes(byte + 1 - len(marcas)))
+        marcas[byte] |= 1 << (i & 7)
+        self._cache = None
+
+    def bits(self, dia: Dia) -> int:
+        """Conjunto de empleados de un día como entero (bit i = empleado i)."""
+        if self._cache is None:
+            self._cache = [int.from_bytes(m, 'little') for m in self._marcas]
+        return self._cache[dia]
+
+    def universo(self) -> int:
+        return (1 << len(self.empleados)) - 1
+
+    def hay_datos(self, dia: Dia) -> bool:
+        return self.bits(dia) != 0
+
+    def miembros(self, bits: int):
+        """Empleados cuyos bits están activos, en orden de aparición."""
+        resultado = []
+        base = 0
+        while bits:
+            palabra = bits & 0xFFFFFFFFFFFFFFFF
+            while palabra:
+                bajo = palabra & -palabra
+                resultado.append(self.empleados[base + bajo.bit_length() - 1])
+                palabra ^= bajo
+            bits >>= 64
+            base += 64
+        return resultado
+
+    # --- Evaluación de expresiones ---
+    def consultar(self, expresion: str) -> int:
+        """Evalúa una expresión de días y devuelve el conjunto de bits resultante."""
+        self._tokens = self._tokenizar(expresion)
+        self._pos = 0
+        resultado = self._union()
+        if self._pos != len(self._tokens):
+            raise ValueError(f"Sobra '{self._tokens[self._pos]}' en la expresión")
+        return resultado
+
+    def _tokenizar(self, expresion):
+        tokens, pos = [], 0
+        expresion = expresion.strip()
+        while pos < len(expresion):
+            m = self._TOKEN.match(expresion, pos)
+            if not m:
+                raise ValueError(f"Carácter no válido en la expresión: {expresion[pos]!r}")
+            tokens.append(m.group(1))
+            pos = m.end()
+        return tokens
+
+    def _siguiente(self):
+        return self._tokens[self._pos] if self._pos < len(self._tokens) else None
+
+    def _esperar(self, token):
+        if self._siguiente() != token:
+            raise ValueError(f"Se esperaba '{token}' en la expresión")
+        self._pos += 1
+
+    def _union(self) -> int:
+        bits = self._interseccion()
+        while self._siguiente() == '|':
+            self._pos += 1
+            bits |= self._interseccion()
+        return bits
+
+    def _interseccion(self) -> int:
+        bits = self._unario()
+        while self._siguiente() in ('&', '-'):
+            op = self._tokens[self._pos]
+            self._pos += 1
+            otro = self._unario()
+            bits = bits & otro if op == '&' else bits & ~otro
+        return bits
+
+    def _unario(self) -> int:
+        if self._siguiente() == '~':
+            self._pos += 1
+            return self.universo() & ~self._unario()
+        return self._atomo()
+
+    def _atomo(self) -> int:
+        token = self._siguiente()
+        if token is None:
+            raise ValueError("Expresión incompleta")
+        self._pos += 1
+        if token == '(':
+            bits = self._union()
+            self._esperar(')')
+            return bits
+        if token.lower() == 'todos':
+            return self.universo()
+        if token.lower() == 'almenos':
+            self._esperar('(')
+            n = self._siguiente()
+            if n is None or not n.isdigit():
+                raise ValueError("almenos necesita un número como primer argumento")
+            self._pos += 1
+            conjuntos = []
+            while self._siguiente() == ',':
+                self._pos += 1
+                conjuntos.append(self._union())
+            self._esperar(')')
+            return self._al_menos(int(n), conjuntos)
+        return self.bits(Dia.desde_texto(token))
+
+    def _al_menos(self, n: int, conjuntos) -> int:
+        """Empleados presentes en al menos n de los conjuntos (contador por bits)."""
+        if n <= 0:
+            return self.universo()
+        # al_menos[j] = empleados que están en j o más de los conjuntos vistos
+        al_menos = [self.universo()] + [0] * n
+        for bits in conjuntos:
+            for j in range(n, 0, -1):
+                al_menos[j] |= al_menos[j - 1] & bits
+        return al_menos[n]
+
+    def exportar_csv(self, expresion: str, nombre_archivo: str, huella=None, compresion=None) -> int:
+        """Escribe en un CSV los empleados que cumplen la expresión; devuelve cuántos son."""
+        empleados = self.miembros(self.consultar(expresion))
+        exportacion.escribir_csv(nombre_archivo, ['Empleado'], ([empleado] for empleado in empleados),
+                                 compresion=compresion, huella_actual=huella)
+        return len(empleados)
+
+
+class IndiceHoras:
+    """Histograma de horas de entrada y salida con recuentos acumulados.
+
+    Tras una pasada de construcción, cualquier consulta por umbral, rango o
+    "presentes a la hora T" cuesta O(1). Las horas del CSV son enteras, así
+    que la resolución es de una hora (0-24).
+    """
+    HORAS = 25  # 0..24 (una salida a las 24 es fin de jornada)
+
+    def __init__(self):
+        self.hist_entradas = [0] * self.HORAS
+        self.hist_salidas = [0] * self.HORAS
+        self._acum = None
+
+    @classmethod
+    def desde_registros(cls, registros):
+        indice = cls()
+        for r in registros:
+            indice.agregar(r.entrada, r.salida)
+        return indice
+
+    def agregar(self, entrada: int, salida: int):
+        self.hist_entradas[self._hora(entrada)] += 1
+        self.hist_salidas[self._hora(salida)] += 1
+        self._acum = None
+
+    def _hora(self, h: int) -> int:
+        return min(max(h, 0), self.HORAS - 1)
+
+    def _acumulados(self):
+        # acum[h] = nº de registros con hora <= h
+        if self._acum is None:
+            self._acum = (list(accumulate(self.hist_entradas)), list(accumulate(self.hist_salidas)))
+        return self._acum
+
+    def entradas_hasta(self, hora: int) -> int:
+        """Registros con entrada a la hora indicada o antes."""
+        if hora < 0:
+            return 0
+        return self._acumulados()[0][self._hora(hora)]
+
+    def entradas_antes_de(self, hora: int) -> int:
+        """Registros con entrada estrictamente anterior a la hora."""
+        return self.entradas_hasta(hora - 1)
+
+    def entradas_entre(self, desde: int, hasta: int) -> int:
+        """Registros con entrada en [desde, hasta]."""
+        return max(0, self.entradas_hasta(hasta) - self.entradas_hasta(desde - 1))
+
+    def salidas_hasta(self, hora: int) -> int:
+        if hora < 0:
+            return 0
+        return self._acumulados()[1][self._hora(hora)]
+
+    def presentes_a(self, hora: int) -> int:
+        """Registros con entrada <= hora < salida (turnos con salida posterior a la entrada)."""
+        return self.entradas_hasta(hora) - self.salidas_hasta(hora)
+
+    def entradas_hasta_lote(self, horas):
+        """Responde muchos umbrales de una vez (p. ej. para un panel de turnos)."""
+        acum = self._acumulados()[0]
+        return [acum[self._hora(h)] if h >= 0 else 0 for h in horas]
+
+    def presentes_lote(self, horas):
+        entradas, salidas = self._acumulados()
+        return [entradas[self._hora(h)] - salidas[self._hora(h)] if h >= 0 else 0 for h in horas]
+
+
+class AgregadorHorarios:
+    """Calcula en una sola pasada los datos de todos los informes.
+
+    Recorre los registros una vez (sirve cualquier iterable, también un
+    generador) y llama a duracion() una sola vez por registro. Después cada
+    método escribir_* genera su CSV a partir de lo acumulado.
+
+    Lo acumulado crece con el número de empleados, no con el de filas: las
+    filas de madrugadores, las únicas que se guardan una a una, van a un
+    fichero temporal que solo pasa a disco si supera MAX_MEMORIA_MADRUGADORES.
+
+    Los CSV se escriben con exportacion (temporal + renombrado). Con huella
+    (ver huella_entrada) no se reescriben los que ya se generaron con los
+    mismos datos; con compresion se escriben comprimidos.
+
+    informes indica qué CSV se van a escribir y solo se acumula lo que
+    necesitan; con consultas=True se guardan además empleados_por_dia e
+    indice_horas para las consultas del menú. Se usa con with (o cerrar())
+    para liberar el fichero temporal.
+    """
+    MAX_MEMORIA_MADRUGADORES = 1 << 20
+    INFORMES = ('resumen_horarios.csv', 'madrugadores.csv', 'en_dos_dias.csv', 'resumen_semanal.csv')
+
+    def __init__(self, hora_referencia=8, huella=None, compresion=None, informes=INFORMES, consultas=True):
+        self.hora_referencia = hora_referencia
+        self.huella = huella
+        self.compresion = compresion
+        self.informes = informes
+        # Lo que no hace falta se queda en None y agregar() no lo toca
+        self.empleados_por_dia = {} if consultas else None           # dia -> set(empleados)
+        self.horas_totales = ({} if 'resumen_horarios.csv' in informes or 'resumen_semanal.csv' in informes
+                              else None)                               # empleado -> horas
+        self.dias_por_empleado = {} if 'resumen_semanal.csv' in informes else None  # empleado -> set(dias)
+        self.con_madrugadores = 'madrugadores.csv' in informes
+        self.madrugadores = 0           # filas (empleado, entrada) en _madrugadores
+        self._madrugadores = None       # fichero temporal, se crea con la primera fila
+        self._escritor_madrugadores = None
+        self.indice_dias = IndiceDias() if 'en_dos_dias.csv' in informes else None
+        self.indice_horas = IndiceHoras() if consultas else None
+        self.registros = 0
+
+    @classmethod
+    def desde_empleados_por_dia(cls, empleados_por_dia, huella=None, compresion=None):
+        """Agregador solo para en_dos_dias.csv a partir de lo que ya mostró la opción 2."""
+        agregador = cls(huella=huella, compresion=compresion, informes=('en_dos_dias.csv',), consultas=False)
+        agregador.indice_dias = IndiceDias.desde_empleados_por_dia(empleados_por_dia)
+        return agregador
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def cerrar(self):
+        """Libera el fichero temporal de madrugadores (lo acumulado sigue disponible)."""
+        if self._madrugadores is not None:
+            self._madrugadores.close()
+
+    def _fila_madrugador(self, empleado, entrada):
+        if self._escritor_madrugadores is None:
+            self._madrugadores = tempfile.SpooledTemporaryFile(
+                self.MAX_MEMORIA_MADRUGADORES, mode='w+', newline='', encoding='utf-8')
+            self._escritor_madrugadores = csv.writer(self._madrugadores, delimiter=';')
+        self._escritor_madrugadores.writerow((empleado, entrada))
+        self.madrugadores += 1
+
+    def agregar(self, registro):
+        empleado = registro.empleado
+        if self.empleados_por_dia is not None:
+            self.empleados_por_dia.setdefault(registro.dia, set()).add(empleado)
+        if self.horas_totales is not None:
+            self.horas_totales[empleado] = self.horas_totales.get(empleado, 0) + registro.duracion()
+        if self.dias_por_empleado is not None:
+            self.dias_por_empleado.setdefault(empleado, set()).add(registro.dia)
+        if self.indice_dias is not None:
+            self.indice_dias.agregar(empleado, registro.dia_semana)
+        if self.indice_horas is not None:
+            self.indice_horas.agregar(registro.entrada, registro.salida)
+        if self.con_madrugadores and registro.entrada < self.hora_referencia:
+            self._fila_madrugador(empleado, registro.entrada)
+        self.registros += 1
+
+    def agregar_todos(self, registros):
+        for registro in registros:
+            self.agregar(registro)
+        return self
+
+    def _huella(self, nombre_archivo):
+        if self.huella is None:
+            return None
+        return exportacion.huella(self.huella, os.path.basename(nombre_archivo), self.hora_referencia)
+
+    def al_dia(self, nombres=INFORMES):
+        """True si todos los informes ya se generaron con la misma huella."""
+        return all(exportacion.informe_vigente(nombre, self._huella(nombre), self.compresion) for nombre in nombres)
+
+    def escribir_resumen_horarios(self, nombre_archivo='resumen_horarios.csv'):
+        exportacion.escribir_csv(nombre_archivo, ['Empleado', 'Horas totales'], self.horas_totales.items(),
+                                 quotechar='"', quoting=csv.QUOTE_MINIMAL,
+                                 compresion=self.compresion, huella_actual=self._huella(nombre_archivo))
+
+    def escribir_madrugadores(self, nombre_archivo='madrugadores.csv'):
+        huella = self._huella(nombre_archivo)
+        if exportacion.informe_vigente(nombre_archivo, huella, self.compresion):
+            return
+        with exportacion.abrir_atomico(nombre_archivo, self.compresion, huella) as f:
+            escritor = csv.writer(f, delimiter=';')
+            escritor.writerow(['Empleado', 'Hora entrada'])
+            if self._madrugadores is not None:
+                self._madrugadores.seek(0)
+                shutil.copyfileobj(self._madrugadores, f)
+                self._madrugadores.seek(0, os.SEEK_END)
+
+    def escribir_en_dos_dias(self, nombre_archivo='en_dos_dias.csv'):
+        """Devuelve False si no hay datos de Lunes o Viernes."""
+        if not self.indice_dias.hay_datos(Dia.LUNES) or not self.indice_dias.hay_datos(Dia.VIERNES):
+            return False
+        self.indice_dias.exportar_csv('Lunes & Viernes', nombre_archivo, self._huella(nombre_archivo), self.compresion)
+        return True
+
+    def escribir_resumen_semanal(self, nombre_archivo='resumen_semanal.csv'):
+        exportacion.escribir_csv(nombre_archivo, ['Empleado', 'Dias trabajados', 'Horas totales'],
+                                 ([empleado, len(dias), self.horas_totales[empleado]]
+                                  for empleado, dias in self.dias_por_empleado.items()),
+                                 compresion=self.compresion, huella_actual=self._huella(nombre_archivo))
+
+
 def mostrar_empleados_por_dia(registros):
     """Muestra los empleados que trabajaron cada día"""
     empleados_por_dia = {}
@@ -50,86 +570,108 @@ def mostrar_empleados_por_dia(registros):
     return empleados_por_dia
 
 
-def generar_resumen_horarios(registros):
+def generar_resumen_horarios(registros, huella=None):
     """Genera el archivo resumen_horarios.csv"""
-    horas_totales = {}
-    for registro in registros:
-        horas_totales.setdefault(registro.empleado, 0)
-        horas_totales[registro.empleado] += registro.duracion()
-
-    with open('resumen_horarios.csv', 'w', newline='', encoding='utf-8') as f:
-        escritor = csv.writer(f, delimiter=';', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-        escritor.writerow(['Empleado', 'Horas totales'])
-        for empleado, total in horas_totales.items():
-            escritor.writerow([empleado, total])
+    with AgregadorHorarios(huella=huella, informes=('resumen_horarios.csv',), consultas=False) as agregador:
+        agregador.agregar_todos(registros).escribir_resumen_horarios()
     print("Archivo 'resumen_horarios.csv' generado correctamente.\n")
 
 
-def empleados_madrugadores(registros, hora_referencia=8):
+def empleados_madrugadores(registros, hora_referencia=8, huella=None):
     """Crea un archivo con empleados que comienzan antes de cierta hora"""
-    madrugadores = {r.empleado for r in registros if r.entrada < hora_referencia}
-    with open('madrugadores.csv', 'w', newline='', encoding='utf-8') as f:
-        escritor = csv.writer(f, delimiter=';')
-        escritor.writerow(['Empleado', 'Hora entrada'])
-        for r in registros:
-            if r.empleado in madrugadores and r.entrada < hora_referencia:
-                escritor.writerow([r.empleado, r.entrada])
+    with AgregadorHorarios(hora_referencia, huella, informes=('madrugadores.csv',), consultas=False) as agregador:
+        agregador.agregar_todos(registros).escribir_madrugadores()
     print("Archivo 'madrugadores.csv' creado.\n")
 
 
-def empleados_en_dos_dias(empleados_por_dia):
+def empleados_en_dos_dias(empleados_por_dia, huella=None):
     """Genera el archivo con empleados que trabajaron lunes y viernes"""
-    if 'Lunes' in empleados_por_dia and 'Viernes' in empleados_por_dia:
-        en_dos_dias = empleados_por_dia['Lunes'] & empleados_por_dia['Viernes']
-        with open('en_dos_dias.csv', 'w', newline='', encoding='utf-8') as f:
-            escritor = csv.writer(f, delimiter=';')
-            escritor.writerow(['Empleado'])
-            for empleado in en_dos_dias:
-                escritor.writerow([empleado])
+    agregador = AgregadorHorarios.desde_empleados_por_dia(empleados_por_dia, huella)
+    if agregador.escribir_en_dos_dias():
         print("Archivo 'en_dos_dias.csv' creado.\n")
     else:
         print("No hay datos de Lunes o Viernes.\n")
 
 
-def resumen_semanal(registros):
+def consultar_horas(indice_horas):
+    """Pide una hora y muestra cuántos turnos habían empezado y cuántos seguían activos"""
+    try:
+        hora = int(input("Hora (0-24): ").strip())
+    except ValueError:
+        print("Debes introducir un número entero válido.\n")
+        return
+    print(f"Turnos con entrada a las {hora}h o antes: {indice_horas.entradas_hasta(hora)}")
+    print(f"Turnos activos a las {hora}h: {indice_horas.presentes_a(hora)}\n")
+
+
+def consultar_dias(indice_dias, expresion, nombre_archivo='consulta_dias.csv'):
+    """Exporta los empleados que cumplen una expresión de días (ver IndiceDias)"""
+    try:
+        n = indice_dias.exportar_csv(expresion, nombre_archivo)
+    except ValueError as e:
+        print(f"Expresión no válida: {e}\n")
+        return
+    print(f"{n} empleados cumplen '{expresion}'. Archivo '{nombre_archivo}' creado.\n")
+
+
+def resumen_semanal(registros, huella=None):
     """Genera el archivo resumen_semanal.csv con días y horas totales"""
-    resumen = {}
-    for r in registros:
-        if r.empleado not in resumen:
-            resumen[r.empleado] = {'dias': set(), 'horas': 0}
-        resumen[r.empleado]['dias'].add(r.dia)
-        resumen[r.empleado]['horas'] += r.duracion()
-
-    with open('resumen_semanal.csv', 'w', newline='', encoding='utf-8') as f:
-        escritor = csv.writer(f, delimiter=';')
-        escritor.writerow(['Empleado', 'Dias trabajados', 'Horas totales'])
-        for empleado, datos in resumen.items():
-            escritor.writerow([empleado, len(datos['dias']), datos['horas']])
+    with AgregadorHorarios(huella=huella, informes=('resumen_semanal.csv',), consultas=False) as agregador:
+        agregador.agregar_todos(registros).escribir_resumen_semanal()
     print("Archivo 'resumen_semanal.csv' creado.\n")
 
 
+def generar_todos_los_informes(registros, hora_referencia=8, huella=None, compresion=None):
+    """Genera los cuatro CSV recorriendo los registros una sola vez.
+
+    registros puede ser la lista ya leída o iter_registros(...) para procesar
+    ficheros de cualquier tamaño sin cargarlos en memoria. huella y
+    compresion se pasan a AgregadorHorarios.
+    """
+    with AgregadorHorarios(hora_referencia, huella, compresion) as agregador:
+        agregador.agregar_todos(registros)
+        agregador.escribir_resumen_horarios()
+        agregador.escribir_madrugadores()
+        if not agregador.escribir_en_dos_dias():
+            print("No hay datos de Lunes o Viernes.")
+        agregador.escribir_resumen_semanal()
+    print(f"Informes generados a partir de {agregador.registros} registros.\n")
+    return agregador
+
+
 # ============================================================
 # 3. Menú interactivo
 # ============================================================
 
-def menu():
+def menu(rutas=None):
+    # Los ficheros se eligen en la línea de órdenes: el menú no pregunta nada
+    # más, así que se le puede pasar la entrada por una tubería como antes
+    rutas = list(rutas) if rutas else [FICHERO_HORARIOS]
     registros = []
     empleados_por_dia = {}
+    indice_horas = None
+    huella = None  # De los ficheros de los que salen registros y empleados_por_dia
 
     while True:
         print("========== MENÚ PRINCIPAL ==========")
-        print("1. Leer archivo horarios.csv")
+        print(f"1. Leer archivo {' '.join(rutas)}")
         print("2. Mostrar empleados por día")
         print("3. Generar resumen_horarios.csv")
         print("4. Crear madrugadores.csv")
         print("5. Crear en_dos_dias.csv")
         print("6. Crear resumen_semanal.csv")
+        print("7. Generar todos los informes (una pasada)")
+        print("8. Consulta por días (p. ej. almenos(2, Lunes, Martes, Viernes))")
+        print("9. Consulta por hora (entradas y turnos activos)")
+        print("10. Generar todos los informes leyendo los ficheros en streaming")
         print("0. Salir")
         print("====================================")
         opcion = input("Seleccione una opción: ")
 
         if opcion == "1":
-            registros = leer_csv()
+            huella = huella_entrada(rutas)
+            registros = leer_csv(rutas)
+            indice_horas = None
 
         elif opcion == "2":
             if registros:
@@ -139,28 +681,62 @@ def menu():
 
         elif opcion == "3":
             if registros:
-                generar_resumen_horarios(registros)
+                generar_resumen_horarios(registros, huella=huella)
             else:
                 print("Primero debe leer el archivo CSV.\n")
 
         elif opcion == "4":
             if registros:
-                empleados_madrugadores(registros)
+                empleados_madrugadores(registros, huella=huella)
             else:
                 print("Primero debe leer el archivo CSV.\n")
 
         elif opcion == "5":
             if empleados_por_dia:
-                empleados_en_dos_dias(empleados_por_dia)
+                empleados_en_dos_dias(empleados_por_dia, huella=huella)
             else:
                 print("Primero debe generar los conjuntos por día (opción 2).\n")
 
         elif opcion == "6":
             if registros:
-                resumen_semanal(registros)
+                resumen_semanal(registros, huella=huella)
+            else:
+                print("Primero debe leer el archivo CSV.\n")
+
+        elif opcion == "7":
+            if registros:
+                empleados_por_dia = generar_todos_los_informes(registros, huella=huella).empleados_por_dia
             else:
                 print("Primero debe leer el archivo CSV.\n")
 
+        elif opcion == "8":
+            if empleados_por_dia:
+                expresion = input("Expresión de días: ").strip()
+                consultar_dias(IndiceDias.desde_empleados_por_dia(empleados_por_dia), expresion)
+            else:
+                print("Primero debe generar los conjuntos por día (opción 2).\n")
+
+        elif opcion == "9":
+            if registros or indice_horas is not None:
+                if indice_horas is None:
+                    indice_horas = IndiceHoras.desde_registros(registros)
+                consultar_horas(indice_horas)
+            else:
+                print("Primero debe leer el archivo CSV.\n")
+
+        elif opcion == "10":
+            huella_rutas = huella_entrada(rutas)
+            if AgregadorHorarios(huella=huella_rutas, consultas=False).al_dia():
+                print("Los informes ya están generados a partir de esos ficheros sin cambios.\n")
+                continue
+            huella = huella_rutas
+            contadores = ContadoresLectura()
+            agregador = generar_todos_los_informes(iter_registros(rutas, contadores), huella=huella)
+            empleados_por_dia = agregador.empleados_por_dia
+            indice_horas = agregador.indice_horas
+            registros = []
+            print(contadores.resumen() + "\n")
+
         elif opcion == "0":
             print("Programa finalizado.")
             break
@@ -173,4 +749,4 @@ def menu():
 # 4. Programa principal
 # ============================================================
 if __name__ == "__main__":
-    menu()
+    menu(sys.argv[1:])
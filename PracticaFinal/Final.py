@@ -1,168 +1,177 @@
+import argparse
 import csv
+import io
+import json
 import os
 import re
-from datetime import datetime, date
-from statistics import mean
-from typing import List, Dict, Tuple, Set
-
-# ------------------------------
-# Rutas de archivos CSV
-# ------------------------------
-DATA_DIR = "data"
-CLIENTES_CSV = os.path.join(DATA_DIR, "clientes.csv")
-EVENTOS_CSV = os.path.join(DATA_DIR, "eventos.csv")
-VENTAS_CSV = os.path.join(DATA_DIR, "ventas.csv")
-INFORME_CSV = os.path.join(DATA_DIR, "informe_resumen.csv")
-
-DATE_FMT = "%Y-%m-%d"  # Formato de fecha estándar
+import shlex
+import shutil
+import sys
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import redirect_stdout
+from datetime import date
+from operator import le, mul
+from typing import List, Dict, Tuple, Iterable, Iterator
+
+# exportacion.py, en la raíz del repositorio, escribe los informes de forma atómica
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import exportacion
+# Módulos del CRM. Lo que se importa de ellos sin usarlo aquí es para los
+# benchmarks, que acceden a todo a través de Final
+from instrumentacion import INSTRUMENTACION, instrumentado
+from comun import (CLIENTES_CSV, EVENTOS_CSV, VENTAS_CSV, INFORMES_CSV, SNAPSHOT_BIN, CLIENTES_WAL, CLIENTES_SEQ,
+                   BASE_SQLITE, BACKENDS, CABECERA_CLIENTES, DATE_FMT, UMBRAL_STREAMING, UMBRAL_PARALELO,
+                   UMBRAL_PEREZOSO, DURABILIDADES, TOP_N, GRANULARIDADES, Cliente, Evento, Venta,
+                   _tam, _len, ensure_data_dir, parse_bool, email_valido, parse_date, es_cabecera, iter_csv,
+                   iter_lotes)
+from persistencia import append_row_csv, tam_consistente, recuperar_wal, SecuenciaIds, EscritorClientes
+from almacen import VentasColumnar, VentasCSV, TablaPerezosa, cargar_clientes, cargar_eventos, cargar_ventas
+from snapshot import firma_csv, guardar_snapshot, cargar_snapshot
+from almacen_sqlite import crear_base_sqlite, VentasSQLite, nuevo_escritor_clientes
+from cubo import CuboVentas
+from analitica import estadisticas, AnaliticaVentas, AcumuladorEstadisticas
 
 # ============================================================
-# 1. Clases principales (POO)
+# 1. Carga de datos desde CSV
 # ============================================================
 
-class Cliente:
-    """Representa un cliente del CRM."""
-    def __init__(self, id_: int, nombre: str, email: str, fecha_alta: date, activo: bool):
-        self.id = id_
-        self.nombre = nombre
-        self.email = email
-        self.fecha_alta = fecha_alta
-        self.activo = activo
-
-    def antiguedad_dias(self) -> int:
-        """Devuelve los días que el cliente lleva dado de alta."""
-        return (date.today() - self.fecha_alta).days
-
-    def __str__(self):
-        estado = "Activo" if self.activo else "Inactivo"
-        return f"[{self.id}] {self.nombre} <{self.email}> | Alta: {self.fecha_alta} | {estado}"
-
-
-class Evento:
-    """Representa un evento (con fecha y categoría)."""
-    def __init__(self, id_: int, nombre: str, categoria: str, fecha_evento: date, precio: float):
-        self.id = id_
-        self.nombre = nombre
-        self.categoria = categoria
-        self.fecha_evento = fecha_evento
-        self.precio = precio
-
-    def dias_hasta_evento(self) -> int:
-        """Devuelve cuántos días faltan hasta el evento."""
-        return (self.fecha_evento - date.today()).days
-
-    def __str__(self):
-        return f"[{self.id}] {self.nombre} ({self.categoria}) | {self.fecha_evento} | {self.precio:.2f}€"
-
-
-class Venta:
-    """Representa una venta (un cliente compra entradas de un evento)."""
-    def __init__(self, id_: int, cliente_id: int, evento_id: int, fecha_venta: date, unidades: int, precio_unitario: float):
-        self.id = id_
-        self.cliente_id = cliente_id
-        self.evento_id = evento_id
-        self.fecha_venta = fecha_venta
-        self.unidades = unidades
-        self.precio_unitario = precio_unitario
-
-    @property
-    def total(self) -> float:
-        """Importe total de la venta."""
-        return self.unidades * self.precio_unitario
-
-    def __str__(self):
-        return f"[{self.id}] C{self.cliente_id} -> E{self.evento_id} | {self.fecha_venta} | uds={self.unidades} | {self.precio_unitario:.2f}€ (total {self.total:.2f}€)"
-
-
-# ============================================================
-# 2. Funciones de utilidades (CSV y validaciones)
-# ============================================================
-
-def ensure_data_dir():
-    """Crea la carpeta data/ si no existe."""
-    os.makedirs(DATA_DIR, exist_ok=True)
-
-def parse_bool(s: str) -> bool:
-    """Convierte texto en booleano (true/false)."""
-    return s.strip().lower() in {"1", "true", "t", "yes", "y", "si", "sí"}
-
-def email_valido(email: str) -> bool:
-    """Valida formato básico de email."""
-    return re.match(r"^[^@\s]+@[^@\s]+\.[^@\s]+$", email) is not None
-
-def parse_date(s: str) -> date:
-    """Convierte texto (YYYY-MM-DD) a objeto date."""
-    return datetime.strptime(s.strip(), DATE_FMT).date()
-
-def safe_read_csv(path: str) -> List[List[str]]:
-    """Lee un CSV y devuelve una lista de filas (omite cabecera si hay)."""
-    try:
-        with open(path, newline="", encoding="utf-8") as f:
-            reader = csv.reader(f, delimiter=";", quotechar='"')
-            rows = list(reader)
-        # Si hay encabezado, lo salta
-        if rows and any("id" in h.lower() or "nombre" in h.lower() for h in rows[0]):
-            return rows[1:]
-        return rows
-    except FileNotFoundError:
-        print(f"No se encontró {path}.")
-        return []
-
-def append_row_csv(path: str, header: List[str], row: List):
-    """Añade una fila al CSV, creando el archivo si no existe."""
-    file_exists = os.path.exists(path)
-    with open(path, "a", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f, delimiter=";", quotechar='"', quoting=csv.QUOTE_MINIMAL)
-        if not file_exists:
-            writer.writerow(header)
-        writer.writerow(row)
-
+def _futuro_resuelto(valor) -> Future:
+    futuro = Future()
+    futuro.set_result(valor)
+    return futuro
+
+
+class CargaDatos:
+    """Carga de clientes, eventos y ventas en tres hilos a la vez.
+
+    Con los CSV en un disco de red la lectura está limitada por la latencia,
+    no por la CPU, así que leer las tres tablas en paralelo solapa las
+    esperas. clientes() y eventos() devuelven su tabla en cuanto está lista,
+    aunque ventas siga cargándose; resultado() espera a las tres y devuelve
+    lo mismo que cargar_datos. Las opciones son las de cargar_datos.
+    """
+    def __init__(self, streaming=None, usar_snapshot=True, procesos=None, backend=None, compartido=False,
+                 perezosas=None):
+        ensure_data_dir()
+        # Altas que quedaron en el WAL tras una caída
+        recuperadas = recuperar_wal()
+        if recuperadas:
+            print(f"Recuperadas {recuperadas} altas de clientes pendientes.")
+        self.backend = backend or os.environ.get("CRM_BACKEND", "csv")
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Backend desconocido: {self.backend}")
+        self._resultado = None
+        if self.backend == "sqlite":
+            self._cargar_sqlite()
+            return
+        if streaming is None:
+            streaming = os.path.exists(VENTAS_CSV) and os.path.getsize(VENTAS_CSV) >= UMBRAL_STREAMING
+        self.streaming = streaming
+        if perezosas is None:
+            perezosas = os.path.exists(CLIENTES_CSV) and os.path.getsize(CLIENTES_CSV) >= UMBRAL_PEREZOSO
+        self.usar_snapshot = usar_snapshot
+        self.desde_snapshot = False
+
+        # Si los CSV no han cambiado desde el último snapshot, se evita reparsearlos
+        # (en streaming, se evita la pasada que indexa ventas.csv)
+        if self.usar_snapshot:
+            datos = cargar_snapshot(compartido=compartido, perezosas=perezosas, streaming=streaming)
+            if datos is not None:
+                self.desde_snapshot = True
+                clientes, eventos, ventas, cli_index, evt_index = datos
+                self._clientes = _futuro_resuelto((clientes, cli_index))
+                self._eventos = _futuro_resuelto((eventos, evt_index))
+                self._ventas = _futuro_resuelto(ventas)
+                return
+            # Firmas tomadas antes de leer: si un CSV cambia durante la carga, el snapshot quedará obsoleto
+            self.firmas = {"clientes": firma_csv(CLIENTES_CSV), "eventos": firma_csv(EVENTOS_CSV),
+                           "ventas": firma_csv(VENTAS_CSV)}
+
+        hilos = ThreadPoolExecutor(max_workers=3, thread_name_prefix="carga")
+        self._clientes = hilos.submit(cargar_clientes, CLIENTES_CSV, perezosas)
+        self._eventos = hilos.submit(cargar_eventos, EVENTOS_CSV, perezosas)
+        self._ventas = hilos.submit(cargar_ventas, VENTAS_CSV, streaming, procesos)
+        hilos.shutdown(wait=False)
+
+    def _cargar_sqlite(self):
+        # Ni snapshot ni streaming: las ventas se quedan en la base
+        self.streaming = self.usar_snapshot = self.desde_snapshot = False
+        if not os.path.exists(BASE_SQLITE):
+            print(f"Creando {BASE_SQLITE} a partir de los CSV...")
+            crear_base_sqlite(BASE_SQLITE)
+        ventas = VentasSQLite(BASE_SQLITE)
+        self._clientes = _futuro_resuelto(ventas.clientes())
+        self._eventos = _futuro_resuelto(ventas.eventos())
+        self._ventas = _futuro_resuelto(ventas)
+
+    def clientes(self) -> Tuple[List[Cliente], Dict[int, Cliente]]:
+        return self._clientes.result()
+
+    def eventos(self) -> Tuple[List[Evento], Dict[int, Evento]]:
+        return self._eventos.result()
+
+    def ventas(self):
+        return self._ventas.result()
+
+    def terminada(self) -> bool:
+        return self._clientes.done() and self._eventos.done() and self._ventas.done()
+
+    def resultado(self):
+        """Espera a las tres tablas y devuelve (clientes, eventos, ventas, cli_index, evt_index)."""
+        if self._resultado is not None:
+            return self._resultado
+        clientes, cli_index = self.clientes()
+        eventos, evt_index = self.eventos()
+        ventas = self.ventas()
+        self._resultado = clientes, eventos, ventas, cli_index, evt_index
+
+        if self.backend == "sqlite":
+            print(f"Cargados {len(clientes)} clientes, {len(eventos)} eventos; {len(ventas)} ventas en {BASE_SQLITE}.\n")
+            return self._resultado
+        if self.usar_snapshot and not self.desde_snapshot:
+            try:
+                guardar_snapshot(self.firmas, clientes, eventos, ventas)
+            except OSError as e:
+                print(f"No se pudo guardar el snapshot: {e}")
+        origen = " (snapshot)" if self.desde_snapshot else ""
+        if self.streaming:
+            print(f"Cargados {len(clientes)} clientes, {len(eventos)} eventos; ventas en modo streaming{origen}.\n")
+        else:
+            print(f"Cargados {len(clientes)} clientes, {len(eventos)} eventos, {len(ventas)} ventas{origen}.\n")
+        return self._resultado
 
-# ============================================================
-# 3. Carga de datos desde CSV
-# ============================================================
 
-def cargar_datos():
-    """Carga clientes, eventos y ventas desde los CSV."""
-    ensure_data_dir()
+@instrumentado("cargar_datos", lambda a, k, r: {"filas": len(r[0]) + len(r[1]) + _len(r[2])})
+def cargar_datos(streaming=None, usar_snapshot=True, procesos=None, backend=None, compartido=False,
+                 perezosas=None):
+    """Carga clientes, eventos y ventas desde los CSV.
 
-    # --- CLIENTES ---
-    clientes = []
-    cli_index = {}
-    for r in safe_read_csv(CLIENTES_CSV):
-        try:
-            c = Cliente(int(r[0]), r[1], r[2], parse_date(r[3]), parse_bool(r[4]))
-            clientes.append(c)
-            cli_index[c.id] = c
-        except Exception as e:
-            print(f"Error en cliente {r}: {e}")
+    Si existe un snapshot válido (ver SNAPSHOT_BIN) se carga de él en lugar
+    de parsear los CSV; tras parsearlos se regenera. Con streaming=True las
+    ventas no se cargan en memoria: se devuelve un VentasCSV que se recorre
+    por lotes, con su índice por fecha (que también va en el snapshot). Por
+    defecto se decide según el tamaño de ventas.csv (UMBRAL_STREAMING).
 
-    # --- EVENTOS ---
-    eventos = []
-    evt_index = {}
-    for r in safe_read_csv(EVENTOS_CSV):
-        try:
-            e = Evento(int(r[0]), r[1], r[2], parse_date(r[3]), float(r[4]))
-            eventos.append(e)
-            evt_index[e.id] = e
-        except Exception as e:
-            print(f"Error en evento {r}: {e}")
+    procesos indica cuántos procesos parsean ventas.csv (1 = secuencial); por
+    defecto se usan todos los núcleos si el fichero supera UMBRAL_PARALELO.
 
-    # --- VENTAS ---
-    ventas = []
-    for r in safe_read_csv(VENTAS_CSV):
-        try:
-            v = Venta(int(r[0]), int(r[1]), int(r[2]), parse_date(r[3]), int(r[4]), float(r[5]))
-            ventas.append(v)
-        except Exception as e:
-            print(f"Error en venta {r}: {e}")
+    Las tres tablas se leen a la vez (ver CargaDatos). Con backend="sqlite"
+    (por defecto, la variable de entorno CRM_BACKEND) las ventas son un
+    VentasSQLite sobre BASE_SQLITE, que se crea desde los CSV si no existe.
+    Con compartido=True el snapshot se mapea en memoria en lugar de copiarse
+    (ver cargar_snapshot), para que varios procesos compartan los datos.
 
-    print(f"Cargados {len(clientes)} clientes, {len(eventos)} eventos, {len(ventas)} ventas.\n")
-    return clientes, eventos, ventas, cli_index, evt_index
+    Con perezosas=True clientes y eventos no se parsean al cargar: se indexa
+    la posición de cada fila y se leen según se consultan (ver
+    TablaPerezosa). Por defecto, si clientes.csv supera UMBRAL_PEREZOSO. Con
+    backend="sqlite" se cargan siempre enteros desde la base.
+    """
+    return CargaDatos(streaming, usar_snapshot, procesos, backend, compartido, perezosas).resultado()
 
 
 # ============================================================
-# 4. Funciones auxiliares
+# 2. Funciones auxiliares
 # ============================================================
 
 def listar(tabla, clientes, eventos, ventas):
@@ -185,11 +194,15 @@ def next_id(items, attr="id"):
 
 
 # ============================================================
-# 5. Altas y filtros
+# 3. Altas y filtros
 # ============================================================
 
-def alta_cliente(clientes):
-    """Crea un nuevo cliente pidiendo datos por consola."""
+def alta_cliente(clientes, stats=None, escritor: EscritorClientes = None):
+    """Crea un nuevo cliente pidiendo datos por consola.
+
+    Con un EscritorClientes el id sale de su secuencia y el alta pasa por su
+    WAL; sin él se calcula el id con next_id y se añade directamente al CSV.
+    """
     print("=== Alta de cliente ===")
     nombre = input("Nombre: ").strip()
     email = input("Email: ").strip()
@@ -204,21 +217,119 @@ def alta_cliente(clientes):
         return
 
     activo = input("¿Activo? (s/n): ").lower() in {"s", "si", "1", "true"}
-    cid = next_id(clientes)
+    cid = escritor.siguiente_id() if escritor is not None else next_id(clientes)
     nuevo = Cliente(cid, nombre, email, f_alta, activo)
     clientes.append(nuevo)
+    if stats is not None:
+        stats.add_cliente(nuevo)
 
     # Guardar incrementalmente en CSV
-    append_row_csv(
-        CLIENTES_CSV,
-        ["id", "nombre", "email", "fecha_alta", "activo"],
-        [cid, nombre, email, f_alta.strftime(DATE_FMT), int(activo)]
-    )
+    if escritor is not None:
+        escritor.anadir(nuevo)
+    else:
+        append_row_csv(
+            CLIENTES_CSV,
+            CABECERA_CLIENTES,
+            [cid, nombre, email, f_alta.strftime(DATE_FMT), int(activo)]
+        )
     print(f"Cliente creado: {nuevo}\n")
-
-
-def filtrar_ventas_por_rango(ventas, cli_index, evt_index):
-    """Filtra las ventas entre dos fechas dadas."""
+    return nuevo
+
+
+def ventas_en_rango(ventas, f_ini: date, f_fin: date) -> Iterator[Venta]:
+    """Ventas con fecha entre f_ini y f_fin (usa el índice por fecha si lo hay)."""
+    if isinstance(ventas, (VentasColumnar, VentasCSV, VentasSQLite)):
+        return ventas.rango(f_ini, f_fin)
+    return (v for v in ventas if f_ini <= v.fecha_venta <= f_fin)
+
+
+class JoinVentas:
+    """Cliente, evento y categoría de cada venta ya resueltos (join desnormalizado).
+
+    Las columnas se construyen la primera vez que se piden, en una pasada
+    sobre cliente_id y evento_id, y se rehacen solo si cambia el número de
+    clientes, de eventos o de ventas (o tras invalidar()). Con ellas, listar
+    un rango no consulta cli_index ni evt_index por cada venta.
+    """
+    def __init__(self, ventas: VentasColumnar, cli_index: Dict[int, Cliente], evt_index: Dict[int, Evento]):
+        self.ventas = ventas
+        self.cli_index = cli_index
+        self.evt_index = evt_index
+        self._clientes = None   # posición -> nombre del cliente
+        self._eventos = None    # posición -> (nombre del evento, categoría), una tupla por evento
+        self._firma = None
+        self._fechas = {}       # ordinal -> "YYYY-MM-DD"
+
+    def invalidar(self):
+        self._clientes = self._eventos = None
+
+    def columnas(self) -> Tuple[List[str], List[Tuple[str, str]]]:
+        firma = (len(self.cli_index), len(self.evt_index), len(self.ventas))
+        if self._clientes is None or firma != self._firma:
+            # Solo los clientes con ventas: con una TablaPerezosa no se leen los demás
+            nombres = {}
+            for cid in set(self.ventas.cliente_id):
+                c = self.cli_index.get(cid)
+                nombres[cid] = c.nombre if c is not None else "?"
+            eventos = {eid: (e.nombre, e.categoria) for eid, e in self.evt_index.items()}
+            self._clientes = [nombres[cid] for cid in self.ventas.cliente_id]
+            self._eventos = [eventos.get(eid, ("?", "?")) for eid in self.ventas.evento_id]
+            self._firma = firma
+        return self._clientes, self._eventos
+
+    def fecha_iso(self, ordinal: int) -> str:
+        texto = self._fechas.get(ordinal)
+        if texto is None:
+            texto = self._fechas[ordinal] = date.fromordinal(ordinal).isoformat()
+        return texto
+
+    def filas(self, posiciones: Iterable[int]) -> Iterator[List]:
+        """[fecha, cliente, evento, categoría, total] de cada posición."""
+        clientes, eventos = self.columnas()
+        fechas, unidades, precios = self.ventas.fecha, self.ventas.unidades, self.ventas.precio_unitario
+        for i in posiciones:
+            nombre, categoria = eventos[i]
+            yield [self.fecha_iso(fechas[i]), clientes[i], nombre, categoria, f"{unidades[i] * precios[i]:.2f}"]
+
+    def lineas(self, posiciones: Iterable[int]) -> Iterator[str]:
+        """Líneas del listado de filtrar_ventas_por_rango, con su salto de línea."""
+        clientes, eventos = self.columnas()
+        fechas, unidades, precios = self.ventas.fecha, self.ventas.unidades, self.ventas.precio_unitario
+        fecha_iso = self.fecha_iso
+        for i in posiciones:
+            yield f"- {fecha_iso(fechas[i])} | {clientes[i]} -> {eventos[i][0]} | {unidades[i] * precios[i]:.2f}€\n"
+
+
+TAM_BLOQUE_SALIDA = 2000  # Líneas por llamada a write en los listados largos
+
+def escribir_paginado(lineas: Iterable[str], out=None, por_pagina: int = None) -> int:
+    """Escribe las líneas en bloques de TAM_BLOQUE_SALIDA y devuelve cuántas escribió.
+
+    Si la salida es un terminal se detiene cada por_pagina líneas (por
+    defecto, la altura del terminal) hasta pulsar Enter; con "q" se corta el
+    listado. Redirigida a un fichero o a una tubería, no hay pausas.
+    """
+    out = out or sys.stdout
+    if por_pagina is None and out.isatty():
+        por_pagina = max(shutil.get_terminal_size().lines - 1, 1)
+    n = 0
+    for bloque in iter_lotes(lineas, por_pagina or TAM_BLOQUE_SALIDA):
+        out.write("".join(bloque))
+        n += len(bloque)
+        if por_pagina and len(bloque) == por_pagina:
+            out.flush()
+            if input("-- Más (Enter, q para terminar) --").strip().lower() == "q":
+                break
+    out.flush()
+    return n
+
+
+def filtrar_ventas_por_rango(ventas, cli_index, evt_index, join: JoinVentas = None):
+    """Filtra las ventas entre dos fechas dadas (en una sola pasada sobre las ventas).
+
+    Con un JoinVentas los nombres salen de sus columnas ya resueltas; la
+    salida se escribe por bloques y se pagina en un terminal.
+    """
     print("=== Filtro de ventas por rango ===")
     try:
         f_ini = parse_date(input("Fecha inicio (YYYY-MM-DD): "))
@@ -229,80 +340,267 @@ def filtrar_ventas_por_rango(ventas, cli_index, evt_index):
         print("Fechas inválidas.\n")
         return
 
-    filtradas = [v for v in ventas if f_ini <= v.fecha_venta <= f_fin]
-    print(f"\nResultados ({len(filtradas)} ventas):")
-    for v in filtradas:
-        cli = cli_index.get(v.cliente_id)
-        evt = evt_index.get(v.evento_id)
-        print(f"- {v.fecha_venta} | {cli.nombre if cli else '?'} -> {evt.nombre if evt else '?'} | {v.total:.2f}€")
-    print()
-
+    if isinstance(ventas, (VentasColumnar, VentasCSV, VentasSQLite)):
+        # Con el índice por fecha el recuento y los totales salen sin recorrer el rango
+        n, unidades, ingresos = ventas.agregado_rango(f_ini, f_fin)
+        print(f"\nResultados ({n} ventas, {unidades} uds, {ingresos:.2f}€):")
+        if isinstance(ventas, VentasSQLite):
+            escribir_paginado(f"- {f} | {cli} -> {evt} | {total}€\n"
+                              for f, cli, evt, _, total in ventas.filas_rango(f_ini, f_fin))
+        elif join is not None:
+            escribir_paginado(join.lineas(ventas.indexar().posiciones_rango(f_ini, f_fin)))
+        else:
+            escribir_paginado(_linea_venta_filtrada(v, cli_index, evt_index)
+                              for v in ventas_en_rango(ventas, f_ini, f_fin))
+        print()
+        return
 
-# ============================================================
-# 6. Estadísticas y métricas
-# ============================================================
+    print("\nResultados:")
+    n = escribir_paginado(_linea_venta_filtrada(v, cli_index, evt_index)
+                          for v in ventas_en_rango(ventas, f_ini, f_fin))
+    print(f"({n} ventas)\n")
 
-def estadisticas(eventos, ventas):
-    """Calcula estadísticas globales y devuelve un resumen."""
-    ingresos_totales = sum(v.total for v in ventas)
 
-    # Totales por evento
-    ingresos_por_evento = {}
-    for v in ventas:
-        ingresos_por_evento[v.evento_id] = ingresos_por_evento.get(v.evento_id, 0) + v.total
+def _linea_venta_filtrada(v, cli_index, evt_index) -> str:
+    cli = cli_index.get(v.cliente_id)
+    evt = evt_index.get(v.evento_id)
+    return f"- {v.fecha_venta} | {cli.nombre if cli else '?'} -> {evt.nombre if evt else '?'} | {v.total:.2f}€\n"
 
-    # Set de categorías únicas
-    categorias = {e.categoria for e in eventos}
 
-    # Evento más próximo
-    proximos = [e.dias_hasta_evento() for e in eventos if e.dias_hasta_evento() >= 0]
-    dias_hasta_proximo = min(proximos) if proximos else -1
+# ============================================================
+# 4. Estadísticas y métricas
+# ============================================================
 
-    # Precios (min, max, media)
-    precios = [e.precio for e in eventos] or [0]
-    resumen_precios = (min(precios), max(precios), mean(precios))
+def _pct(q: float) -> str:
+    return f"p{q * 100:g}"
 
-    return ingresos_totales, ingresos_por_evento, categorias, dias_hasta_proximo, resumen_precios
 
+def mostrar_estadisticas(eventos, ventas, evt_index, stats: AcumuladorEstadisticas = None, cli_index: Dict = None):
+    """Muestra por pantalla las estadísticas (del acumulador si se pasa, sin recalcular).
 
-def mostrar_estadisticas(eventos, ventas, evt_index):
-    """Muestra por pantalla las estadísticas calculadas."""
-    itot, por_evt, cats, dias, tpl = estadisticas(eventos, ventas)
+    Incluye los rankings y percentiles de AnaliticaVentas.
+    """
+    if stats is not None:
+        itot, por_evt, cats, dias, tpl = stats.resumen()
+    else:
+        itot, por_evt, cats, dias, tpl = estadisticas(eventos, ventas)
     print("=== Estadísticas ===")
     print(f"Ingresos totales: {itot:.2f}€")
     for eid, total in por_evt.items():
         print(f"  - {evt_index[eid].nombre}: {total:.2f}€")
     print(f"Categorías: {', '.join(sorted(cats))}")
     print(f"Días hasta evento más próximo: {dias if dias >= 0 else 'N/A'}")
-    print(f"Precios (min, max, media): {tpl}\n")
+    print(f"Precios (min, max, media): {tpl}")
+
+    analitica = stats.analitica_de(ventas) if stats is not None else AnaliticaVentas.desde_ventas(ventas)
+    cli_index = cli_index or {}
+    print(f"Top {TOP_N} clientes por ingresos:")
+    for cid, total in analitica.top_clientes():
+        print(f"  - {cli_index[cid].nombre if cid in cli_index else f'Cliente {cid}'}: {total:.2f}€")
+    print(f"Top {TOP_N} eventos por categoría:")
+    for cat, top in analitica.top_eventos_por_categoria(evt_index).items():
+        print(f"  {cat}: " + ", ".join(f"{evt_index[eid].nombre if eid in evt_index else eid} ({total:.2f}€)"
+                                       for eid, total in top))
+    pct = analitica.percentiles()
+    print("Importe por venta: " + ", ".join(f"{_pct(q)}={v:.2f}€" for q, v in pct["ingresos"].items()))
+    print("Unidades por venta: " + ", ".join(f"{_pct(q)}={v:.1f}" for q, v in pct["unidades"].items()) + "\n")
+
+
+
+def mostrar_periodos(cubo: CuboVentas):
+    """Pide granularidad, fechas y categoría y muestra las ventas de cada periodo."""
+    print("=== Ventas por periodo ===")
+    granularidad = input(f"Periodo ({'/'.join(GRANULARIDADES)}) [mes]: ").strip().lower() or "mes"
+    if granularidad not in GRANULARIDADES:
+        print("Periodo no válido.\n")
+        return
+    try:
+        texto_ini = input("Fecha inicio (YYYY-MM-DD, vacío = todas): ").strip()
+        texto_fin = input("Fecha fin (YYYY-MM-DD, vacío = todas): ").strip()
+        f_ini = parse_date(texto_ini) if texto_ini else None
+        f_fin = parse_date(texto_fin) if texto_fin else None
+    except ValueError:
+        print("Fechas inválidas.\n")
+        return
+    categoria = input(f"Categoría ({'/'.join(c for c in cubo.categorias if c != '?')}, vacío = todas): ").strip() or None
+    filas = cubo.consultar(granularidad, f_ini, f_fin, categoria)
+    escribir_paginado(f"- {inicio} | {n} ventas | {uds} uds | {ingresos:.2f}€\n" for inicio, n, uds, ingresos in filas)
+    n, uds, ingresos = cubo.total(f_ini, f_fin, categoria)
+    print(f"Total del rango: {n} ventas, {uds} uds, {ingresos:.2f}€\n")
 
 
 # ============================================================
-# 7. Exportar informe CSV
+# 5. Exportar informe CSV
 # ============================================================
 
-def exportar_informe(eventos, ventas):
-    """Genera informe_resumen.csv con ingresos totales por evento."""
-    totales = {}
-    for v in ventas:
-        totales[v.evento_id] = totales.get(v.evento_id, 0) + v.total
+def agregar_ventas(ventas, por: str, evt_index: Dict[int, Evento]) -> Dict:
+    """Agrupa las ventas por evento, categoría, cliente o mes en una sola pasada.
+
+    Devuelve {clave: [nº ventas, unidades, ingresos]}. La categoría se
+    obtiene con un join contra evt_index (diccionario), nunca buscando en la
+    lista de eventos. Con VentasSQLite la agrupación se hace en SQL.
+    """
+    if isinstance(ventas, VentasSQLite):
+        return ventas.agrupar(por)
+    if isinstance(ventas, VentasColumnar):
+        filas = zip(ventas.evento_id, ventas.cliente_id, ventas.fecha, ventas.unidades,
+                    map(mul, ventas.unidades, ventas.precio_unitario))
+    else:
+        filas = ((v.evento_id, v.cliente_id, v.fecha_venta.toordinal(), v.unidades, v.total) for v in ventas)
+
+    if por == "evento":
+        clave = lambda eid, cid, f: eid
+    elif por == "cliente":
+        clave = lambda eid, cid, f: cid
+    elif por == "categoria":
+        categoria_de = {eid: e.categoria for eid, e in evt_index.items()}
+        clave = lambda eid, cid, f: categoria_de.get(eid, "?")
+    elif por == "mes":
+        meses = {}
+        def clave(eid, cid, f):
+            mes = meses.get(f)
+            if mes is None:
+                mes = meses[f] = date.fromordinal(f).strftime("%Y-%m")
+            return mes
+    else:
+        raise ValueError(f"Agrupación desconocida: {por}")
+
+    grupos = {}
+    for eid, cid, f, uds, total in filas:
+        k = clave(eid, cid, f)
+        g = grupos.get(k)
+        if g is None:
+            grupos[k] = [1, uds, total]
+        else:
+            g[0] += 1
+            g[1] += uds
+            g[2] += total
+    return grupos
+
+
+def _filas_analitica(analitica: AnaliticaVentas, cli_index: Dict, evt_index: Dict):
+    """Cabecera y filas del informe de analítica (rankings y percentiles)."""
+    cabecera = ["seccion", "clave", "nombre", "valor"]
+    def filas():
+        for cid, total in analitica.top_clientes():
+            yield ["top_clientes", cid, cli_index[cid].nombre if cid in cli_index else f"Cliente {cid}", f"{total:.2f}"]
+        for cat, top in analitica.top_eventos_por_categoria(evt_index).items():
+            for eid, total in top:
+                yield [f"top_eventos_{cat}", eid, evt_index[eid].nombre if eid in evt_index else f"Evento {eid}",
+                       f"{total:.2f}"]
+        for medida, valores in analitica.percentiles().items():
+            for q, v in valores.items():
+                yield [f"percentiles_{medida}", _pct(q), "", f"{v:.2f}" if medida == "ingresos" else f"{v:.1f}"]
+    return cabecera, filas()
+
+
+def _filas_informe(por: str, grupos: Dict, cli_index: Dict, evt_index: Dict):
+    """Cabecera y filas (generador) del informe de cada tipo."""
+    if por == "evento":
+        # Mismo formato que el informe_resumen.csv original
+        cabecera = ["evento_id", "nombre_evento", "ingresos_totales"]
+        filas = ([eid, evt_index[eid].nombre if eid in evt_index else f"Evento {eid}", f"{g[2]:.2f}"]
+                 for eid, g in grupos.items())
+    elif por == "cliente":
+        cabecera = ["cliente_id", "nombre_cliente", "ventas", "unidades", "ingresos_totales"]
+        filas = ([cid, cli_index[cid].nombre if cid in cli_index else f"Cliente {cid}", g[0], g[1], f"{g[2]:.2f}"]
+                 for cid, g in sorted(grupos.items()))
+    else:
+        cabecera = [por, "ventas", "unidades", "ingresos_totales"]
+        filas = ([k, g[0], g[1], f"{g[2]:.2f}"] for k, g in sorted(grupos.items()))
+    return cabecera, filas
+
+
+def huella_datos(backend: str = None) -> str:
+    """Huella de los ficheros de datos del backend, sin leerlos (ver exportacion).
+
+    Se toma antes de cargar: si los ficheros cambian durante la carga, la
+    huella ya no coincidirá y los informes se regenerarán.
+    """
+    backend = backend or os.environ.get("CRM_BACKEND", "csv")
+    if backend == "sqlite":
+        rutas = [BASE_SQLITE, BASE_SQLITE + "-wal"]
+    else:
+        rutas = [CLIENTES_CSV, EVENTOS_CSV, VENTAS_CSV, CLIENTES_WAL]
+    return exportacion.huella(backend, exportacion.huella_ficheros(rutas))
+
+
+@instrumentado("exportar_informe", lambda a, k, r: {
+    "filas": _len(a[1] if len(a) > 1 else k["ventas"]), "bytes_escritos": _tam(r)})
+def exportar_informe(eventos, ventas, stats: AcumuladorEstadisticas = None, por: str = "evento",
+                     evt_index: Dict = None, cli_index: Dict = None, compresion: str = None,
+                     huella: str = None) -> str:
+    """Genera el informe CSV de ingresos agrupados por evento, categoría, cliente o mes,
+    o el de analítica (top-N y percentiles, ver AnaliticaVentas). Devuelve su ruta.
+
+    El de eventos (informe_resumen.csv) conserva el formato original. Los
+    nombres se resuelven con los índices por id y las filas se escriben en
+    bloque sobre un fichero con buffer grande, así que el coste crece de forma
+    lineal con el número de ventas.
+
+    El fichero se escribe con exportacion: en un temporal que se renombra al
+    terminar, comprimido si se indica compresion. huella (ver huella_datos)
+    identifica los datos cargados; si el informe ya se generó con la misma,
+    no se recalcula ni se reescribe.
+    """
+    path = exportacion.ruta_informe(INFORMES_CSV[por], compresion)
+    if exportacion.informe_vigente(INFORMES_CSV[por], huella, compresion):
+        print(f"Informe sin cambios (los datos no han cambiado): {path}\n")
+        return path
+    if evt_index is None:
+        evt_index = {e.id: e for e in eventos}
+    if por == "analitica":
+        analitica = stats.analitica_de(ventas) if stats is not None else AnaliticaVentas.desde_ventas(ventas)
+        cabecera, filas = _filas_analitica(analitica, cli_index or {}, evt_index)
+    else:
+        if por == "evento" and stats is not None:
+            grupos = {eid: [0, 0, total] for eid, total in stats.ingresos_por_evento.items()}
+        else:
+            grupos = agregar_ventas(ventas, por, evt_index)
+        cabecera, filas = _filas_informe(por, grupos, cli_index or {}, evt_index)
+
+    # Quien lea el informe (u otro proceso que lo exporte a la vez) nunca ve un fichero a medias
+    exportacion.escribir_csv(INFORMES_CSV[por], cabecera, filas, quotechar='"', quoting=csv.QUOTE_MINIMAL,
+                             compresion=compresion, huella_actual=huella)
+    print(f"Informe exportado: {path}\n")
+    return path
+
 
-    with open(INFORME_CSV, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f, delimiter=";", quotechar='"', quoting=csv.QUOTE_MINIMAL)
-        w.writerow(["evento_id", "nombre_evento", "ingresos_totales"])
-        for eid, total in totales.items():
-            nombre = next((e.nombre for e in eventos if e.id == eid), f"Evento {eid}")
-            w.writerow([eid, nombre, f"{total:.2f}"])
-    print(f"Informe exportado: {INFORME_CSV}\n")
+_HILO_INFORMES = None  # Un único hilo: los informes en segundo plano se escriben en orden
+
+def _avisar_error_informe(futuro: Future):
+    if futuro.exception() is not None:
+        print(f"Error al exportar el informe: {futuro.exception()}\n")
+
+def exportar_informe_en_segundo_plano(*args, **kwargs) -> Future:
+    """Lanza exportar_informe en otro hilo y devuelve su Future sin esperar al disco."""
+    global _HILO_INFORMES
+    if _HILO_INFORMES is None:
+        _HILO_INFORMES = ThreadPoolExecutor(max_workers=1, thread_name_prefix="informes")
+    futuro = _HILO_INFORMES.submit(exportar_informe, *args, **kwargs)
+    futuro.add_done_callback(_avisar_error_informe)
+    return futuro
+
+def esperar_informes():
+    """Espera a que terminen los informes lanzados en segundo plano."""
+    global _HILO_INFORMES
+    if _HILO_INFORMES is not None:
+        _HILO_INFORMES.shutdown(wait=True)
+        _HILO_INFORMES = None
 
 
 # ============================================================
-# 8. Menú interactivo
+# 6. Menú interactivo
 # ============================================================
 
 def menu():
     """Menú principal en bucle con todas las opciones."""
     clientes, eventos, ventas, cli_index, evt_index = [], [], [], {}, {}
+    stats = None
+    escritor = None
+    carga = None  # CargaDatos con ventas aún en curso
+    join = None
+    huella = None  # De los ficheros cargados; None si los datos en memoria ya difieren de ellos
 
     while True:
         print("="*60)
@@ -316,12 +614,33 @@ def menu():
         print("6) Filtrar ventas por rango")
         print("7) Ver estadísticas")
         print("8) Exportar informe")
+        print("9) Ventas por día, semana o mes")
         print("0) Salir")
 
         op = input("Opción: ").strip()
 
+        # Las ventas se recogen en cuanto terminan o cuando una opción las necesita
+        if carga is not None and (carga.terminada() or op in ("4", "6", "7", "8", "9")):
+            if not carga.terminada():
+                print("Esperando a que terminen de cargarse las ventas...")
+            clientes, eventos, ventas, cli_index, evt_index = carga.resultado()
+            stats = AcumuladorEstadisticas.desde_datos(clientes, eventos, ventas)
+            join = JoinVentas(ventas, cli_index, evt_index) if isinstance(ventas, VentasColumnar) else None
+            carga = None
+
         if op == "1":
-            clientes, eventos, ventas, cli_index, evt_index = cargar_datos()
+            if escritor is not None:
+                escritor.cerrar()
+                escritor = None
+            huella = huella_datos()
+            carga = CargaDatos()
+            ventas, stats, join = [], None, None
+            clientes, cli_index = carga.clientes()
+            eventos, evt_index = carga.eventos()
+            if carga.terminada():
+                carga.resultado()  # Solo muestra el resumen; los datos se recogen en la siguiente opción
+            else:
+                print(f"Disponibles {len(clientes)} clientes y {len(eventos)} eventos; las ventas siguen cargándose.\n")
         elif op == "2" and clientes:
             listar("clientes", clientes, eventos, ventas)
         elif op == "3" and eventos:
@@ -329,14 +648,29 @@ def menu():
         elif op == "4" and ventas:
             listar("ventas", clientes, eventos, ventas)
         elif op == "5":
-            alta_cliente(clientes)
+            if escritor is None:
+                escritor = nuevo_escritor_clientes(clientes, ventas, "siempre")
+            nuevo = alta_cliente(clientes, stats, escritor)
+            escritor.checkpoint()
+            if nuevo is not None:
+                cli_index[nuevo.id] = nuevo  # El join de ventas se rehará con el nuevo cliente
+                huella = None
         elif op == "6" and ventas:
-            filtrar_ventas_por_rango(ventas, cli_index, evt_index)
+            filtrar_ventas_por_rango(ventas, cli_index, evt_index, join)
         elif op == "7" and eventos:
-            mostrar_estadisticas(eventos, ventas, evt_index)
+            mostrar_estadisticas(eventos, ventas, evt_index, stats, cli_index)
         elif op == "8" and ventas:
-            exportar_informe(eventos, ventas)
+            por = input("Agrupar por (evento/categoria/cliente/mes/analitica) [evento]: ").strip().lower() or "evento"
+            if por in INFORMES_CSV:
+                exportar_informe_en_segundo_plano(eventos, ventas, stats, por, evt_index, cli_index, huella=huella)
+            else:
+                print("Agrupación no válida.\n")
+        elif op == "9" and ventas:
+            mostrar_periodos(stats.cubo_de(ventas, evt_index))
         elif op == "0":
+            if escritor is not None:
+                escritor.cerrar()
+            esperar_informes()
             print("Hasta luego!")
             break
         else:
@@ -344,7 +678,279 @@ def menu():
 
 
 # ============================================================
-# 9. Punto de entrada
+# 7. Línea de comandos (modo no interactivo)
+# ============================================================
+# Cada opción del menú tiene su subcomando; la salida puede ser texto (la
+# del menú), JSON o CSV. "serve" carga los datos una vez y atiende comandos
+# por la entrada estándar, uno por línea, sin volver a cargar.
+#
+#   python Final.py stats --formato json
+#   python Final.py filtrar --desde 2025-10-01 --hasta 2025-10-31 --formato csv
+#   python Final.py importar-clientes nuevos.csv --durabilidad lote
+#   printf 'stats\nexportar --por mes\n' | python Final.py --formato json serve
+
+COLUMNAS_LISTADO = {
+    "clientes": ["id", "nombre", "email", "fecha_alta", "activo"],
+    "eventos": ["id", "nombre", "categoria", "fecha", "precio"],
+    "ventas": ["id", "cliente_id", "evento_id", "fecha", "unidades", "precio_unitario"],
+}
+
+class Sesion:
+    """Datos cargados que se conservan entre comandos (modo serve)."""
+    def __init__(self, streaming=None, usar_snapshot=True, procesos=None, backend=None, compartido=False,
+                 perezosas=None):
+        self.opciones = dict(streaming=streaming, usar_snapshot=usar_snapshot, procesos=procesos, backend=backend,
+                             compartido=compartido, perezosas=perezosas)
+        self.cargada = False
+
+    def cargar(self):
+        self.huella = huella_datos(self.opciones["backend"])
+        (self.clientes, self.eventos, self.ventas,
+         self.cli_index, self.evt_index) = cargar_datos(**self.opciones)
+        self.stats = AcumuladorEstadisticas.desde_datos(self.clientes, self.eventos, self.ventas)
+        self.join = (JoinVentas(self.ventas, self.cli_index, self.evt_index)
+                     if isinstance(self.ventas, VentasColumnar) else None)
+        self.cargada = True
+
+
+def emitir(cabecera: List[str], filas: Iterable[List], formato: str, out=None):
+    """Escribe filas en JSON (lista de objetos), CSV (;) o texto, sin acumularlas en memoria."""
+    out = out or sys.stdout
+    if formato == "json":
+        out.write("[")
+        for i, fila in enumerate(filas):
+            out.write(("," if i else "") + json.dumps(dict(zip(cabecera, fila)), ensure_ascii=False, default=str))
+        out.write("]\n")
+    elif formato == "csv":
+        w = csv.writer(out, delimiter=";", quotechar='"', quoting=csv.QUOTE_MINIMAL, lineterminator="\n")
+        w.writerow(cabecera)
+        w.writerows(filas)
+    else:
+        for bloque in iter_lotes(filas, TAM_BLOQUE_SALIDA):
+            out.write("".join(" | ".join(str(x) for x in fila) + "\n" for fila in bloque))
+    out.flush()
+
+def _filas_tabla(tabla: str, sesion: Sesion) -> Iterator[List]:
+    if tabla == "clientes":
+        return ([c.id, c.nombre, c.email, c.fecha_alta, int(c.activo)] for c in sesion.clientes)
+    if tabla == "eventos":
+        return ([e.id, e.nombre, e.categoria, e.fecha_evento, e.precio] for e in sesion.eventos)
+    return ([v.id, v.cliente_id, v.evento_id, v.fecha_venta, v.unidades, v.precio_unitario] for v in sesion.ventas)
+
+def importar_clientes(path: str, clientes, stats=None, durabilidad: str = "lote", ventas=None) -> Tuple[int, int]:
+    """Da de alta en bloque los clientes de un CSV (nombre;email;fecha_alta;activo).
+
+    Las filas inválidas se informan por stderr con su línea y se omiten.
+    Con ventas en SQLite las altas van a la base. Devuelve (importados, errores).
+    """
+    escritor = nuevo_escritor_clientes(clientes, ventas, durabilidad)
+    importados = errores = 0
+    try:
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f, delimiter=";", quotechar='"')
+            for r in reader:
+                if reader.line_num == 1 and es_cabecera(r):
+                    continue
+                try:
+                    nombre, email, f_alta, activo = r[0].strip(), r[1].strip(), parse_date(r[2]), parse_bool(r[3])
+                    if not email_valido(email):
+                        raise ValueError(f"email no válido: {email}")
+                except Exception as e:
+                    errores += 1
+                    print(f"Error en cliente {r} (línea {reader.line_num}): {e}", file=sys.stderr)
+                    continue
+                nuevo = Cliente(escritor.siguiente_id(), nombre, email, f_alta, activo)
+                escritor.anadir(nuevo)
+                clientes.append(nuevo)
+                if stats is not None:
+                    stats.add_cliente(nuevo)
+                importados += 1
+    finally:
+        escritor.cerrar()
+    return importados, errores
+
+def crear_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="Final.py", description="Mini-CRM de eventos (modo no interactivo).")
+    parser.add_argument("--base", help="carpeta que contiene data/ (por defecto, la actual)")
+    parser.add_argument("--formato", choices=("texto", "json", "csv"), default="texto")
+    parser.add_argument("--procesos", type=int, help="procesos para parsear ventas.csv")
+    parser.add_argument("--streaming", action="store_true", default=None,
+                        help="no cargar las ventas en memoria")
+    parser.add_argument("--sin-snapshot", dest="usar_snapshot", action="store_false",
+                        help="no leer ni escribir data/crm.snapshot")
+    parser.add_argument("--compartido", action="store_true",
+                        help="mapear el snapshot en memoria para compartirlo entre procesos (p. ej. varios serve)")
+    parser.add_argument("--bajo-demanda", dest="perezosas", action="store_true", default=None,
+                        help="leer clientes y eventos según se consultan (por defecto, con clientes.csv grande)")
+    parser.add_argument("--backend", choices=BACKENDS,
+                        help="origen de los datos: los CSV o data/crm.sqlite (por defecto, CRM_BACKEND o csv)")
+    parser.add_argument("--metricas", metavar="FICHERO",
+                        help="activa la instrumentación (.prom: Prometheus; otro: log JSON)")
+    # --formato también se acepta detrás del subcomando
+    comunes = argparse.ArgumentParser(add_help=False)
+    comunes.add_argument("--formato", choices=("texto", "json", "csv"), default=argparse.SUPPRESS)
+    sub = parser.add_subparsers(dest="comando", required=True)
+    sub.add_parser("cargar", parents=[comunes], help="carga los CSV y muestra los totales")
+    p = sub.add_parser("listar", parents=[comunes], help="lista una tabla")
+    p.add_argument("tabla", choices=tuple(COLUMNAS_LISTADO))
+    p = sub.add_parser("stats", parents=[comunes], help="estadísticas globales")
+    p.add_argument("--verificar", action="store_true", help="comprobar el acumulador con un recálculo")
+    p = sub.add_parser("filtrar", parents=[comunes], help="ventas entre dos fechas")
+    p.add_argument("--desde", type=parse_date, required=True)
+    p.add_argument("--hasta", type=parse_date, required=True)
+    p = sub.add_parser("periodos", parents=[comunes], help="ventas, unidades e ingresos por día, semana o mes")
+    p.add_argument("--por", choices=GRANULARIDADES, default="mes")
+    p.add_argument("--desde", type=parse_date)
+    p.add_argument("--hasta", type=parse_date)
+    p.add_argument("--categoria")
+    p.add_argument("--evento", type=int)
+    p = sub.add_parser("exportar", parents=[comunes], help="exporta un informe CSV")
+    p.add_argument("--por", choices=tuple(INFORMES_CSV), default="evento")
+    p.add_argument("--comprimir", choices=tuple(exportacion.COMPRESIONES), help="escribir el informe comprimido")
+    p = sub.add_parser("importar-clientes", parents=[comunes], help="alta en bloque desde un CSV")
+    p.add_argument("fichero")
+    p.add_argument("--durabilidad", choices=DURABILIDADES, default="lote")
+    p = sub.add_parser("importar-sqlite", parents=[comunes], help="crea data/crm.sqlite a partir de los CSV")
+    p.add_argument("--reemplazar", action="store_true", help="rehacer la base si ya existe")
+    sub.add_parser("serve", parents=[comunes], help="mantiene los datos cargados y lee comandos por stdin")
+    return parser
+
+def ejecutar(args, sesion: Sesion):
+    """Ejecuta un subcomando sobre la sesión."""
+    fmt = args.formato
+    if args.comando == "importar-sqlite":
+        # No necesita la sesión: lee los CSV directamente
+        with redirect_stdout(sys.stderr if fmt != "texto" else sys.stdout):
+            ensure_data_dir()
+            recuperar_wal()
+            t0 = time.perf_counter()
+            n = crear_base_sqlite(BASE_SQLITE, reemplazar=args.reemplazar)
+        emitir(["base", "ventas", "segundos"], [[BASE_SQLITE, n, f"{time.perf_counter() - t0:.2f}"]], fmt)
+        return
+    if args.comando == "cargar":
+        if fmt == "texto":
+            sesion.cargar()  # cargar_datos ya muestra los totales
+            return
+        with redirect_stdout(sys.stderr):
+            sesion.cargar()
+        emitir(["clientes", "eventos", "ventas"],
+               [[len(sesion.clientes), len(sesion.eventos), sesion.stats.n_ventas]], fmt)
+        return
+    if not sesion.cargada:
+        # Los mensajes de carga no deben mezclarse con la salida JSON/CSV
+        with redirect_stdout(sys.stderr if fmt != "texto" else sys.stdout):
+            sesion.cargar()
+    if args.comando == "listar":
+        if fmt == "texto":
+            listar(args.tabla, sesion.clientes, sesion.eventos, sesion.ventas)
+        else:
+            emitir(COLUMNAS_LISTADO[args.tabla], _filas_tabla(args.tabla, sesion), fmt)
+    elif args.comando == "stats":
+        if args.verificar:
+            for diferencia in sesion.stats.verificar(sesion.eventos, sesion.ventas):
+                print(f"Diferencia: {diferencia}", file=sys.stderr)
+        if fmt == "texto":
+            mostrar_estadisticas(sesion.eventos, sesion.ventas, sesion.evt_index, sesion.stats, sesion.cli_index)
+            return
+        itot, por_evt, cats, dias, (pmin, pmax, pmedia) = sesion.stats.resumen()
+        # Rankings y percentiles, como en el modo texto
+        analitica = sesion.stats.analitica_de(sesion.ventas)
+        cli, evt = sesion.cli_index, sesion.evt_index
+        if fmt == "json":
+            print(json.dumps({"ingresos_totales": itot,
+                              "ingresos_por_evento": {str(k): v for k, v in por_evt.items()},
+                              "categorias": sorted(cats), "dias_hasta_proximo": dias,
+                              "precios": {"min": pmin, "max": pmax, "media": pmedia},
+                              "top_clientes": [{"id": cid, "nombre": cli[cid].nombre if cid in cli else f"Cliente {cid}",
+                                                "ingresos": total} for cid, total in analitica.top_clientes()],
+                              "top_eventos_por_categoria": {
+                                  cat: [{"id": eid, "nombre": evt[eid].nombre if eid in evt else f"Evento {eid}",
+                                         "ingresos": total} for eid, total in top]
+                                  for cat, top in analitica.top_eventos_por_categoria(evt).items()},
+                              "percentiles": {medida: {_pct(q): v for q, v in valores.items()}
+                                              for medida, valores in analitica.percentiles().items()}},
+                             ensure_ascii=False))
+        else:
+            # La columna nombre va al final para no mover las que ya había
+            _, filas_analitica = _filas_analitica(analitica, cli, evt)
+            emitir(["metrica", "valor", "nombre"],
+                   [["ingresos_totales", f"{itot:.2f}", ""], ["categorias", ",".join(sorted(cats)), ""],
+                    ["dias_hasta_proximo", dias, ""], ["precio_min", pmin, ""], ["precio_max", pmax, ""],
+                    ["precio_media", pmedia, ""]]
+                   + [[f"ingresos_evento_{k}", f"{v:.2f}", ""] for k, v in por_evt.items()]
+                   + [[f"{seccion}_{clave}", valor, nombre] for seccion, clave, nombre, valor in filas_analitica], fmt)
+    elif args.comando == "filtrar":
+        if isinstance(sesion.ventas, VentasSQLite):
+            filas = sesion.ventas.filas_rango(args.desde, args.hasta)
+        elif sesion.join is not None:
+            filas = sesion.join.filas(sesion.ventas.indexar().posiciones_rango(args.desde, args.hasta))
+        else:
+            cli, evt = sesion.cli_index, sesion.evt_index
+            filas = ([v.fecha_venta, cli[v.cliente_id].nombre if v.cliente_id in cli else "?",
+                      *((evt[v.evento_id].nombre, evt[v.evento_id].categoria) if v.evento_id in evt else ("?", "?")),
+                      f"{v.total:.2f}"]
+                     for v in ventas_en_rango(sesion.ventas, args.desde, args.hasta))
+        emitir(["fecha", "cliente", "evento", "categoria", "total"], filas, fmt)
+    elif args.comando == "periodos":
+        cubo = sesion.stats.cubo_de(sesion.ventas, sesion.evt_index)
+        filas = cubo.consultar(args.por, args.desde, args.hasta, args.categoria, args.evento)
+        emitir(["periodo", "ventas", "unidades", "ingresos"],
+               ([inicio.isoformat(), n, uds, f"{ingresos:.2f}"] for inicio, n, uds, ingresos in filas), fmt)
+    elif args.comando == "exportar":
+        with redirect_stdout(sys.stderr):
+            path = exportar_informe(sesion.eventos, sesion.ventas, sesion.stats, args.por,
+                                    sesion.evt_index, sesion.cli_index, args.comprimir, sesion.huella)
+        emitir(["informe"], [[path]], fmt)
+    elif args.comando == "importar-clientes":
+        importados, errores = importar_clientes(args.fichero, sesion.clientes, sesion.stats, args.durabilidad,
+                                                sesion.ventas)
+        for c in sesion.clientes[len(sesion.clientes) - importados:]:
+            sesion.cli_index[c.id] = c
+        if importados:
+            sesion.huella = None  # Los clientes en memoria ya no son los de la huella
+        emitir(["importados", "errores"], [[importados, errores]], fmt)
+
+def servir(parser: argparse.ArgumentParser, args, sesion: Sesion):
+    """Atiende comandos por stdin (misma sintaxis que la línea de comandos) con los datos en memoria."""
+    with redirect_stdout(sys.stderr):
+        sesion.cargar()
+    for linea in sys.stdin:
+        if not linea.strip():
+            continue
+        try:
+            cmd = parser.parse_args(shlex.split(linea), namespace=argparse.Namespace(**vars(args)))
+        except SystemExit:
+            continue  # argparse ya ha mostrado el error
+        if cmd.comando == "serve":
+            continue
+        try:
+            ejecutar(cmd, sesion)
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
+        sys.stdout.flush()
+
+def main(argv=None):
+    """Sin argumentos abre el menú; con ellos ejecuta un subcomando."""
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        menu()
+        return
+    parser = crear_parser()
+    args = parser.parse_args(argv)
+    if args.base:
+        os.chdir(args.base)
+    if args.metricas:
+        INSTRUMENTACION.activar(args.metricas)
+    sesion = Sesion(args.streaming, args.usar_snapshot, args.procesos, args.backend, args.compartido,
+                    args.perezosas)
+    if args.comando == "serve":
+        servir(parser, args, sesion)
+        return
+    ejecutar(args, sesion)
+
+
+# ============================================================
+# 8. Punto de entrada
 # ============================================================
 if __name__ == "__main__":
-    menu()
+    main()
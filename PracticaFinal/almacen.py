@@ -0,0 +1,819 @@
+"""Almacenamiento de las ventas y carga de clientes, eventos y ventas desde los CSV.
+
+Las ventas se guardan por columnas (VentasColumnar) con un índice por fecha
+(IndiceFechas) o, si ventas.csv es demasiado grande, se leen en streaming
+(VentasCSV) con un índice por bloques. ventas.csv se puede parsear en varios
+procesos, y clientes y eventos se pueden leer bajo demanda (TablaPerezosa).
+"""
+import csv
+import io
+import os
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from multiprocessing import get_context
+from operator import itemgetter, le, methodcaller, mul
+from heapq import merge
+from itertools import accumulate, chain, compress, islice
+from typing import List, Dict, Tuple, Iterable, Iterator
+
+from comun import (CLIENTES_CSV, EVENTOS_CSV, VENTAS_CSV, TAM_LOTE, COLUMNAS_VENTAS, UMBRAL_PARALELO,
+                   MIN_PENDIENTES_INDICE, Cliente, Evento, Venta, _tam, parse_bool, parse_date, parse_lote_ventas,
+                   es_cabecera, _lineas_hasta, iter_csv, safe_read_csv, iter_lotes)
+from instrumentacion import instrumentado
+from persistencia import tam_consistente
+
+COLUMNAS_INDICE = ("posiciones", "fechas", "acum_unidades", "acum_ingresos")  # Columnas de IndiceFechas
+
+
+def _a_array(col) -> array:
+    """Copia a un array una columna que sea una vista (memoryview) de un snapshot compartido."""
+    if isinstance(col, array):
+        return col
+    copia = array(col.format)
+    copia.frombytes(col.cast("B"))
+    return copia
+
+
+# ============================================================
+# Almacén de ventas en memoria
+# ============================================================
+
+class VentasColumnar:
+    """Almacén de ventas por columnas (arrays tipados).
+
+    Cada venta ocupa unos 36 bytes repartidos en seis arrays en lugar de un
+    objeto por fila; la fecha se guarda como ordinal. Los objetos Venta se
+    crean solo al acceder a una fila concreta.
+    """
+    def __init__(self):
+        self.id = array("q")
+        self.cliente_id = array("q")
+        self.evento_id = array("q")
+        self.fecha = array("i")            # date.toordinal()
+        self.unidades = array("i")
+        self.precio_unitario = array("d")
+        self._indice = None
+
+    def _escribible(self):
+        """Copia a arrays las columnas que sean vistas de solo lectura de un snapshot compartido."""
+        if isinstance(self.id, array):
+            return
+        for col in COLUMNAS_VENTAS:
+            setattr(self, col, _a_array(getattr(self, col)))
+        if self._indice is not None:
+            for col in COLUMNAS_INDICE:
+                setattr(self._indice, col, _a_array(getattr(self._indice, col)))
+
+    def append_fila(self, id_: int, cliente_id: int, evento_id: int, fecha_ordinal: int,
+                    unidades: int, precio_unitario: float):
+        """Añade una venta a partir de sus valores ya convertidos."""
+        self._escribible()
+        self.id.append(id_)
+        self.cliente_id.append(cliente_id)
+        self.evento_id.append(evento_id)
+        self.fecha.append(fecha_ordinal)
+        self.unidades.append(unidades)
+        self.precio_unitario.append(precio_unitario)
+        if self._indice is not None:
+            self._indice.anadir(len(self.id) - 1)
+
+    def extend_columnas(self, columnas: Tuple[array, ...]):
+        """Añade un bloque de ventas ya convertido a columnas (en el orden de COLUMNAS_VENTAS)."""
+        self._escribible()
+        n = len(self.id)
+        for col, valores in zip(COLUMNAS_VENTAS, columnas):
+            getattr(self, col).extend(valores)
+        if self._indice is not None:
+            for i in range(n, len(self.id)):
+                self._indice.anadir(i)
+
+    def append(self, v: Venta):
+        """Añade un objeto Venta al almacén."""
+        self.append_fila(v.id, v.cliente_id, v.evento_id, v.fecha_venta.toordinal(),
+                         v.unidades, v.precio_unitario)
+
+    def extend(self, ventas: Iterable[Venta]):
+        for v in ventas:
+            self.append(v)
+
+    def __len__(self):
+        return len(self.id)
+
+    def __getitem__(self, i: int) -> Venta:
+        return Venta(self.id[i], self.cliente_id[i], self.evento_id[i],
+                     date.fromordinal(self.fecha[i]), self.unidades[i], self.precio_unitario[i])
+
+    def __iter__(self) -> Iterator[Venta]:
+        for i in range(len(self.id)):
+            yield self[i]
+
+    # --- Operaciones vectorizadas ---
+    def totales(self) -> array:
+        """Importe de cada venta (unidades * precio) en un array."""
+        return array("d", map(mul, self.unidades, self.precio_unitario))
+
+    def ingresos_totales(self) -> float:
+        return sum(map(mul, self.unidades, self.precio_unitario))
+
+    def ingresos_por_evento(self) -> Dict[int, float]:
+        """Suma de importes agrupada por evento_id."""
+        por_evento = {}
+        get = por_evento.get
+        for eid, total in zip(self.evento_id, map(mul, self.unidades, self.precio_unitario)):
+            por_evento[eid] = get(eid, 0) + total
+        return por_evento
+
+    def mascara_fechas(self, f_ini: date, f_fin: date) -> bytearray:
+        """Máscara (1/0 por venta) de las ventas con fecha entre f_ini y f_fin."""
+        ini, fin = f_ini.toordinal(), f_fin.toordinal()
+        return bytearray(ini <= f <= fin for f in self.fecha)
+
+    def filtrar(self, mascara: bytearray) -> Iterator[Venta]:
+        """Devuelve las ventas marcadas en la máscara."""
+        for i in range(len(mascara)):
+            if mascara[i]:
+                yield self[i]
+
+    # --- Consultas por fecha (índice) ---
+    def indexar(self) -> "IndiceFechas":
+        """Construye (si no existe) el índice por fecha y lo devuelve."""
+        if self._indice is None:
+            self._indice = IndiceFechas(self)
+        return self._indice
+
+    def rango(self, f_ini: date, f_fin: date) -> Iterator[Venta]:
+        """Ventas entre f_ini y f_fin (ambas incluidas), ordenadas por fecha."""
+        for i in self.indexar().posiciones_rango(f_ini, f_fin):
+            yield self[i]
+
+    def agregado_rango(self, f_ini: date, f_fin: date) -> Tuple[int, int, float]:
+        """(nº de ventas, unidades, ingresos) entre dos fechas sin recorrerlas."""
+        return self.indexar().agregados(f_ini, f_fin)
+
+
+class IndiceFechas:
+    """Índice por fecha de un VentasColumnar.
+
+    Mantiene las posiciones de las ventas ordenadas por fecha y las sumas
+    acumuladas de unidades e ingresos: un rango se localiza con bisect en
+    O(log n) y sus agregados salen de restar dos acumulados. Las ventas que
+    llegan en orden se añaden al final; las desordenadas esperan en una lista
+    de pendientes que se funde con el índice cuando crece demasiado.
+    """
+    def __init__(self, ventas: VentasColumnar, columnas: Dict[str, array] = None):
+        self.ventas = ventas
+        if columnas is None:
+            self.reconstruir()
+        else:
+            # Índice ya calculado (p. ej. leído de un snapshot)
+            self.posiciones = columnas["posiciones"]
+            self.fechas = columnas["fechas"]
+            self.acum_unidades = columnas["acum_unidades"]
+            self.acum_ingresos = columnas["acum_ingresos"]
+            self.pendientes = []
+
+    def reconstruir(self):
+        """Reordena todas las ventas por fecha y recalcula los acumulados."""
+        v = self.ventas
+        orden = sorted(range(len(v)), key=v.fecha.__getitem__)
+        fechas, unidades, precios = v.fecha, v.unidades, v.precio_unitario
+        uds_ordenadas = [unidades[i] for i in orden]
+        self.posiciones = array("q", orden)
+        self.fechas = array("i", [fechas[i] for i in orden])
+        self.acum_unidades = array("q", accumulate(uds_ordenadas, initial=0))
+        self.acum_ingresos = array("d", accumulate(map(mul, uds_ordenadas, [precios[i] for i in orden]), initial=0.0))
+        self.pendientes = []
+
+    def _acumular(self, i: int):
+        v = self.ventas
+        self.acum_unidades.append(self.acum_unidades[-1] + v.unidades[i])
+        self.acum_ingresos.append(self.acum_ingresos[-1] + v.unidades[i] * v.precio_unitario[i])
+
+    def anadir(self, i: int):
+        """Registra la venta de la posición i, recién añadida al almacén."""
+        fecha = self.ventas.fecha[i]
+        if not self.fechas or fecha >= self.fechas[-1]:
+            self.posiciones.append(i)
+            self.fechas.append(fecha)
+            self._acumular(i)
+            return
+        self.pendientes.append(i)
+        if len(self.pendientes) > max(MIN_PENDIENTES_INDICE, len(self.fechas) // 64):
+            self.reconstruir()
+
+    def _pendientes_en(self, ini: int, fin: int) -> List[int]:
+        fechas = self.ventas.fecha
+        return sorted((i for i in self.pendientes if ini <= fechas[i] <= fin), key=fechas.__getitem__)
+
+    def posiciones_rango(self, f_ini: date, f_fin: date) -> List[int]:
+        """Posiciones de las ventas del rango en O(log n + k), ordenadas por fecha."""
+        ini, fin = f_ini.toordinal(), f_fin.toordinal()
+        a, b = bisect_left(self.fechas, ini), bisect_right(self.fechas, fin)
+        base = self.posiciones[a:b]
+        extra = self._pendientes_en(ini, fin)
+        if not extra:
+            return base.tolist()
+        return list(merge(base, extra, key=self.ventas.fecha.__getitem__))
+
+    def agregados(self, f_ini: date, f_fin: date) -> Tuple[int, int, float]:
+        """(nº de ventas, unidades, ingresos) del rango en O(log n)."""
+        ini, fin = f_ini.toordinal(), f_fin.toordinal()
+        a = bisect_left(self.fechas, ini)
+        b = max(a, bisect_right(self.fechas, fin))  # Con f_fin < f_ini el rango está vacío
+        n = b - a
+        unidades = self.acum_unidades[b] - self.acum_unidades[a]
+        ingresos = self.acum_ingresos[b] - self.acum_ingresos[a]
+        v = self.ventas
+        for i in self._pendientes_en(ini, fin):
+            n += 1
+            unidades += v.unidades[i]
+            ingresos += v.unidades[i] * v.precio_unitario[i]
+        return n, unidades, ingresos
+
+
+# ============================================================
+# Carga de datos desde CSV
+# ============================================================
+
+def parse_venta(r: List[str]) -> Venta:
+    """Convierte una fila de ventas.csv en un objeto Venta."""
+    return Venta(int(r[0]), int(r[1]), int(r[2]), parse_date(r[3]), int(r[4]), float(r[5]))
+
+@instrumentado("cargar_ventas", lambda a, k, r: {"filas": len(r), "bytes_leidos": _tam(a[0] if a else k.get("path", VENTAS_CSV))})
+def cargar_ventas_columnar(path: str = VENTAS_CSV, tam_lote: int = TAM_LOTE) -> VentasColumnar:
+    """Lee ventas.csv por lotes directamente al almacén columnar, sin crear objetos Venta."""
+    ventas = VentasColumnar()
+    for lote in iter_lotes(iter_csv(path, numeradas=True), tam_lote):
+        lineas, filas = zip(*lote)
+        for linea, r, msg in anadir_lote_ventas(ventas, filas, lineas):
+            print(f"Error en venta {r} (línea {linea}): {msg}")
+    return ventas
+
+def anadir_lote_ventas(ventas: VentasColumnar, lote: List[List[str]], lineas: List[int]) -> List[Tuple[int, List[str], str]]:
+    """Añade un lote de filas de ventas.csv al almacén y devuelve las erróneas como (línea, fila, mensaje).
+
+    El lote se convierte de una vez por columnas; si alguna fila está mal
+    formada se repite fila a fila para saber cuáles fallan.
+    """
+    try:
+        ventas.extend_columnas(parse_lote_ventas(lote))
+        return []
+    except Exception:
+        pass
+    errores = []
+    for linea, r in zip(lineas, lote):
+        try:
+            ventas.append_fila(int(r[0]), int(r[1]), int(r[2]), parse_date(r[3]).toordinal(),
+                               int(r[4]), float(r[5]))
+        except Exception as e:
+            errores.append((linea, r, str(e)))
+    return errores
+
+# ------------------------------
+# Carga paralela de ventas.csv
+# ------------------------------
+def trozos_fichero(path: str, n: int) -> List[Tuple[int, int]]:
+    """Divide un fichero en como mucho n rangos de bytes [inicio, fin) que acaban en salto de línea.
+
+    Solo es válido para CSV sin saltos de línea dentro de campos entrecomillados,
+    como ventas.csv (todas sus columnas son números o fechas).
+    """
+    tam = os.path.getsize(path)
+    cortes = [0]
+    with open(path, "rb") as f:
+        for k in range(1, n):
+            f.seek(max(tam * k // n, cortes[-1]))
+            f.readline()
+            pos = f.tell()
+            if pos >= tam:
+                break
+            if pos > cortes[-1]:
+                cortes.append(pos)
+    cortes.append(tam)
+    return list(zip(cortes, cortes[1:]))
+
+def _parsear_trozo(path: str, inicio: int, fin: int, tam_lote: int = TAM_LOTE):
+    """Parsea un rango de bytes de ventas.csv (se ejecuta en un proceso hijo).
+
+    Devuelve las columnas como bytes (no objetos Venta), la lista de filas
+    erróneas como (línea relativa al trozo, fila, mensaje) y el número de
+    líneas del trozo, para que el proceso principal calcule las líneas reales.
+    """
+    with open(path, "rb") as f:
+        f.seek(inicio)
+        texto = f.read(fin - inicio).decode("utf-8")
+    reader = csv.reader(io.StringIO(texto, newline=""), delimiter=";", quotechar='"')
+    columnas = VentasColumnar()
+    errores = []
+    lote, lineas = [], []
+    for r in reader:
+        if inicio == 0 and reader.line_num == 1 and es_cabecera(r):
+            continue
+        lote.append(r)
+        lineas.append(reader.line_num)
+        if len(lote) >= tam_lote:
+            errores += anadir_lote_ventas(columnas, lote, lineas)
+            lote, lineas = [], []
+    if lote:
+        errores += anadir_lote_ventas(columnas, lote, lineas)
+    datos = tuple(getattr(columnas, col).tobytes() for col in COLUMNAS_VENTAS)
+    return datos, errores, reader.line_num
+
+@instrumentado("cargar_ventas_paralelo", lambda a, k, r: {"filas": len(r), "bytes_leidos": _tam(a[0] if a else k.get("path", VENTAS_CSV))})
+def cargar_ventas_paralelo(path: str = VENTAS_CSV, procesos: int = None) -> VentasColumnar:
+    """Lee ventas.csv repartiendo trozos del fichero entre varios procesos.
+
+    Los resultados se unen en el orden del fichero y los errores se muestran
+    con su número de línea original.
+    """
+    ventas = VentasColumnar()
+    if not os.path.exists(path):
+        print(f"No se encontró {path}.")
+        return ventas
+    procesos = procesos or os.cpu_count() or 1
+    trozos = trozos_fichero(path, procesos)
+    # spawn: la carga llama a esto desde un hilo, y hacer fork de un proceso con
+    # varios hilos en marcha puede dejar bloqueado al hijo
+    with ProcessPoolExecutor(max_workers=min(procesos, len(trozos)), mp_context=get_context("spawn")) as pool:
+        resultados = pool.map(_parsear_trozo, [path] * len(trozos), *zip(*trozos))
+        lineas_previas = 0
+        for datos, errores, n_lineas in resultados:
+            for linea, r, msg in errores:
+                print(f"Error en venta {r} (línea {lineas_previas + linea}): {msg}")
+            for col, bloque in zip(COLUMNAS_VENTAS, datos):
+                getattr(ventas, col).frombytes(bloque)
+            lineas_previas += n_lineas
+    return ventas
+
+
+def iter_lotes_ventas(path: str = VENTAS_CSV, tam_lote: int = TAM_LOTE) -> Iterator[List[Venta]]:
+    """Lee ventas.csv por lotes de ventas ya parseadas; la memoria no depende del tamaño del fichero."""
+    for lote in iter_lotes(iter_csv(path, numeradas=True), tam_lote):
+        ventas = []
+        for linea, r in lote:
+            try:
+                ventas.append(parse_venta(r))
+            except Exception as e:
+                print(f"Error en venta {r} (línea {linea}): {e}")
+        yield ventas
+
+
+# ------------------------------
+# Índice por fecha en streaming
+# ------------------------------
+# En streaming las ventas no están en memoria, así que el índice no puede
+# guardar la posición de cada una. Al cargar se recorre ventas.csv una vez
+# por bloques de TAM_LOTE líneas y se anota dónde empieza cada bloque (byte)
+# y sus fechas mínima y máxima, además de las ventas, unidades e ingresos de
+# cada día y los ingresos por evento. Ocupa memoria según el número de
+# bloques, días y eventos, no de ventas. En esa misma pasada se obtienen los
+# totales que necesitan las estadísticas.
+
+def _indexar_trozo(path: str, inicio: int, fin: int, tam_lote: int = TAM_LOTE):
+    """Recorre un rango de bytes de ventas.csv por bloques sin guardar las ventas.
+
+    Devuelve los bloques como (byte de inicio, fecha mínima, fecha máxima),
+    [ventas, unidades, ingresos] por día, los ingresos por evento, las filas
+    erróneas y el número de líneas, como _parsear_trozo.
+    """
+    bloques, dias, por_evento, errores = [], {}, {}, []
+    n_lineas = 0
+
+    def volcar(inicio_bloque: int, lineas: List[bytes]):
+        filas = list(csv.reader([l.decode("utf-8") for l in lineas], delimiter=";", quotechar='"'))
+        numeros = list(range(n_lineas + 1, n_lineas + len(filas) + 1))
+        if inicio_bloque == 0 and filas and es_cabecera(filas[0]):
+            del filas[0], numeros[0]
+        columnas = VentasColumnar()
+        errores.extend(anadir_lote_ventas(columnas, filas, numeros))
+        if not len(columnas):
+            return
+        bloques.append((inicio_bloque, min(columnas.fecha), max(columnas.fecha)))
+        for fecha, uds, total in zip(columnas.fecha, columnas.unidades, columnas.totales()):
+            dia = dias.get(fecha)
+            if dia is None:
+                dias[fecha] = [1, uds, total]
+            else:
+                dia[0] += 1
+                dia[1] += uds
+                dia[2] += total
+        for eid, total in columnas.ingresos_por_evento().items():
+            por_evento[eid] = por_evento.get(eid, 0) + total
+
+    with open(path, "rb") as f:
+        f.seek(inicio)
+        pos = inicio_bloque = inicio
+        lineas = []
+        for linea in f:
+            lineas.append(linea)
+            pos += len(linea)
+            if len(lineas) >= tam_lote or pos >= fin:
+                volcar(inicio_bloque, lineas)
+                n_lineas += len(lineas)
+                inicio_bloque, lineas = pos, []
+                if pos >= fin:
+                    break
+        if lineas:
+            volcar(inicio_bloque, lineas)
+            n_lineas += len(lineas)
+    return bloques, dias, por_evento, errores, n_lineas
+
+
+class IndiceVentasCSV:
+    """Índice por fecha de un VentasCSV (ver _indexar_trozo).
+
+    Los agregados de un rango salen, como en IndiceFechas, de restar dos
+    sumas acumuladas (por día) en O(log d). Las ventas de un rango se leen
+    saltando a los bloques cuyas fechas lo cortan: si ventas.csv está más o
+    menos ordenado por fecha, solo se lee una parte pequeña del fichero.
+    """
+    def __init__(self, fin: int, inicios: array, minimos: array, maximos: array, fechas: array,
+                 acum_ventas: array, acum_unidades: array, acum_ingresos: array, por_evento: Dict[int, float]):
+        self.fin = fin                  # Bytes de ventas.csv indexados
+        self.inicios = inicios          # Byte donde empieza cada bloque
+        self.minimos = minimos          # Fecha mínima y máxima (ordinales) de cada bloque
+        self.maximos = maximos
+        self.fechas = fechas            # Días con ventas, ordenados
+        self.acum_ventas = acum_ventas  # Acumulados por día, con un 0 delante
+        self.acum_unidades = acum_unidades
+        self.acum_ingresos = acum_ingresos
+        self.por_evento = por_evento
+
+    @classmethod
+    def desde_trozos(cls, fin: int, resultados: Iterable[Tuple]) -> "IndiceVentasCSV":
+        """Une, en el orden del fichero, los resultados de _indexar_trozo y muestra sus errores."""
+        inicios, minimos, maximos = array("q"), array("i"), array("i")
+        dias, por_evento = {}, {}
+        lineas_previas = 0
+        for bloques, dias_trozo, evts_trozo, errores, n_lineas in resultados:
+            for linea, r, msg in errores:
+                print(f"Error en venta {r} (línea {lineas_previas + linea}): {msg}")
+            for inicio, fmin, fmax in bloques:
+                inicios.append(inicio)
+                minimos.append(fmin)
+                maximos.append(fmax)
+            for fecha, (n, uds, ingresos) in dias_trozo.items():
+                dia = dias.setdefault(fecha, [0, 0, 0])
+                dia[0] += n
+                dia[1] += uds
+                dia[2] += ingresos
+            for eid, total in evts_trozo.items():
+                por_evento[eid] = por_evento.get(eid, 0) + total
+            lineas_previas += n_lineas
+        orden = sorted(dias)
+        return cls(fin, inicios, minimos, maximos, array("i", orden),
+                   array("q", accumulate((dias[d][0] for d in orden), initial=0)),
+                   array("q", accumulate((dias[d][1] for d in orden), initial=0)),
+                   array("d", accumulate((dias[d][2] for d in orden), initial=0.0)),
+                   por_evento)
+
+    def __len__(self):
+        return self.acum_ventas[-1]
+
+    def agregados(self, f_ini: date, f_fin: date) -> Tuple[int, int, float]:
+        """(nº de ventas, unidades, ingresos) del rango en O(log d)."""
+        a = bisect_left(self.fechas, f_ini.toordinal())
+        b = max(a, bisect_right(self.fechas, f_fin.toordinal()))  # Con f_fin < f_ini el rango está vacío
+        return (self.acum_ventas[b] - self.acum_ventas[a], self.acum_unidades[b] - self.acum_unidades[a],
+                self.acum_ingresos[b] - self.acum_ingresos[a])
+
+    def bloques_rango(self, f_ini: date, f_fin: date) -> List[Tuple[int, int]]:
+        """Rangos de bytes [inicio, fin) que pueden tener ventas entre f_ini y f_fin (contiguos, unidos)."""
+        ini, fin = f_ini.toordinal(), f_fin.toordinal()
+        rangos = []
+        for k in range(len(self.inicios)):
+            if self.minimos[k] > fin or self.maximos[k] < ini:
+                continue
+            desde = self.inicios[k]
+            hasta = self.inicios[k + 1] if k + 1 < len(self.inicios) else self.fin
+            if rangos and rangos[-1][1] == desde:
+                rangos[-1] = (rangos[-1][0], hasta)
+            else:
+                rangos.append((desde, hasta))
+        return rangos
+
+
+class VentasCSV:
+    """Ventas leídas bajo demanda desde el CSV: cada recorrido vuelve a leer el fichero por lotes.
+
+    Con el índice (ver indexar) el número de ventas, los ingresos y los
+    agregados por fecha no necesitan recorrer el fichero, y rango() lee solo
+    los bloques que pueden contener el rango. El índice refleja el fichero
+    tal como estaba al indexarlo.
+    """
+    def __init__(self, path: str = VENTAS_CSV, tam_lote: int = TAM_LOTE):
+        self.path = path
+        self.tam_lote = tam_lote
+        self._indice = None
+
+    def lotes(self) -> Iterator[List[Venta]]:
+        return iter_lotes_ventas(self.path, self.tam_lote)
+
+    def __iter__(self) -> Iterator[Venta]:
+        for lote in self.lotes():
+            yield from lote
+
+    def __bool__(self):
+        return os.path.exists(self.path) and os.path.getsize(self.path) > 0
+
+    def __len__(self):
+        return len(self.indexar())
+
+    def indexar(self, procesos: int = 1) -> IndiceVentasCSV:
+        """Construye (si no existe) el índice recorriendo el fichero una vez y lo devuelve.
+
+        Con procesos > 1 el fichero se reparte en trozos como en
+        cargar_ventas_paralelo y cada proceso indexa el suyo.
+        """
+        if self._indice is None:
+            fin = _tam(self.path)
+            if not fin:
+                self._indice = IndiceVentasCSV.desde_trozos(0, [])
+            elif procesos > 1:
+                trozos = trozos_fichero(self.path, procesos)
+                with ProcessPoolExecutor(max_workers=min(procesos, len(trozos)),
+                                         mp_context=get_context("spawn")) as pool:
+                    resultados = pool.map(_indexar_trozo, [self.path] * len(trozos), *zip(*trozos),
+                                          [self.tam_lote] * len(trozos))
+                    self._indice = IndiceVentasCSV.desde_trozos(trozos[-1][1], resultados)
+            else:
+                self._indice = IndiceVentasCSV.desde_trozos(fin, [_indexar_trozo(self.path, 0, fin, self.tam_lote)])
+        return self._indice
+
+    def ingresos_totales(self) -> float:
+        return self.indexar().acum_ingresos[-1]
+
+    def ingresos_por_evento(self) -> Dict[int, float]:
+        return dict(self.indexar().por_evento)
+
+    def rango(self, f_ini: date, f_fin: date) -> Iterator[Venta]:
+        """Ventas entre f_ini y f_fin (ambas incluidas), en el orden del fichero."""
+        with open(self.path, "rb") as f:
+            for inicio, fin in self.indexar().bloques_rango(f_ini, f_fin):
+                f.seek(inicio)
+                for r in csv.reader(_lineas_hasta(f, fin - inicio), delimiter=";", quotechar='"'):
+                    try:
+                        v = parse_venta(r)
+                    except Exception:
+                        continue  # Cabecera o fila errónea (ya se informó al cargar)
+                    if f_ini <= v.fecha_venta <= f_fin:
+                        yield v
+
+    def agregado_rango(self, f_ini: date, f_fin: date) -> Tuple[int, int, float]:
+        """(nº de ventas, unidades, ingresos) entre dos fechas sin leer el fichero."""
+        return self.indexar().agregados(f_ini, f_fin)
+
+
+# ------------------------------
+# Clientes y eventos bajo demanda
+# ------------------------------
+# Con millones de clientes, parsear clientes.csv entero al arrancar cuesta
+# segundos y mucha memoria aunque luego solo se consulten unos pocos.
+# TablaPerezosa recorre el fichero una vez y anota solo el id y la posición
+# (byte y longitud) de cada fila, en arrays. Una consulta por id salta a su
+# línea, la parsea y guarda el objeto para la siguiente vez; recorrer la
+# tabla entera vuelve a leer el fichero sin guardar nada. Los errores de una
+# fila se ven al acceder a ella, no al cargar.
+TAM_TROZO_ESCANEO = 8 * 1024 * 1024  # Bytes que se leen de una vez al indexar
+
+def _cliente_de_fila(r: List[str]) -> Cliente:
+    return Cliente(int(r[0]), r[1], r[2], parse_date(r[3]), parse_bool(r[4]))
+
+def _evento_de_fila(r: List[str]) -> Evento:
+    return Evento(int(r[0]), r[1], r[2], parse_date(r[3]), float(r[4]))
+
+
+class TablaPerezosa:
+    """Índice por id de un CSV (clientes o eventos) que parsea cada fila al pedirla.
+
+    Se usa igual que el dict cli_index/evt_index: get, [], in, len, items().
+    Las altas posteriores a la carga se guardan aparte, en memoria. Solo se
+    indexan los primeros `hasta` bytes (ver tam_consistente); como el CSV
+    solo crece por el final, las posiciones anotadas no caducan.
+    """
+    def __init__(self, path: str, crear, nombre: str, hasta: int = None):
+        self.path = path
+        self.crear = crear          # fila (lista de str) -> Cliente/Evento
+        self.nombre = nombre        # "cliente" o "evento", para los mensajes de error
+        self.ids = array("q")       # en el orden del fichero
+        self.inicios = array("q")   # byte donde empieza cada fila
+        self.longitudes = array("l")
+        self.orden = None           # posiciones ordenadas por id; None si el fichero ya lo está
+        self.cache = {}             # id -> objeto ya parseado (None si la fila no es válida)
+        self.nuevos = {}            # id -> objeto dado de alta tras la carga
+        self._cerrojo = threading.Lock()  # seek + read desde varios hilos (informes en segundo plano)
+        try:
+            self._f = open(path, "rb")
+        except FileNotFoundError:
+            print(f"No se encontró {path}.")
+            self._f, self.hasta = None, 0
+            return
+        self.hasta = os.fstat(self._f.fileno()).st_size if hasta is None else hasta
+        self._indexar()
+
+    def _indexar(self):
+        # Todo con map/compress sobre las líneas de cada trozo, sin un bucle Python por fila
+        cabeza = itemgetter(0)
+        separar = methodcaller("partition", b";")
+        base, leidos, resto = 0, 0, b""
+        while leidos < self.hasta:
+            bloque = self._f.read(min(TAM_TROZO_ESCANEO, self.hasta - leidos))
+            if not bloque:
+                break
+            leidos += len(bloque)
+            trozo = resto + bloque
+            # La última línea del trozo puede estar cortada: pasa al siguiente
+            corte = len(trozo) if leidos >= self.hasta else trozo.rfind(b"\n") + 1
+            lineas = trozo[:corte].split(b"\n")
+            longitudes = list(map(len, lineas))
+            primeros = list(map(cabeza, map(separar, lineas)))
+            validas = list(map(bytes.isdigit, primeros))  # Descarta cabecera y líneas vacías
+            self.ids.extend(map(int, compress(primeros, validas)))
+            self.inicios.extend(compress(accumulate(map((1).__add__, longitudes), initial=base), validas))
+            self.longitudes.extend(compress(longitudes, validas))
+            resto = trozo[corte:]
+            base += corte
+        ids = self.ids
+        if not all(map(le, ids, islice(ids, 1, None))):
+            # sorted es estable: con ids repetidos gana la última fila, como en el dict
+            self.orden = array("q", sorted(range(len(ids)), key=ids.__getitem__))
+            self._ids_ordenados = array("q", (ids[p] for p in self.orden))
+
+    def _posicion(self, id_: int) -> int:
+        """Posición (orden en el fichero) de la fila con ese id, o -1."""
+        claves = self.ids if self.orden is None else self._ids_ordenados
+        i = bisect_right(claves, id_) - 1
+        if i < 0 or claves[i] != id_:
+            return -1
+        return i if self.orden is None else self.orden[i]
+
+    def _parsear(self, pos: int):
+        with self._cerrojo:
+            self._f.seek(self.inicios[pos])
+            linea = self._f.read(self.longitudes[pos]).decode("utf-8")
+        r = next(csv.reader([linea], delimiter=";", quotechar='"'))
+        try:
+            return self.crear(r)
+        except Exception as e:
+            print(f"Error en {self.nombre} {r}: {e}")
+            return None
+
+    def en_posicion(self, pos: int):
+        """Objeto de la fila pos del fichero (None si no es válida)."""
+        id_ = self.ids[pos]
+        if id_ not in self.cache:
+            self.cache[id_] = self._parsear(pos)
+        return self.cache[id_]
+
+    def get(self, id_: int, defecto=None):
+        obj = self.nuevos.get(id_)
+        if obj is not None:
+            return obj
+        try:
+            obj = self.cache[id_]
+        except KeyError:
+            pos = self._posicion(id_)
+            if pos < 0:
+                return defecto  # Los ids que no existen no se guardan
+            obj = self.cache[id_] = self._parsear(pos)
+        return defecto if obj is None else obj
+
+    def __getitem__(self, id_: int):
+        obj = self.get(id_)
+        if obj is None:
+            raise KeyError(id_)
+        return obj
+
+    def __contains__(self, id_: int) -> bool:
+        return self.get(id_) is not None
+
+    def __setitem__(self, id_: int, obj):
+        if self._posicion(id_) >= 0:
+            self.cache[id_] = obj
+        else:
+            self.nuevos[id_] = obj
+
+    def __len__(self) -> int:
+        return len(self.ids) + len(self.nuevos)
+
+    def __iter__(self) -> Iterator[int]:
+        return chain(self.ids, self.nuevos)
+
+    keys = __iter__
+
+    def values(self) -> Iterator:
+        """Objetos en el orden del fichero y después las altas (se releen del CSV sin guardarlos)."""
+        if self._f is not None:
+            for r in iter_csv(self.path, self.hasta):
+                try:
+                    obj = self.crear(r)
+                except Exception as e:
+                    print(f"Error en {self.nombre} {r}: {e}")
+                    continue
+                yield self.cache.get(obj.id) or obj
+        yield from self.nuevos.values()
+
+    def items(self) -> Iterator[Tuple[int, object]]:
+        return ((obj.id, obj) for obj in self.values())
+
+
+class FilasPerezosas:
+    """Una TablaPerezosa vista como la lista de clientes o de eventos.
+
+    Admite len, recorrido, append (altas) y acceso por posición o por corte.
+    """
+    def __init__(self, tabla: TablaPerezosa):
+        self.tabla = tabla
+
+    def __len__(self) -> int:
+        return len(self.tabla)
+
+    def __iter__(self) -> Iterator:
+        return self.tabla.values()
+
+    def append(self, obj):
+        self.tabla[obj.id] = obj
+
+    def ids(self) -> Iterator[int]:
+        """Ids de todas las filas sin parsearlas."""
+        return iter(self.tabla)
+
+    def __getitem__(self, i):
+        posiciones = range(len(self))[i]
+        n = len(self.tabla.ids)
+        nuevos = list(self.tabla.nuevos.values())
+
+        def fila(p):
+            return self.tabla.en_posicion(p) if p < n else nuevos[p - n]
+
+        if isinstance(i, slice):
+            return [fila(p) for p in posiciones]
+        return fila(posiciones)
+
+
+# ------------------------------
+# Carga de las tres tablas
+# ------------------------------
+
+def cargar_clientes(path: str = CLIENTES_CSV, perezosa: bool = False) -> Tuple[List[Cliente], Dict[int, Cliente]]:
+    """Lee clientes.csv y devuelve la lista de clientes y su índice por id.
+
+    Con perezosa=True solo se indexa el fichero: devuelve una FilasPerezosas
+    y su TablaPerezosa, que parsean cada cliente cuando se pide.
+    """
+    # Lectura consistente: las altas que otro proceso esté escribiendo no se ven a medias
+    hasta = tam_consistente(path)
+    if perezosa:
+        tabla = TablaPerezosa(path, _cliente_de_fila, "cliente", hasta)
+        return FilasPerezosas(tabla), tabla
+    clientes = []
+    cli_index = {}
+    for r in safe_read_csv(path, hasta):
+        try:
+            c = _cliente_de_fila(r)
+            clientes.append(c)
+            cli_index[c.id] = c
+        except Exception as e:
+            print(f"Error en cliente {r}: {e}")
+    return clientes, cli_index
+
+
+def cargar_eventos(path: str = EVENTOS_CSV, perezosa: bool = False) -> Tuple[List[Evento], Dict[int, Evento]]:
+    """Lee eventos.csv y devuelve la lista de eventos y su índice por id (perezosos, como en cargar_clientes)."""
+    if perezosa:
+        tabla = TablaPerezosa(path, _evento_de_fila, "evento")
+        return FilasPerezosas(tabla), tabla
+    eventos = []
+    evt_index = {}
+    for r in safe_read_csv(path):
+        try:
+            e = _evento_de_fila(r)
+            eventos.append(e)
+            evt_index[e.id] = e
+        except Exception as e:
+            print(f"Error en evento {r}: {e}")
+    return eventos, evt_index
+
+
+def cargar_ventas(path: str = VENTAS_CSV, streaming: bool = False, procesos: int = None):
+    """Devuelve las ventas en streaming (VentasCSV) o en columnas, ya indexadas.
+
+    En los dos casos ventas.csv se reparte entre varios procesos si es grande
+    (ver cargar_ventas_paralelo).
+    """
+    if procesos is None:
+        grande = os.path.exists(path) and os.path.getsize(path) >= UMBRAL_PARALELO
+        procesos = (os.cpu_count() or 1) if grande else 1
+    if streaming:
+        ventas = VentasCSV(path)
+        ventas.indexar(procesos)
+        return ventas
+    if procesos > 1:
+        ventas = cargar_ventas_paralelo(path, procesos)
+    else:
+        ventas = cargar_ventas_columnar(path)
+    ventas.indexar()
+    return ventas
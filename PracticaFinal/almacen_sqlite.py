@@ -0,0 +1,272 @@
+"""Almacenamiento del CRM en SQLite (opcional, data/crm.sqlite).
+
+Con --backend sqlite (o CRM_BACKEND=sqlite para el menú) los datos se leen
+de data/crm.sqlite en lugar de los CSV. La primera vez la base se crea a
+partir de los CSV (crear_base_sqlite, también con "importar-sqlite"); desde
+entonces las altas van a la base. Clientes y eventos se cargan en memoria
+(son pocos); las ventas se quedan en disco y se consultan con índices.
+totales_evento y totales_dia se mantienen con triggers, de modo que los
+totales por evento y los agregados de un rango de fechas no recorren ventas.
+"""
+import os
+import sqlite3
+import threading
+from datetime import date
+from typing import List, Dict, Tuple, Iterator
+
+from almacen import parse_venta, cargar_clientes, cargar_eventos
+from comun import (CLIENTES_CSV, EVENTOS_CSV, VENTAS_CSV, BASE_SQLITE, TAM_LOTE, DURABILIDADES, TAM_LOTE_FSYNC,
+                   Cliente, Evento, Venta, _tam, parse_date, parse_lote_ventas, iter_csv, iter_lotes)
+from instrumentacion import instrumentado
+from persistencia import EscritorClientes
+
+ESQUEMA_SQLITE = """
+CREATE TABLE IF NOT EXISTS clientes (
+    id INTEGER PRIMARY KEY, nombre TEXT NOT NULL, email TEXT NOT NULL,
+    fecha_alta TEXT NOT NULL, activo INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS eventos (
+    id INTEGER PRIMARY KEY, nombre TEXT NOT NULL, categoria TEXT NOT NULL,
+    fecha TEXT NOT NULL, precio REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS ventas (
+    id INTEGER NOT NULL, cliente_id INTEGER NOT NULL, evento_id INTEGER NOT NULL,
+    fecha TEXT NOT NULL, unidades INTEGER NOT NULL, precio_unitario REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS totales_evento (
+    evento_id INTEGER PRIMARY KEY, ventas INTEGER NOT NULL, unidades INTEGER NOT NULL, ingresos REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS totales_dia (
+    fecha TEXT PRIMARY KEY, ventas INTEGER NOT NULL, unidades INTEGER NOT NULL, ingresos REAL NOT NULL);
+"""
+
+# Se crean después de la importación masiva, que así no paga su mantenimiento
+INDICES_SQLITE = """
+CREATE INDEX IF NOT EXISTS idx_ventas_fecha ON ventas(fecha);
+CREATE INDEX IF NOT EXISTS idx_ventas_evento ON ventas(evento_id);
+CREATE INDEX IF NOT EXISTS idx_ventas_cliente ON ventas(cliente_id);
+CREATE TRIGGER IF NOT EXISTS ventas_totales AFTER INSERT ON ventas BEGIN
+    INSERT INTO totales_evento VALUES (NEW.evento_id, 1, NEW.unidades, NEW.unidades * NEW.precio_unitario)
+        ON CONFLICT(evento_id) DO UPDATE SET ventas = ventas + 1, unidades = unidades + excluded.unidades,
+                                             ingresos = ingresos + excluded.ingresos;
+    INSERT INTO totales_dia VALUES (NEW.fecha, 1, NEW.unidades, NEW.unidades * NEW.precio_unitario)
+        ON CONFLICT(fecha) DO UPDATE SET ventas = ventas + 1, unidades = unidades + excluded.unidades,
+                                         ingresos = ingresos + excluded.ingresos;
+END;
+"""
+
+def _filas_sqlite_ventas(path: str, tam_lote: int = TAM_LOTE) -> Iterator[Tuple]:
+    """Filas de ventas.csv listas para insertar (con la fecha en ISO)."""
+    iso = {}
+    for lote in iter_lotes(iter_csv(path, numeradas=True), tam_lote):
+        lineas, filas = zip(*lote)
+        try:
+            columnas = parse_lote_ventas(filas)
+        except Exception:
+            # Lote con alguna fila incorrecta: se repite fila a fila para informar de cada error
+            for linea, r in lote:
+                try:
+                    v = parse_venta(r)
+                    yield v.id, v.cliente_id, v.evento_id, v.fecha_venta.isoformat(), v.unidades, v.precio_unitario
+                except Exception as e:
+                    print(f"Error en venta {r} (línea {linea}): {e}")
+            continue
+        ids, clis, evts, fechas, uds, precios = columnas
+        for f in set(fechas).difference(iso):
+            iso[f] = date.fromordinal(f).isoformat()
+        yield from zip(ids, clis, evts, map(iso.__getitem__, fechas), uds, precios)
+
+
+@instrumentado("crear_base_sqlite", lambda a, k, r: {"filas": r, "bytes_leidos": _tam(VENTAS_CSV)})
+def crear_base_sqlite(path: str = BASE_SQLITE, reemplazar: bool = False) -> int:
+    """Importa clientes.csv, eventos.csv y ventas.csv a una base SQLite nueva.
+
+    Se escribe en un fichero temporal que se renombra al terminar, así que una
+    importación interrumpida no deja una base a medias. Devuelve el número de
+    ventas importadas.
+    """
+    if os.path.exists(path) and not reemplazar:
+        raise FileExistsError(f"{path} ya existe (usa reemplazar=True para rehacerla)")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    con = sqlite3.connect(tmp)
+    try:
+        # Sin diario ni fsync durante la carga: si falla, se descarta el temporal
+        con.execute("PRAGMA journal_mode = OFF")
+        con.execute("PRAGMA synchronous = OFF")
+        con.executescript(ESQUEMA_SQLITE)
+        clientes, _ = cargar_clientes(CLIENTES_CSV)
+        con.executemany("INSERT INTO clientes VALUES (?, ?, ?, ?, ?)",
+                        ((c.id, c.nombre, c.email, c.fecha_alta.isoformat(), int(c.activo)) for c in clientes))
+        eventos, _ = cargar_eventos(EVENTOS_CSV)
+        con.executemany("INSERT INTO eventos VALUES (?, ?, ?, ?, ?)",
+                        ((e.id, e.nombre, e.categoria, e.fecha_evento.isoformat(), e.precio) for e in eventos))
+        con.executemany("INSERT INTO ventas VALUES (?, ?, ?, ?, ?, ?)", _filas_sqlite_ventas(VENTAS_CSV))
+        n = con.execute("SELECT COUNT(*) FROM ventas").fetchone()[0]
+        for tabla, clave in (("totales_evento", "evento_id"), ("totales_dia", "fecha")):
+            con.execute(f"INSERT INTO {tabla} SELECT {clave}, COUNT(*), SUM(unidades), "
+                        f"SUM(unidades * precio_unitario) FROM ventas GROUP BY {clave}")
+        con.executescript(INDICES_SQLITE)
+        con.execute("ANALYZE")
+        con.commit()
+    finally:
+        con.close()
+    os.replace(tmp, path)
+    return n
+
+
+class VentasSQLite:
+    """Ventas guardadas en SQLite, con la misma interfaz de consulta que VentasColumnar.
+
+    Se recorren en streaming (__iter__, rango) y los agregados se resuelven en
+    SQL. Cada hilo usa su propia conexión (la carga y los informes en segundo
+    plano corren en otros hilos).
+    """
+    def __init__(self, path: str = BASE_SQLITE):
+        self.path = path
+        self._local = threading.local()
+
+    def conexion(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = self._local.con = sqlite3.connect(self.path)
+            con.execute("PRAGMA journal_mode = WAL")
+        return con
+
+    def cerrar(self):
+        con = getattr(self._local, "con", None)
+        if con is not None:
+            con.close()
+            self._local.con = None
+
+    # --- Tablas pequeñas (se cargan enteras) ---
+    def clientes(self) -> Tuple[List[Cliente], Dict[int, Cliente]]:
+        clientes = [Cliente(id_, nombre, email, date.fromisoformat(f), bool(activo)) for id_, nombre, email, f, activo
+                    in self.conexion().execute("SELECT id, nombre, email, fecha_alta, activo FROM clientes ORDER BY id")]
+        return clientes, {c.id: c for c in clientes}
+
+    def eventos(self) -> Tuple[List[Evento], Dict[int, Evento]]:
+        eventos = [Evento(id_, nombre, categoria, date.fromisoformat(f), precio) for id_, nombre, categoria, f, precio
+                   in self.conexion().execute("SELECT id, nombre, categoria, fecha, precio FROM eventos ORDER BY id")]
+        return eventos, {e.id: e for e in eventos}
+
+    # --- Ventas ---
+    def _ventas(self, sql: str, parametros=()) -> Iterator[Venta]:
+        for id_, cid, eid, f, uds, precio in self.conexion().execute(sql, parametros):
+            yield Venta(id_, cid, eid, date.fromisoformat(f), uds, precio)
+
+    def __len__(self) -> int:
+        return self.conexion().execute("SELECT COALESCE(SUM(ventas), 0) FROM totales_evento").fetchone()[0]
+
+    def __iter__(self) -> Iterator[Venta]:
+        return self._ventas("SELECT id, cliente_id, evento_id, fecha, unidades, precio_unitario FROM ventas ORDER BY rowid")
+
+    def append(self, v: Venta):
+        con = self.conexion()
+        with con:
+            con.execute("INSERT INTO ventas VALUES (?, ?, ?, ?, ?, ?)",
+                        (v.id, v.cliente_id, v.evento_id, v.fecha_venta.isoformat(), v.unidades, v.precio_unitario))
+
+    def rango(self, f_ini: date, f_fin: date) -> Iterator[Venta]:
+        """Ventas entre f_ini y f_fin (ambas incluidas), ordenadas por fecha (índice idx_ventas_fecha)."""
+        return self._ventas("SELECT id, cliente_id, evento_id, fecha, unidades, precio_unitario FROM ventas "
+                            "WHERE fecha BETWEEN ? AND ? ORDER BY fecha, rowid",
+                            (f_ini.isoformat(), f_fin.isoformat()))
+
+    def filas_rango(self, f_ini: date, f_fin: date) -> Iterator[Tuple]:
+        """(fecha, cliente, evento, categoría, total) del rango, con el join hecho en SQL."""
+        return self.conexion().execute(
+            "SELECT v.fecha, COALESCE(c.nombre, '?'), COALESCE(e.nombre, '?'), COALESCE(e.categoria, '?'), "
+            "printf('%.2f', v.unidades * v.precio_unitario) FROM ventas v "
+            "LEFT JOIN clientes c ON c.id = v.cliente_id LEFT JOIN eventos e ON e.id = v.evento_id "
+            "WHERE v.fecha BETWEEN ? AND ? ORDER BY v.fecha, v.rowid", (f_ini.isoformat(), f_fin.isoformat()))
+
+    def agregado_rango(self, f_ini: date, f_fin: date) -> Tuple[int, int, float]:
+        """(nº de ventas, unidades, ingresos) entre dos fechas, sumando totales_dia."""
+        return tuple(self.conexion().execute(
+            "SELECT COALESCE(SUM(ventas), 0), COALESCE(SUM(unidades), 0), COALESCE(SUM(ingresos), 0.0) "
+            "FROM totales_dia WHERE fecha BETWEEN ? AND ?", (f_ini.isoformat(), f_fin.isoformat())).fetchone())
+
+    def ingresos_totales(self) -> float:
+        return self.conexion().execute("SELECT COALESCE(SUM(ingresos), 0.0) FROM totales_evento").fetchone()[0]
+
+    def ingresos_por_evento(self) -> Dict[int, float]:
+        return dict(self.conexion().execute("SELECT evento_id, ingresos FROM totales_evento"))
+
+    def agrupar(self, por: str) -> Dict:
+        """Mismo resultado que agregar_ventas: {clave: [nº ventas, unidades, ingresos]}."""
+        if por == "evento":
+            sql = "SELECT evento_id, ventas, unidades, ingresos FROM totales_evento"
+        elif por == "categoria":
+            sql = ("SELECT COALESCE(e.categoria, '?'), SUM(t.ventas), SUM(t.unidades), SUM(t.ingresos) "
+                   "FROM totales_evento t LEFT JOIN eventos e ON e.id = t.evento_id GROUP BY 1")
+        elif por == "mes":
+            sql = ("SELECT substr(fecha, 1, 7), SUM(ventas), SUM(unidades), SUM(ingresos) "
+                   "FROM totales_dia GROUP BY 1")
+        elif por == "cliente":
+            sql = ("SELECT cliente_id, COUNT(*), SUM(unidades), SUM(unidades * precio_unitario) "
+                   "FROM ventas GROUP BY cliente_id")
+        else:
+            raise ValueError(f"Agrupación desconocida: {por}")
+        return {k: [n, uds, ing] for k, n, uds, ing in self.conexion().execute(sql)}
+
+    def celdas_dia_evento(self) -> Dict[Tuple[int, int], List]:
+        """{(evento_id, ordinal del día): [ventas, unidades, ingresos]} agrupado en SQL (ver CuboVentas)."""
+        return {(eid, parse_date(f).toordinal()): [n, uds, ingresos] for f, eid, n, uds, ingresos in self.conexion().execute(
+            "SELECT fecha, evento_id, COUNT(*), SUM(unidades), SUM(unidades * precio_unitario) "
+            "FROM ventas GROUP BY fecha, evento_id")}
+
+    def frecuencias(self, expresion: str) -> Iterator[Tuple[float, int]]:
+        """(valor, nº de ventas) de cada valor distinto de una expresión sobre ventas."""
+        return self.conexion().execute(f"SELECT {expresion}, COUNT(*) FROM ventas GROUP BY 1")
+
+    def __bool__(self):
+        return os.path.exists(self.path)
+
+
+class EscritorClientesSQLite:
+    """Altas de clientes en la base SQLite, con la interfaz de EscritorClientes.
+
+    Con durabilidad "siempre" cada alta es una transacción; con "lote" se
+    confirma cada TAM_LOTE_FSYNC altas y al cerrar. El id se calcula dentro
+    de la transacción de escritura (BEGIN IMMEDIATE) en la que se inserta el
+    cliente, así que otro escritor, de este proceso o de otro, no puede
+    recibir el mismo: espera a que esta se confirme.
+    """
+    def __init__(self, ventas: VentasSQLite, durabilidad: str = "siempre", tam_lote: int = TAM_LOTE_FSYNC):
+        if durabilidad not in DURABILIDADES:
+            raise ValueError(f"Durabilidad desconocida: {durabilidad}")
+        self.con = ventas.conexion()
+        self.durabilidad = durabilidad
+        self.tam_lote = tam_lote
+        self.pendientes = 0
+        self.ultimo = 0  # Último id dado en la transacción en curso
+
+    def siguiente_id(self) -> int:
+        if not self.con.in_transaction:
+            self.con.execute("BEGIN IMMEDIATE")  # Toma ya el bloqueo de escritura de la base
+            self.ultimo = 0
+        maximo = self.con.execute("SELECT COALESCE(MAX(id), 0) FROM clientes").fetchone()[0]
+        self.ultimo = max(maximo, self.ultimo) + 1
+        return self.ultimo
+
+    def anadir(self, c: Cliente):
+        self.con.execute("INSERT INTO clientes VALUES (?, ?, ?, ?, ?)",
+                         (c.id, c.nombre, c.email, c.fecha_alta.isoformat(), int(c.activo)))
+        self.pendientes += 1
+        if self.durabilidad == "siempre" or (self.durabilidad == "lote" and self.pendientes >= self.tam_lote):
+            self.sincronizar()
+
+    def sincronizar(self):
+        self.con.commit()
+        self.pendientes = 0
+
+    def checkpoint(self):
+        self.sincronizar()
+
+    def cerrar(self):
+        self.sincronizar()
+
+
+def nuevo_escritor_clientes(clientes, ventas, durabilidad: str = "lote"):
+    """EscritorClientes para los CSV o EscritorClientesSQLite si las ventas están en SQLite."""
+    if isinstance(ventas, VentasSQLite):
+        return EscritorClientesSQLite(ventas, durabilidad)
+    return EscritorClientes(clientes, durabilidad=durabilidad)
@@ -0,0 +1,315 @@
+"""Estadísticas de ventas del Mini-CRM.
+
+Ingresos totales y por evento, rankings top-N y percentiles con memoria
+acotada (SketchCuantiles) y un acumulador que mantiene las estadísticas al
+día con cada venta nueva sin recorrer otra vez las que ya había.
+"""
+import math
+from collections import Counter
+from datetime import date
+from heapq import heappop, heappush, nlargest
+from statistics import mean
+from typing import List, Dict, Tuple, Iterable
+
+from almacen import VentasColumnar, VentasCSV
+from almacen_sqlite import VentasSQLite
+from comun import VENTAS_CSV, TOP_N, PERCENTILES, Cliente, Evento, Venta, _len
+from cubo import CuboVentas, cargar_cubo
+from instrumentacion import instrumentado
+
+
+def ingresos_por_evento(ventas) -> Tuple[float, Dict[int, float]]:
+    """Ingresos totales y por evento en una pasada (vectorizado si es un VentasColumnar, en SQL si es
+    VentasSQLite, del índice si es un VentasCSV)."""
+    if isinstance(ventas, (VentasColumnar, VentasCSV, VentasSQLite)):
+        return ventas.ingresos_totales(), ventas.ingresos_por_evento()
+    ingresos_totales = 0
+    por_evento = {}
+    for v in ventas:
+        total = v.total
+        ingresos_totales += total
+        por_evento[v.evento_id] = por_evento.get(v.evento_id, 0) + total
+    return ingresos_totales, por_evento
+
+
+@instrumentado("estadisticas", lambda a, k, r: {"filas": _len(a[1] if len(a) > 1 else k["ventas"])})
+def estadisticas(eventos, ventas):
+    """Calcula estadísticas globales y devuelve un resumen.
+
+    Las ventas se recorren una sola vez, así que sirve también un VentasCSV.
+    """
+    # Ingresos totales y por evento
+    ingresos_totales, ingresos_evento = ingresos_por_evento(ventas)
+
+    # Set de categorías únicas
+    categorias = {e.categoria for e in eventos}
+
+    # Evento más próximo
+    proximos = [e.dias_hasta_evento() for e in eventos if e.dias_hasta_evento() >= 0]
+    dias_hasta_proximo = min(proximos) if proximos else -1
+
+    # Precios (min, max, media)
+    precios = [e.precio for e in eventos] or [0]
+    resumen_precios = (min(precios), max(precios), mean(precios))
+
+    return ingresos_totales, ingresos_evento, categorias, dias_hasta_proximo, resumen_precios
+
+
+class SketchCuantiles:
+    """Cuantiles aproximados con memoria acotada (sketch de cubetas logarítmicas).
+
+    Cada valor positivo x cae en la cubeta ceil(log_gamma(x)), con
+    gamma = (1 + error) / (1 - error), así que cualquier cuantil se devuelve
+    con un error relativo menor que `error` sin guardar los valores. Los
+    sketches con el mismo error se pueden fusionar (p. ej. uno por trozo de
+    fichero). Si se superan max_cubetas se juntan las más bajas, perdiendo
+    precisión solo en los cuantiles más pequeños.
+    """
+    def __init__(self, error: float = 0.01, max_cubetas: int = 2048):
+        self.error = error
+        self.max_cubetas = max_cubetas
+        self.gamma = (1 + error) / (1 - error)
+        self._log_gamma = math.log(self.gamma)
+        self.cubetas: Dict[int, int] = {}
+        self.ceros = 0   # Valores <= 0
+        self.n = 0
+        self.minimo = self.maximo = None  # Exactos: acotan las estimaciones de los extremos
+
+    def agregar(self, valor: float, veces: int = 1):
+        self.n += veces
+        self.minimo = valor if self.minimo is None else min(self.minimo, valor)
+        self.maximo = valor if self.maximo is None else max(self.maximo, valor)
+        if valor <= 0:
+            self.ceros += veces
+            return
+        k = math.ceil(math.log(valor) / self._log_gamma)
+        self.cubetas[k] = self.cubetas.get(k, 0) + veces
+        if len(self.cubetas) > self.max_cubetas:
+            self._comprimir()
+
+    def agregar_todos(self, valores: Iterable[float]):
+        """Añade muchos valores; los repetidos se agrupan antes de calcular su cubeta."""
+        for valor, veces in Counter(valores).items():
+            self.agregar(valor, veces)
+        return self
+
+    def fusionar(self, otro: "SketchCuantiles"):
+        if otro.error != self.error:
+            raise ValueError("Solo se pueden fusionar sketches con el mismo error")
+        for k, veces in otro.cubetas.items():
+            self.cubetas[k] = self.cubetas.get(k, 0) + veces
+        self.ceros += otro.ceros
+        self.n += otro.n
+        for extremo in (otro.minimo, otro.maximo):
+            if extremo is not None:
+                self.minimo = extremo if self.minimo is None else min(self.minimo, extremo)
+                self.maximo = extremo if self.maximo is None else max(self.maximo, extremo)
+        if len(self.cubetas) > self.max_cubetas:
+            self._comprimir()
+        return self
+
+    def _comprimir(self):
+        claves = sorted(self.cubetas)
+        sobrantes = claves[:len(claves) - self.max_cubetas + 1]
+        destino = claves[len(sobrantes)]
+        self.cubetas[destino] += sum(self.cubetas.pop(k) for k in sobrantes)
+
+    def cuantil(self, q: float) -> float:
+        """Valor aproximado del cuantil q (0 <= q <= 1); 0 si no hay datos."""
+        if self.n == 0:
+            return 0.0
+        rango = q * (self.n - 1)
+        visto = self.ceros
+        if rango < visto:
+            return 0.0
+        for k in sorted(self.cubetas):
+            visto += self.cubetas[k]
+            if rango < visto:
+                break
+        return min(max(2 * self.gamma ** k / (self.gamma + 1), self.minimo), self.maximo)
+
+
+class AnaliticaVentas:
+    """Rankings y percentiles de las ventas en una sola pasada y memoria acotada.
+
+    La memoria crece con el número de clientes (ingresos por cliente) y con
+    las cubetas de los sketches, nunca con el de ventas: no se ordena ni se
+    guarda ninguna venta. Los top-N se eligen con un heap (heapq.nlargest).
+    """
+    def __init__(self):
+        self.ingresos_por_cliente: Dict[int, float] = {}
+        self.ingresos_por_evento: Dict[int, float] = {}
+        self.ingresos = SketchCuantiles()   # Importe de cada venta
+        self.unidades = SketchCuantiles()   # Unidades de cada venta
+
+    @classmethod
+    def desde_ventas(cls, ventas) -> "AnaliticaVentas":
+        an = cls()
+        if isinstance(ventas, VentasColumnar):
+            totales = ventas.totales()
+            por_cliente = an.ingresos_por_cliente
+            for cid, total in zip(ventas.cliente_id, totales):
+                por_cliente[cid] = por_cliente.get(cid, 0) + total
+            an.ingresos_por_evento = ventas.ingresos_por_evento()
+            an.ingresos.agregar_todos(totales)
+            an.unidades.agregar_todos(ventas.unidades)
+        elif isinstance(ventas, VentasSQLite):
+            # Agregados en SQL: solo viajan los clientes y los valores distintos
+            an.ingresos_por_cliente = {cid: g[2] for cid, g in ventas.agrupar("cliente").items()}
+            an.ingresos_por_evento = ventas.ingresos_por_evento()
+            for valor, veces in ventas.frecuencias("unidades * precio_unitario"):
+                an.ingresos.agregar(valor, veces)
+            for valor, veces in ventas.frecuencias("unidades"):
+                an.unidades.agregar(valor, veces)
+        else:
+            for v in ventas:
+                an.add_venta(v)
+        return an
+
+    def add_venta(self, v: Venta):
+        total = v.total
+        self.ingresos_por_cliente[v.cliente_id] = self.ingresos_por_cliente.get(v.cliente_id, 0) + total
+        self.ingresos_por_evento[v.evento_id] = self.ingresos_por_evento.get(v.evento_id, 0) + total
+        self.ingresos.agregar(total)
+        self.unidades.agregar(v.unidades)
+
+    def fusionar(self, otra: "AnaliticaVentas"):
+        for cid, total in otra.ingresos_por_cliente.items():
+            self.ingresos_por_cliente[cid] = self.ingresos_por_cliente.get(cid, 0) + total
+        for eid, total in otra.ingresos_por_evento.items():
+            self.ingresos_por_evento[eid] = self.ingresos_por_evento.get(eid, 0) + total
+        self.ingresos.fusionar(otra.ingresos)
+        self.unidades.fusionar(otra.unidades)
+        return self
+
+    def top_clientes(self, n: int = TOP_N) -> List[Tuple[int, float]]:
+        """[(cliente_id, ingresos)] de los n clientes con más ingresos."""
+        return nlargest(n, self.ingresos_por_cliente.items(), key=lambda kv: kv[1])
+
+    def top_eventos_por_categoria(self, evt_index: Dict[int, Evento], n: int = TOP_N) -> Dict[str, List[Tuple[int, float]]]:
+        """{categoría: [(evento_id, ingresos)]} con los n eventos que más ingresan de cada una."""
+        por_categoria = {}
+        for eid, total in self.ingresos_por_evento.items():
+            categoria = evt_index[eid].categoria if eid in evt_index else "?"
+            por_categoria.setdefault(categoria, []).append((eid, total))
+        return {cat: nlargest(n, evts, key=lambda kv: kv[1]) for cat, evts in sorted(por_categoria.items())}
+
+    def percentiles(self) -> Dict[str, Dict[float, float]]:
+        """{"ingresos": {0.5: p50, ...}, "unidades": {...}} para cada valor de PERCENTILES."""
+        return {"ingresos": {q: self.ingresos.cuantil(q) for q in PERCENTILES},
+                "unidades": {q: self.unidades.cuantil(q) for q in PERCENTILES}}
+
+
+class AcumuladorEstadisticas:
+    """Estadísticas globales mantenidas de forma incremental.
+
+    Se construye una vez al cargar los datos y se actualiza en O(1) con cada
+    venta, cliente o evento nuevo (O(log n) para la fecha del evento), de modo
+    que resumen() devuelve lo mismo que estadisticas() sin recorrer nada.
+    """
+    def __init__(self):
+        self.n_clientes = 0
+        self.n_ventas = 0
+        self.ingresos_totales = 0
+        self.ingresos_por_evento = {}
+        self.categorias = Counter()    # categoría -> nº de eventos
+        self.fechas_eventos = []       # heap de ordinales de fecha
+        self.n_eventos = 0
+        self.suma_precios = 0
+        self.precio_min = None
+        self.precio_max = None
+        self.analitica = None          # AnaliticaVentas, se calcula la primera vez que se pide
+        self.cubo = None               # CuboVentas, igual
+
+    @classmethod
+    def desde_datos(cls, clientes, eventos, ventas) -> "AcumuladorEstadisticas":
+        """Construye el acumulador con una sola pasada sobre los datos cargados."""
+        acc = cls()
+        acc.n_clientes = len(clientes)
+        for e in eventos:
+            acc.add_evento(e)
+        if isinstance(ventas, (list, VentasColumnar, VentasCSV, VentasSQLite)):
+            # En streaming (VentasCSV) salen del índice, calculado en la misma pasada de la carga
+            acc.ingresos_totales, acc.ingresos_por_evento = ingresos_por_evento(ventas)
+            acc.n_ventas = len(ventas)
+        else:
+            for v in ventas:
+                acc.add_venta(v)
+        return acc
+
+    def add_cliente(self, c: Cliente):
+        self.n_clientes += 1
+
+    def add_evento(self, e: Evento):
+        self.n_eventos += 1
+        self.categorias[e.categoria] += 1
+        heappush(self.fechas_eventos, e.fecha_evento.toordinal())
+        self.suma_precios += e.precio
+        self.precio_min = e.precio if self.precio_min is None else min(self.precio_min, e.precio)
+        self.precio_max = e.precio if self.precio_max is None else max(self.precio_max, e.precio)
+
+    def add_venta(self, v: Venta):
+        total = v.total
+        self.n_ventas += 1
+        self.ingresos_totales += total
+        self.ingresos_por_evento[v.evento_id] = self.ingresos_por_evento.get(v.evento_id, 0) + total
+        if self.analitica is not None:
+            self.analitica.add_venta(v)
+        if self.cubo is not None:
+            self.cubo.add_venta(v)
+
+    def analitica_de(self, ventas) -> AnaliticaVentas:
+        """Analítica de las ventas: se calcula una vez y después se mantiene con add_venta."""
+        if self.analitica is None:
+            self.analitica = AnaliticaVentas.desde_ventas(ventas)
+        return self.analitica
+
+    def cubo_de(self, ventas, evt_index: Dict[int, Evento]) -> "CuboVentas":
+        """Cubo de ventas por periodo: se obtiene una vez y después se mantiene con add_venta.
+
+        Con VentasColumnar o VentasCSV (leídos de ventas.csv) se usa el cubo
+        guardado junto a los CSV (ver cargar_cubo); con VentasSQLite o una
+        lista se construye a partir de las ventas.
+        """
+        if self.cubo is None:
+            if isinstance(ventas, (VentasColumnar, VentasCSV)):
+                self.cubo = cargar_cubo(evt_index, getattr(ventas, "path", VENTAS_CSV))
+            else:
+                self.cubo = CuboVentas.desde_ventas(ventas, evt_index)
+        return self.cubo
+
+    def dias_hasta_proximo(self) -> int:
+        """Días hasta el evento más próximo (-1 si no hay ninguno futuro)."""
+        hoy = date.today().toordinal()
+        # Los eventos pasados no vuelven a ser futuros: se descartan del heap
+        while self.fechas_eventos and self.fechas_eventos[0] < hoy:
+            heappop(self.fechas_eventos)
+        return self.fechas_eventos[0] - hoy if self.fechas_eventos else -1
+
+    def resumen(self):
+        """Mismo resultado que estadisticas(eventos, ventas)."""
+        if self.n_eventos:
+            precios = (self.precio_min, self.precio_max, self.suma_precios / self.n_eventos)
+        else:
+            precios = (0, 0, 0)
+        return (self.ingresos_totales, self.ingresos_por_evento, set(self.categorias),
+                self.dias_hasta_proximo(), precios)
+
+    def verificar(self, eventos, ventas) -> List[str]:
+        """Compara con un recálculo completo; devuelve las diferencias encontradas."""
+        esperado = estadisticas(eventos, ventas)
+        actual = self.resumen()
+        nombres = ("ingresos_totales", "ingresos_por_evento", "categorias", "dias_hasta_proximo", "precios")
+        diferencias = []
+        for nombre, a, b in zip(nombres, actual, esperado):
+            if isinstance(a, dict):
+                iguales = a.keys() == b.keys() and all(math.isclose(a[k], b[k]) for k in a)
+            elif isinstance(a, tuple):
+                iguales = all(math.isclose(x, y) for x, y in zip(a, b))
+            elif isinstance(a, float):
+                iguales = math.isclose(a, b)
+            else:
+                iguales = a == b
+            if not iguales:
+                diferencias.append(f"{nombre}: acumulado={a!r} recalculado={b!r}")
+        return diferencias
@@ -0,0 +1,227 @@
+"""Rutas, constantes, clases y utilidades de CSV comunes a los módulos del CRM.
+
+Final.py y los módulos de almacenamiento, persistencia y analítica importan
+de aquí las rutas de data/, las clases Cliente, Evento y Venta, el parseo
+rápido de fechas y columnas y la lectura de CSV por filas o por lotes.
+"""
+import csv
+import os
+import re
+from array import array
+from datetime import datetime, date
+from itertools import islice
+from typing import List, Dict, Tuple, Iterable, Iterator
+
+from instrumentacion import instrumentado
+
+
+# ------------------------------
+# Rutas de archivos CSV
+# ------------------------------
+DATA_DIR = "data"
+CLIENTES_CSV = os.path.join(DATA_DIR, "clientes.csv")
+EVENTOS_CSV = os.path.join(DATA_DIR, "eventos.csv")
+VENTAS_CSV = os.path.join(DATA_DIR, "ventas.csv")
+INFORME_CSV = os.path.join(DATA_DIR, "informe_resumen.csv")
+INFORMES_CSV = {
+    "evento": INFORME_CSV,
+    "categoria": os.path.join(DATA_DIR, "informe_por_categoria.csv"),
+    "cliente": os.path.join(DATA_DIR, "informe_por_cliente.csv"),
+    "mes": os.path.join(DATA_DIR, "informe_por_mes.csv"),
+    "analitica": os.path.join(DATA_DIR, "informe_analitica.csv"),  # Top-N y percentiles
+}
+SNAPSHOT_BIN = os.path.join(DATA_DIR, "crm.snapshot")  # Caché binaria de los CSV ya parseados
+CLIENTES_WAL = os.path.join(DATA_DIR, "clientes.wal")   # Altas pendientes de volcar a clientes.csv
+CLIENTES_SEQ = os.path.join(DATA_DIR, "clientes.seq")   # Último id de cliente asignado
+BASE_SQLITE = os.path.join(DATA_DIR, "crm.sqlite")      # Almacenamiento alternativo (--backend sqlite)
+CUBO_VENTAS = os.path.join(DATA_DIR, "ventas.cubo")     # Ventas agregadas por día, semana y mes (ver CuboVentas)
+BACKENDS = ("csv", "sqlite")
+CABECERA_CLIENTES = ["id", "nombre", "email", "fecha_alta", "activo"]
+
+DATE_FMT = "%Y-%m-%d"  # Formato de fecha estándar
+
+TAM_LOTE = 10_000                          # Filas por lote en la lectura por streaming
+UMBRAL_STREAMING = 256 * 1024 * 1024       # A partir de este tamaño, ventas.csv no se carga en memoria
+COLUMNAS_VENTAS = ("id", "cliente_id", "evento_id", "fecha", "unidades", "precio_unitario")
+UMBRAL_PARALELO = 64 * 1024 * 1024        # A partir de este tamaño, ventas.csv se parsea en varios procesos
+UMBRAL_PEREZOSO = 32 * 1024 * 1024        # A partir de este tamaño de clientes.csv, clientes y eventos se leen bajo demanda
+DURABILIDADES = ("ninguna", "lote", "siempre")  # Cuándo se hace fsync del registro de altas
+TAM_LOTE_FSYNC = 1000                      # Altas por fsync con durabilidad "lote"
+MIN_PENDIENTES_INDICE = 1024               # Ventas desordenadas toleradas antes de reordenar el índice
+TOP_N = 5                                  # Clientes y eventos por categoría en los rankings
+PERCENTILES = (0.5, 0.95, 0.99)
+GRANULARIDADES = ("dia", "semana", "mes")  # Periodos de los cubos de ventas
+TAM_TROZO_CUBO = 16 * 1024 * 1024          # Bytes de ventas.csv que se agregan de una vez al construir el cubo
+
+# ============================================================
+# Clases principales (POO)
+# ============================================================
+
+class Cliente:
+    """Representa un cliente del CRM."""
+    def __init__(self, id_: int, nombre: str, email: str, fecha_alta: date, activo: bool):
+        self.id = id_
+        self.nombre = nombre
+        self.email = email
+        self.fecha_alta = fecha_alta
+        self.activo = activo
+
+    def antiguedad_dias(self) -> int:
+        """Devuelve los días que el cliente lleva dado de alta."""
+        return (date.today() - self.fecha_alta).days
+
+    def __str__(self):
+        estado = "Activo" if self.activo else "Inactivo"
+        return f"[{self.id}] {self.nombre} <{self.email}> | Alta: {self.fecha_alta} | {estado}"
+
+
+class Evento:
+    """Representa un evento (con fecha y categoría)."""
+    def __init__(self, id_: int, nombre: str, categoria: str, fecha_evento: date, precio: float):
+        self.id = id_
+        self.nombre = nombre
+        self.categoria = categoria
+        self.fecha_evento = fecha_evento
+        self.precio = precio
+
+    def dias_hasta_evento(self) -> int:
+        """Devuelve cuántos días faltan hasta el evento."""
+        return (self.fecha_evento - date.today()).days
+
+    def __str__(self):
+        return f"[{self.id}] {self.nombre} ({self.categoria}) | {self.fecha_evento} | {self.precio:.2f}€"
+
+
+class Venta:
+    """Representa una venta (un cliente compra entradas de un evento)."""
+    __slots__ = ("id", "cliente_id", "evento_id", "fecha_venta", "unidades", "precio_unitario")
+
+    def __init__(self, id_: int, cliente_id: int, evento_id: int, fecha_venta: date, unidades: int, precio_unitario: float):
+        self.id = id_
+        self.cliente_id = cliente_id
+        self.evento_id = evento_id
+        self.fecha_venta = fecha_venta
+        self.unidades = unidades
+        self.precio_unitario = precio_unitario
+
+    @property
+    def total(self) -> float:
+        """Importe total de la venta."""
+        return self.unidades * self.precio_unitario
+
+    def __str__(self):
+        return f"[{self.id}] C{self.cliente_id} -> E{self.evento_id} | {self.fecha_venta} | uds={self.unidades} | {self.precio_unitario:.2f}€ (total {self.total:.2f}€)"
+
+
+# ============================================================
+# Funciones de utilidades (CSV y validaciones)
+# ============================================================
+
+def _tam(path: str) -> int:
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+def _len(x) -> int:
+    return len(x) if hasattr(x, "__len__") else 0
+
+
+def ensure_data_dir():
+    """Crea la carpeta data/ si no existe."""
+    os.makedirs(DATA_DIR, exist_ok=True)
+
+def parse_bool(s: str) -> bool:
+    """Convierte texto en booleano (true/false)."""
+    return s.strip().lower() in {"1", "true", "t", "yes", "y", "si", "sí"}
+
+def email_valido(email: str) -> bool:
+    """Valida formato básico de email."""
+    return re.match(r"^[^@\s]+@[^@\s]+\.[^@\s]+$", email) is not None
+
+# ------------------------------
+# Parseo rápido de fechas y columnas numéricas
+# ------------------------------
+_CACHE_FECHAS: Dict[str, date] = {}
+MAX_CACHE_FECHAS = 1 << 16  # Fechas distintas memorizadas como máximo
+
+def parse_date(s: str) -> date:
+    """Convierte texto (YYYY-MM-DD) a objeto date.
+
+    Las fechas ya vistas salen de una caché. Las nuevas se decodifican por
+    posición (el formato ISO es fijo) y solo lo que no encaja en él pasa por
+    strptime, que conserva los mismos errores y casos límite.
+    """
+    d = _CACHE_FECHAS.get(s)
+    if d is not None:
+        return d
+    t = s.strip()
+    if len(t) == 10 and t[4] == "-" and t[7] == "-" and t[:4].isdigit() and t[5:7].isdigit() and t[8:].isdigit():
+        try:
+            d = date(int(t[:4]), int(t[5:7]), int(t[8:]))
+        except ValueError:
+            d = datetime.strptime(t, DATE_FMT).date()  # Mismo mensaje de error que antes
+    else:
+        d = datetime.strptime(t, DATE_FMT).date()
+    if len(_CACHE_FECHAS) < MAX_CACHE_FECHAS:
+        _CACHE_FECHAS[s] = d
+    return d
+
+def parse_lote_ventas(lote: List[List[str]]) -> Tuple[array, ...]:
+    """Convierte un lote de filas de ventas.csv en columnas tipadas.
+
+    Cada columna se convierte de una vez con map(); si alguna fila del lote
+    está mal formada se lanza la excepción y el llamador debe reprocesar el
+    lote fila a fila para informar del error.
+    """
+    ids, clis, evts, fechas, uds, precios = ([r[i] for r in lote] for i in range(6))
+    return (array("q", map(int, ids)), array("q", map(int, clis)), array("q", map(int, evts)),
+            array("i", [parse_date(f).toordinal() for f in fechas]),
+            array("i", map(int, uds)), array("d", map(float, precios)))
+
+def es_cabecera(row: List[str]) -> bool:
+    """Indica si una fila parece la cabecera del CSV."""
+    return any("id" in h.lower() or "nombre" in h.lower() for h in row)
+
+def _lineas_hasta(f, hasta: int) -> Iterator[str]:
+    """Líneas de un fichero abierto en binario sin pasar del byte hasta."""
+    leidos = 0
+    for linea in f:
+        leidos += len(linea)
+        if leidos > hasta:
+            return
+        yield linea.decode("utf-8")
+
+def iter_csv(path: str, hasta: int = None, numeradas: bool = False) -> Iterator[List[str]]:
+    """Recorre un CSV fila a fila sin cargarlo entero (omite cabecera si hay).
+
+    Con hasta (ver tam_consistente) solo se leen los primeros bytes: lo que
+    otro proceso esté añadiendo mientras tanto no se ve a medias. Con
+    numeradas=True devuelve pares (nº de línea, fila).
+    """
+    try:
+        with open(path, "rb") if hasta is not None else open(path, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f if hasta is None else _lineas_hasta(f, hasta), delimiter=";", quotechar='"')
+            primera = next(reader, None)
+            if primera is None:
+                return
+            # Si hay encabezado, lo salta
+            if not es_cabecera(primera):
+                yield (reader.line_num, primera) if numeradas else primera
+            if numeradas:
+                yield from ((reader.line_num, r) for r in reader)
+            else:
+                yield from reader
+    except FileNotFoundError:
+        print(f"No se encontró {path}.")
+
+@instrumentado("safe_read_csv", lambda a, k, r: {"filas": len(r), "bytes_leidos": _tam(a[0] if a else k["path"])})
+def safe_read_csv(path: str, hasta: int = None) -> List[List[str]]:
+    """Lee un CSV y devuelve una lista de filas (omite cabecera si hay)."""
+    return list(iter_csv(path, hasta))
+
+def iter_lotes(filas: Iterable, tam_lote: int = TAM_LOTE) -> Iterator[List]:
+    """Agrupa un iterable en listas de como mucho tam_lote elementos."""
+    it = iter(filas)
+    while True:
+        lote = list(islice(it, tam_lote))
+        if not lote:
+            return
+        yield lote
@@ -0,0 +1,429 @@
+"""Cubos de ventas por periodo (data/ventas.cubo).
+
+Ventas, unidades e ingresos agregados por (periodo, categoría, evento) para
+día, semana y mes. Se construyen con una pasada sobre las ventas, se
+guardan en data/ventas.cubo y se ponen al día leyendo solo lo que se haya
+añadido a ventas.csv desde entonces (ver cargar_cubo).
+"""
+import csv
+import hashlib
+import io
+import json
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+from itertools import accumulate, chain
+from operator import itemgetter, mul
+from typing import List, Dict, Tuple, Iterator
+
+from almacen import VentasColumnar
+from almacen_sqlite import VentasSQLite
+from comun import (VENTAS_CSV, CUBO_VENTAS, TAM_LOTE, COLUMNAS_VENTAS, MIN_PENDIENTES_INDICE, GRANULARIDADES,
+                   TAM_TROZO_CUBO, Evento, Venta, parse_date, parse_lote_ventas, es_cabecera, iter_lotes)
+from instrumentacion import instrumentado
+from persistencia import tam_consistente
+
+CUBO_MAGIC = b"CRMCUBO1"
+
+def inicio_periodo(granularidad: str, ordinal: int) -> int:
+    """Ordinal del primer día del día, semana (de lunes a domingo) o mes que contiene la fecha."""
+    if granularidad == "dia":
+        return ordinal
+    if granularidad == "semana":
+        return ordinal - (ordinal - 1) % 7  # El ordinal 1 (0001-01-01) fue lunes
+    if granularidad == "mes":
+        return ordinal - date.fromordinal(ordinal).day + 1
+    raise ValueError(f"Granularidad desconocida: {granularidad}")
+
+def _agregar_celdas(celdas: Dict, filas):
+    """Suma filas (evento_id, ordinal del día, unidades, importe) en {(evento_id, día): [ventas, unidades, ingresos]}."""
+    for eid, dia, uds, total in filas:
+        k = (eid, dia)
+        c = celdas.get(k)
+        if c is None:
+            celdas[k] = [1, uds, total]
+        else:
+            c[0] += 1
+            c[1] += uds
+            c[2] += total
+    return celdas
+
+def _agregar_celdas_dia(celdas: Dict, nuevas: Dict) -> Dict:
+    """Suma en celdas las de nuevas (mismo formato que _agregar_celdas)."""
+    for k, (n, uds, ingresos) in nuevas.items():
+        c = celdas.get(k)
+        if c is None:
+            celdas[k] = [n, uds, ingresos]
+        else:
+            c[0] += n
+            c[1] += uds
+            c[2] += ingresos
+    return celdas
+
+def _reagrupar(celdas: Dict, claves: Dict = None, periodos: Dict = None, defecto: int = 0) -> Dict:
+    """Vuelve a agrupar celdas {(clave, periodo): [...]} sumando sus valores.
+
+    La clave se traduce con claves (defecto si no está) y el periodo con
+    periodos; si no se pasan, se conservan.
+    """
+    grupos = {}
+    for (k, p), (n, uds, ingresos) in celdas.items():
+        nk = (k if claves is None else claves.get(k, defecto), p if periodos is None else periodos[p])
+        g = grupos.get(nk)
+        if g is None:
+            grupos[nk] = [n, uds, ingresos]
+        else:
+            g[0] += n
+            g[1] += uds
+            g[2] += ingresos
+    return grupos
+
+
+class CeldasCubo:
+    """Celdas (clave, periodo) -> ventas, unidades e ingresos de una agrupación del cubo.
+
+    Están ordenadas por clave y periodo en arrays: las celdas de una clave
+    forman un tramo contiguo y, dentro de él, un rango de periodos se
+    localiza con bisect en O(log n). Con las sumas acumuladas, el total de
+    un rango sale de restar dos posiciones.
+    """
+    COLUMNAS = ("clave", "periodo", "ventas", "unidades", "ingresos",
+                "acum_ventas", "acum_unidades", "acum_ingresos")
+
+    def __init__(self, celdas: Dict = None, columnas: Dict[str, array] = None):
+        if columnas is not None:
+            # Ya calculadas (leídas de ventas.cubo)
+            for col in self.COLUMNAS:
+                setattr(self, col, columnas[col])
+            return
+        claves = sorted(celdas)
+        valores = list(map(celdas.__getitem__, claves))
+        self.clave = array("q", map(itemgetter(0), claves))
+        self.periodo = array("i", map(itemgetter(1), claves))
+        self.ventas = array("q", map(itemgetter(0), valores))
+        self.unidades = array("q", map(itemgetter(1), valores))
+        self.ingresos = array("d", map(itemgetter(2), valores))
+        self.acum_ventas = array("q", accumulate(self.ventas, initial=0))
+        self.acum_unidades = array("q", accumulate(self.unidades, initial=0))
+        self.acum_ingresos = array("d", accumulate(self.ingresos, initial=0.0))
+
+    def __len__(self):
+        return len(self.clave)
+
+    def tramo(self, clave: int, p_ini: int, p_fin: int) -> Tuple[int, int]:
+        """Posiciones [a, b) de las celdas de la clave con periodo entre p_ini y p_fin."""
+        lo = bisect_left(self.clave, clave)
+        hi = bisect_right(self.clave, clave, lo)
+        a = bisect_left(self.periodo, p_ini, lo, hi)
+        return a, max(a, bisect_right(self.periodo, p_fin, lo, hi))  # Con p_fin < p_ini no hay ninguna
+
+    def suma(self, a: int, b: int) -> Tuple[int, int, float]:
+        return (self.acum_ventas[b] - self.acum_ventas[a], self.acum_unidades[b] - self.acum_unidades[a],
+                self.acum_ingresos[b] - self.acum_ingresos[a])
+
+    def filas(self, a: int, b: int) -> Iterator[Tuple[int, int, int, float]]:
+        return zip(self.periodo[a:b], self.ventas[a:b], self.unidades[a:b], self.ingresos[a:b])
+
+
+class CuboVentas:
+    """Ventas, unidades e ingresos por (periodo, categoría, evento) para día, semana y mes.
+
+    Para cada granularidad hay tres CeldasCubo: por evento, por categoría
+    (la del evento en evt_index) y el total. Una consulta sobre cualquier
+    rango de fechas son dos bisect y, como mucho, una fila por periodo.
+
+    Las ventas añadidas después de construirlo se guardan en pendientes
+    (celdas por evento y día) y se suman al consultar; cuando son demasiadas
+    se funden con las celdas, igual que hace IndiceFechas.
+    """
+    AGRUPACIONES = ("evento", "categoria", "total")
+
+    def __init__(self, celdas_dia: Dict = None, evt_index: Dict[int, Evento] = None):
+        self.pendientes = {}   # (evento_id, día) -> [ventas, unidades, ingresos]
+        self.fuente = None     # Parte de ventas.csv agregada (ver cargar_cubo)
+        self._construir(celdas_dia or {}, {eid: e.categoria for eid, e in (evt_index or {}).items()})
+
+    @classmethod
+    def desde_ventas(cls, ventas, evt_index: Dict[int, Evento]) -> "CuboVentas":
+        """Construye el cubo con una pasada sobre las ventas (con VentasSQLite, agrupando en SQL)."""
+        if isinstance(ventas, VentasSQLite):
+            return cls(ventas.celdas_dia_evento(), evt_index)
+        if isinstance(ventas, VentasColumnar):
+            filas = zip(ventas.evento_id, ventas.fecha, ventas.unidades, map(mul, ventas.unidades, ventas.precio_unitario))
+        else:
+            filas = ((v.evento_id, v.fecha_venta.toordinal(), v.unidades, v.total) for v in ventas)
+        return cls(_agregar_celdas({}, filas), evt_index)
+
+    def _construir(self, celdas_dia: Dict, categoria_de: Dict[int, str]):
+        self.categoria_de = categoria_de
+        self.categorias = sorted(set(self.categoria_de.values()) | {"?"})
+        codigo = {cat: i for i, cat in enumerate(self.categorias)}
+        codigo_de = {eid: codigo[cat] for eid, cat in self.categoria_de.items()}
+        dias = {dia for _, dia in celdas_dia}  # Hay muchos menos días distintos que celdas
+        self.celdas = {}
+        for g in GRANULARIDADES:
+            if g == "dia":
+                por_evento = celdas_dia
+            else:
+                por_evento = _reagrupar(celdas_dia, periodos={dia: inicio_periodo(g, dia) for dia in dias})
+            por_categoria = _reagrupar(por_evento, codigo_de, defecto=codigo["?"])
+            total = _reagrupar(por_categoria, {})
+            self.celdas[g] = {"evento": CeldasCubo(por_evento), "categoria": CeldasCubo(por_categoria),
+                              "total": CeldasCubo(total)}
+
+    def celdas_dia(self) -> Dict:
+        """{(evento_id, día): [ventas, unidades, ingresos]}, incluidas las pendientes."""
+        c = self.celdas["dia"]["evento"]
+        celdas = {(eid, dia): [n, uds, ingresos] for eid, dia, n, uds, ingresos
+                  in zip(c.clave, c.periodo, c.ventas, c.unidades, c.ingresos)}
+        return _agregar_celdas_dia(celdas, self.pendientes)
+
+    def recategorizar(self, evt_index: Dict[int, Evento]) -> bool:
+        """Rehace las agrupaciones si ha cambiado la categoría de algún evento; indica si lo hizo."""
+        categoria_de = {eid: e.categoria for eid, e in evt_index.items()}
+        if categoria_de == self.categoria_de:
+            return False
+        self._construir(self.celdas_dia(), categoria_de)
+        self.pendientes = {}
+        return True
+
+    # --- Actualización incremental ---
+    def anadir_celdas(self, nuevas: Dict):
+        """Suma celdas {(evento_id, día): [ventas, unidades, ingresos]} de ventas nuevas."""
+        _agregar_celdas_dia(self.pendientes, nuevas)
+        if len(self.pendientes) > max(MIN_PENDIENTES_INDICE, len(self.celdas["dia"]["evento"]) // 64):
+            self.fundir()
+
+    def add_venta(self, v: Venta):
+        self.anadir_celdas({(v.evento_id, v.fecha_venta.toordinal()): [1, v.unidades, v.total]})
+
+    def fundir(self):
+        """Incorpora las celdas pendientes a los arrays."""
+        if self.pendientes:
+            self._construir(self.celdas_dia(), self.categoria_de)
+            self.pendientes = {}
+
+    # --- Consultas ---
+    def _seleccion(self, categoria: str, evento_id: int):
+        """(agrupación, clave) de las celdas que responden a la consulta, o None si no puede haber ninguna."""
+        if evento_id is not None:
+            if categoria is not None and self.categoria_de.get(evento_id, "?") != categoria:
+                return None
+            return "evento", evento_id
+        if categoria is not None:
+            return ("categoria", self.categorias.index(categoria)) if categoria in self.categorias else None
+        return "total", 0
+
+    def _pendientes_en(self, p_ini: int, p_fin: int, categoria: str, evento_id: int, granularidad: str = "dia"):
+        for (eid, dia), valores in self.pendientes.items():
+            if evento_id is not None and eid != evento_id:
+                continue
+            if categoria is not None and self.categoria_de.get(eid, "?") != categoria:
+                continue
+            p = inicio_periodo(granularidad, dia)
+            if p_ini <= p <= p_fin:
+                yield p, valores
+
+    def consultar(self, granularidad: str = "mes", desde: date = None, hasta: date = None,
+                  categoria: str = None, evento_id: int = None) -> List[Tuple[date, int, int, float]]:
+        """[(inicio del periodo, ventas, unidades, ingresos)] de cada periodo con ventas.
+
+        Se devuelven los periodos completos que tocan [desde, hasta] (un mes
+        aparece entero aunque el rango empiece a mitad); para el total exacto
+        de un rango de fechas, ver total(). Se puede filtrar por categoría,
+        por evento o por ambos.
+        """
+        sel = self._seleccion(categoria, evento_id)
+        if sel is None:
+            return []
+        p_ini = inicio_periodo(granularidad, desde.toordinal()) if desde else 0
+        p_fin = hasta.toordinal() if hasta else date.max.toordinal()
+        celdas = self.celdas[granularidad][sel[0]]
+        a, b = celdas.tramo(sel[1], p_ini, p_fin)
+        filas = celdas.filas(a, b)
+        if self.pendientes:
+            por_periodo = {p: [n, uds, ingresos] for p, n, uds, ingresos in filas}
+            for p, (n, uds, ingresos) in self._pendientes_en(p_ini, p_fin, categoria, evento_id, granularidad):
+                g = por_periodo.setdefault(p, [0, 0, 0.0])
+                g[0] += n
+                g[1] += uds
+                g[2] += ingresos
+            filas = ((p, *g) for p, g in sorted(por_periodo.items()))
+        return [(date.fromordinal(p), n, uds, ingresos) for p, n, uds, ingresos in filas]
+
+    def total(self, desde: date = None, hasta: date = None, categoria: str = None,
+              evento_id: int = None) -> Tuple[int, int, float]:
+        """(ventas, unidades, ingresos) entre dos fechas (ambas incluidas), con las sumas acumuladas por día."""
+        sel = self._seleccion(categoria, evento_id)
+        if sel is None:
+            return 0, 0, 0.0
+        d_ini = desde.toordinal() if desde else 0
+        d_fin = hasta.toordinal() if hasta else date.max.toordinal()
+        celdas = self.celdas["dia"][sel[0]]
+        n, uds, ingresos = celdas.suma(*celdas.tramo(sel[1], d_ini, d_fin))
+        for _, (pn, puds, pingresos) in self._pendientes_en(d_ini, d_fin, categoria, evento_id):
+            n, uds, ingresos = n + pn, uds + puds, ingresos + pingresos
+        return n, uds, ingresos
+
+
+def guardar_cubo(cubo: CuboVentas, path: str = CUBO_VENTAS):
+    """Escribe el cubo en binario (arrays de cada CeldasCubo), de forma atómica."""
+    secciones, cuerpos, offset = [], [], 0
+    for g in GRANULARIDADES:
+        for agrupacion in CuboVentas.AGRUPACIONES:
+            celdas = cubo.celdas[g][agrupacion]
+            for col in CeldasCubo.COLUMNAS:
+                datos = getattr(celdas, col).tobytes()
+                relleno = -len(datos) % 8
+                secciones.append({"nombre": f"{g}.{agrupacion}.{col}", "tipo": getattr(celdas, col).typecode,
+                                  "offset": offset, "longitud": len(datos)})
+                cuerpos.append(datos + b"\0" * relleno)
+                offset += len(datos) + relleno
+    cabecera = json.dumps({"version": 1, "byteorder": sys.byteorder, "fuente": cubo.fuente,
+                           "categoria_de": {str(eid): cat for eid, cat in cubo.categoria_de.items()},
+                           "categorias": cubo.categorias,
+                           "pendientes": [[eid, dia, *valores] for (eid, dia), valores in cubo.pendientes.items()],
+                           "secciones": secciones}).encode("utf-8")
+    tmp = f"{path}.{os.getpid()}.tmp"  # Un temporal por proceso: pueden guardar a la vez
+    with open(tmp, "wb") as f:
+        f.write(CUBO_MAGIC)
+        f.write(struct.pack("<I", len(cabecera)))
+        f.write(cabecera)
+        for cuerpo in cuerpos:
+            f.write(cuerpo)
+    os.replace(tmp, path)
+
+def leer_cubo(path: str = CUBO_VENTAS) -> CuboVentas:
+    """Lee un cubo guardado con guardar_cubo (None si no existe o no es válido)."""
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(CUBO_MAGIC)) != CUBO_MAGIC:
+                return None
+            (n,) = struct.unpack("<I", f.read(4))
+            cab = json.loads(f.read(n))
+            if cab.get("version") != 1 or cab.get("byteorder") != sys.byteorder:
+                return None
+            datos = memoryview(f.read())
+    except (OSError, ValueError, struct.error):
+        return None
+    columnas = {}
+    for sec in cab["secciones"]:
+        col = array(sec["tipo"])
+        col.frombytes(datos[sec["offset"]:sec["offset"] + sec["longitud"]])
+        columnas[sec["nombre"]] = col
+    cubo = CuboVentas()
+    try:
+        cubo.celdas = {g: {agr: CeldasCubo(columnas={col: columnas[f"{g}.{agr}.{col}"] for col in CeldasCubo.COLUMNAS})
+                           for agr in CuboVentas.AGRUPACIONES} for g in GRANULARIDADES}
+    except KeyError:
+        return None
+    cubo.fuente = cab["fuente"]
+    cubo.categoria_de = {int(eid): cat for eid, cat in cab["categoria_de"].items()}
+    cubo.categorias = cab["categorias"]
+    cubo.pendientes = {(eid, dia): [n, uds, ingresos] for eid, dia, n, uds, ingresos in cab["pendientes"]}
+    return cubo
+
+def _columnas_lote(lote: List[List[str]]) -> Tuple[array, ...]:
+    """parse_lote_ventas, o fila a fila informando de las filas erróneas."""
+    try:
+        return parse_lote_ventas(lote)
+    except Exception:
+        pass
+    ventas = VentasColumnar()
+    for r in lote:
+        try:
+            ventas.append_fila(int(r[0]), int(r[1]), int(r[2]), parse_date(r[3]).toordinal(), int(r[4]), float(r[5]))
+        except Exception as e:
+            print(f"Error en venta {r}: {e}")
+    return tuple(getattr(ventas, col) for col in COLUMNAS_VENTAS)
+
+def _celdas_csv(path: str, inicio: int, fin: int, h) -> Dict:
+    """Agrega por (evento_id, día) las ventas entre los bytes inicio y fin de ventas.csv.
+
+    Se lee por trozos de TAM_TROZO_CUBO cortados en salto de línea, así que
+    la memoria no depende del tamaño del fichero. h (un hashlib) recibe los
+    mismos bytes que se agregan.
+    """
+    celdas = {}
+    resto = b""
+    pos = inicio
+    primero = inicio == 0
+    with open(path, "rb") as f:
+        f.seek(inicio)
+        while pos < fin:
+            bloque = f.read(min(TAM_TROZO_CUBO, fin - pos))
+            if not bloque:
+                break
+            pos += len(bloque)
+            bloque = resto + bloque
+            corte = len(bloque) if pos >= fin else bloque.rfind(b"\n") + 1
+            bloque, resto = bloque[:corte], bloque[corte:]
+            if not bloque:
+                continue
+            h.update(bloque)
+            filas = csv.reader(io.StringIO(bloque.decode("utf-8"), newline=""), delimiter=";", quotechar='"')
+            if primero:
+                primera = next(filas, None)
+                if primera is not None and not es_cabecera(primera):
+                    filas = chain([primera], filas)
+                primero = False
+            for lote in iter_lotes(filas, TAM_LOTE):
+                _, _, evts, fechas, uds, precios = _columnas_lote(lote)
+                _agregar_celdas(celdas, zip(evts, fechas, uds, map(mul, uds, precios)))
+    return celdas
+
+def _sha256_prefijo(path: str, n: int):
+    """hashlib.sha256 de los n primeros bytes del fichero (para seguir actualizándolo)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while n > 0:
+            bloque = f.read(min(1 << 20, n))
+            if not bloque:
+                break
+            h.update(bloque)
+            n -= len(bloque)
+    return h
+
+@instrumentado("cargar_cubo")
+def cargar_cubo(evt_index: Dict[int, Evento], path_ventas: str = VENTAS_CSV, path: str = CUBO_VENTAS) -> CuboVentas:
+    """Cubo de las ventas de ventas.csv, leído de ventas.cubo y puesto al día.
+
+    El cubo guarda hasta qué byte de ventas.csv ha agregado y el sha256 de
+    esos bytes. Si el CSV no ha cambiado se usa tal cual; si solo ha crecido
+    (se han añadido ventas al final) se agregan únicamente las líneas nuevas;
+    en otro caso se vuelve a construir leyendo el CSV por trozos. Un cambio
+    de categorías en eventos.csv solo rehace las agrupaciones, sin releer
+    ventas. Si algo ha cambiado se vuelve a guardar.
+    """
+    if not os.path.exists(path_ventas):
+        return CuboVentas(evt_index=evt_index)
+    cubo = leer_cubo(path)
+    fuente = cubo.fuente if cubo is not None else None
+    mtime_ns = os.stat(path_ventas).st_mtime_ns
+    fin = tam_consistente(path_ventas)
+    if fuente is not None and fuente["tam"] == fin and fuente["mtime_ns"] == mtime_ns:
+        cambiado = False
+    else:
+        h = None
+        if fuente is not None and fuente["tam"] <= fin:
+            h = _sha256_prefijo(path_ventas, fuente["tam"])
+            if h.hexdigest() != fuente["sha256"]:
+                h = None
+        if h is None:
+            # Sin cubo, o ventas.csv ha cambiado algo más que su final: se agrega entero
+            h = hashlib.sha256()
+            cubo = CuboVentas(_celdas_csv(path_ventas, 0, fin, h), evt_index)
+        else:
+            cubo.anadir_celdas(_celdas_csv(path_ventas, fuente["tam"], fin, h))
+        cubo.fuente = {"tam": fin, "mtime_ns": mtime_ns, "sha256": h.hexdigest()}
+        cambiado = True
+    cambiado = cubo.recategorizar(evt_index) or cambiado
+    if cambiado:
+        try:
+            guardar_cubo(cubo, path)
+        except OSError as e:
+            print(f"No se pudo guardar el cubo de ventas: {e}")
+    return cubo
@@ -0,0 +1,101 @@
+"""Instrumentación opcional del CRM: tiempos, filas, bytes y pico de memoria por etapa.
+
+Se activa con la variable de entorno CRM_METRICAS=<fichero> (o --metricas
+en la línea de comandos de Final.py). Con extensión .prom se escribe al
+salir un fichero de texto para Prometheus; con cualquier otra, un log JSON
+con una línea por llamada. Desactivada, cada función instrumentada solo
+paga una comprobación de un atributo.
+"""
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from typing import Dict
+
+try:
+    import resource  # Solo en Unix: pico de memoria del proceso
+except ImportError:
+    resource = None
+
+
+class Instrumentacion:
+    """Tiempos, filas, bytes y pico de memoria por etapa."""
+    CAMPOS = ("llamadas", "segundos", "filas", "bytes_leidos", "bytes_escritos")
+
+    def __init__(self):
+        self.activa = False
+        self.destino = None
+        self.etapas: Dict[str, Dict[str, float]] = {}
+        self.rss_pico_kb = 0
+        self._cerrojo = threading.Lock()  # La carga y los informes registran desde otros hilos
+
+    def activar(self, destino: str):
+        if not self.activa:
+            atexit.register(self.exportar)
+        self.activa = True
+        self.destino = destino
+
+    def registrar(self, etapa: str, segundos: float, filas: int = 0, bytes_leidos: int = 0, bytes_escritos: int = 0):
+        with self._cerrojo:
+            self._registrar(etapa, segundos, filas, bytes_leidos, bytes_escritos)
+
+    def _registrar(self, etapa, segundos, filas, bytes_leidos, bytes_escritos):
+        acc = self.etapas.setdefault(etapa, dict.fromkeys(self.CAMPOS, 0))
+        acc["llamadas"] += 1
+        acc["segundos"] += segundos
+        acc["filas"] += filas
+        acc["bytes_leidos"] += bytes_leidos
+        acc["bytes_escritos"] += bytes_escritos
+        if resource is not None:
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            self.rss_pico_kb = max(self.rss_pico_kb, rss // 1024 if sys.platform == "darwin" else rss)
+        if self.destino and not self.destino.endswith(".prom"):
+            with open(self.destino, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"ts": time.time(), "etapa": etapa, "segundos": segundos, "filas": filas,
+                                    "bytes_leidos": bytes_leidos, "bytes_escritos": bytes_escritos,
+                                    "rss_pico_kb": self.rss_pico_kb}) + "\n")
+
+    def texto_prometheus(self) -> str:
+        lineas = []
+        for campo in self.CAMPOS:
+            nombre = f"crm_etapa_{campo}_total"
+            lineas.append(f"# TYPE {nombre} counter")
+            for etapa, acc in sorted(self.etapas.items()):
+                lineas.append(f'{nombre}{{etapa="{etapa}"}} {acc[campo]}')
+        lineas.append("# TYPE crm_rss_pico_kb gauge")
+        lineas.append(f"crm_rss_pico_kb {self.rss_pico_kb}")
+        return "\n".join(lineas) + "\n"
+
+    def exportar(self):
+        """Escribe el fichero Prometheus (el log JSON se escribe en cada llamada)."""
+        if self.destino and self.destino.endswith(".prom"):
+            with open(self.destino, "w", encoding="utf-8") as f:
+                f.write(self.texto_prometheus())
+
+
+INSTRUMENTACION = Instrumentacion()
+if os.environ.get("CRM_METRICAS"):
+    INSTRUMENTACION.activar(os.environ["CRM_METRICAS"])
+
+
+def instrumentado(etapa: str, medir=None):
+    """Decorador que registra la duración de la función como una etapa.
+
+    medir(args, kwargs, resultado) devuelve un dict con filas/bytes_leidos/
+    bytes_escritos de la llamada; solo se evalúa si la instrumentación está activa.
+    """
+    def decorador(func):
+        @functools.wraps(func)
+        def envoltura(*args, **kwargs):
+            if not INSTRUMENTACION.activa:
+                return func(*args, **kwargs)
+            t0 = time.perf_counter()
+            resultado = func(*args, **kwargs)
+            segundos = time.perf_counter() - t0
+            INSTRUMENTACION.registrar(etapa, segundos, **(medir(args, kwargs, resultado) if medir else {}))
+            return resultado
+        return envoltura
+    return decorador
@@ -0,0 +1,335 @@
+"""Escritura segura de los ficheros del CRM: bloqueos, registro de altas (WAL) e ids.
+
+Varios procesos pueden dar altas de clientes a la vez sobre la misma
+carpeta data/. Los bloqueos de fichero evitan que se intercalen líneas, la
+secuencia de ids evita que se repitan y el WAL permite reaplicar tras una
+caída las altas que no llegaron a clientes.csv.
+"""
+import csv
+import io
+import os
+import zlib
+from contextlib import contextmanager
+from typing import List, Set, Iterable
+
+try:
+    import fcntl  # Solo en Unix: bloqueos entre procesos
+except ImportError:
+    fcntl = None
+
+from comun import (CLIENTES_CSV, CLIENTES_WAL, CLIENTES_SEQ, CABECERA_CLIENTES, DATE_FMT, DURABILIDADES,
+                   TAM_LOTE_FSYNC, Cliente, _tam, iter_csv)
+from instrumentacion import instrumentado
+
+
+@instrumentado("append_row_csv", lambda a, k, r: {"filas": 1, "bytes_escritos": len(_linea_csv(a[2] if len(a) > 2 else k["row"]))})
+def append_row_csv(path: str, header: List[str], row: List):
+    """Añade una fila al CSV, creando el archivo si no existe.
+
+    La fila se escribe con el bloqueo del fichero tomado y en una sola
+    escritura, así que dos procesos no pueden intercalar líneas a medias.
+    """
+    with bloqueo(path):
+        texto = _linea_csv(row)
+        reparar_final(path, len(header))
+        if not os.path.exists(path):
+            texto = _linea_csv(header) + texto
+        with open(path, "a", newline="", encoding="utf-8") as f:
+            f.write(texto)
+
+
+# ------------------------------
+# Bloqueos entre procesos
+# ------------------------------
+# Varios procesos (menús, "serve", importaciones) pueden compartir data/.
+# Cada fichero que se modifica tiene un bloqueo consultivo (flock) en
+# <fichero>.lock: exclusivo para escribir y compartido para leer. Los
+# escritores solo añaden líneas completas con el bloqueo tomado; los
+# lectores anotan el tamaño con el bloqueo compartido y leen hasta ahí sin
+# retener el bloqueo (lectura consistente), así que un informe largo no
+# frena las altas ni ve líneas a medias. Sin fcntl (Windows) no se bloquea.
+# Solo los escritores crean el .lock: un lector abre el que exista en modo
+# lectura y, si aún no hay ninguno, es que nadie ha escrito con bloqueo y lee
+# sin él. Así leer funciona en carpetas de solo lectura y no deja .lock.
+
+@contextmanager
+def bloqueo(path: str, exclusivo: bool = True):
+    """Toma el bloqueo de path (en path + ".lock") mientras dura el with.
+
+    El bloqueo compartido no crea el .lock: si no existe no se bloquea.
+    No es reentrante: dentro del with no se debe volver a bloquear el mismo
+    fichero, ni siquiera desde el mismo proceso.
+    """
+    if fcntl is None:
+        yield
+        return
+    if exclusivo:
+        f = open(path + ".lock", "a")
+    else:
+        try:
+            f = open(path + ".lock", "r")
+        except FileNotFoundError:
+            yield
+            return
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH)
+        yield
+    finally:
+        f.close()  # Cerrar el descriptor libera el bloqueo
+
+def tam_consistente(path: str) -> int:
+    """Tamaño de path en un momento sin escrituras a medias (0 si no existe)."""
+    with bloqueo(path, exclusivo=False):
+        return _tam(path)
+
+
+# ------------------------------
+# Altas de clientes con registro previo (WAL)
+# ------------------------------
+# Cada alta se escribe primero en clientes.wal como una línea CSV precedida
+# de su crc32; el registro se sincroniza (fsync) por lotes y en cada
+# checkpoint se vuelca de una vez a clientes.csv. Si el programa se cae, al
+# arrancar se reaplican las líneas íntegras del WAL que aún no estén en el
+# CSV y se descarta la última si quedó cortada. El WAL, el volcado y la
+# secuencia de ids se protegen con los bloqueos de arriba, de modo que varios
+# procesos pueden dar altas a la vez sin repetir ids ni cortar líneas.
+
+def _linea_csv(row: List) -> str:
+    buf = io.StringIO()
+    csv.writer(buf, delimiter=";", quotechar='"', quoting=csv.QUOTE_MINIMAL).writerow(row)
+    return buf.getvalue()
+
+def _fsync(f):
+    f.flush()
+    os.fsync(f.fileno())
+
+def _vaciar(path: str):
+    # Se trunca en lugar de borrar: un EscritorClientes abierto en modo "a" sigue escribiendo en él
+    with open(path, "w", encoding="utf-8"):
+        pass
+
+def leer_wal(wal_path: str = CLIENTES_WAL) -> List[str]:
+    """Líneas CSV válidas del WAL, hasta la primera incompleta o corrupta."""
+    lineas = []
+    try:
+        with open(wal_path, encoding="utf-8", newline="") as f:
+            for linea in f:
+                crc, _, resto = linea.partition(";")
+                if not resto.endswith("\n") or crc != f"{zlib.crc32(resto.encode('utf-8')):08x}":
+                    break
+                lineas.append(resto)
+    except FileNotFoundError:
+        pass
+    return lineas
+
+def reparar_final(path: str, n_campos: int, pendientes: Iterable[str] = ()):
+    """Deja path terminado en salto de línea antes de añadirle filas.
+
+    Si la última línea no lo tiene puede ser una escritura interrumpida o un
+    CSV editado a mano y guardado sin el salto final. Se recorta solo si es
+    media fila: no tiene n_campos campos, el último está vacío o es el
+    comienzo de una de las líneas pendientes del WAL, que se volverán a
+    aplicar. Si es una fila completa se conserva y se le añade el salto.
+    Se llama con el bloqueo de path tomado.
+    """
+    try:
+        f = open(path, "r+b")
+    except FileNotFoundError:
+        return
+    with f:
+        fin = f.seek(0, os.SEEK_END)
+        pos = fin
+        while pos > 0:
+            inicio = max(0, pos - 4096)
+            f.seek(inicio)
+            bloque = f.read(pos - inicio)
+            salto = bloque.rfind(b"\n")
+            if salto >= 0:
+                pos = inicio + salto + 1
+                break
+            pos = inicio
+        if pos == fin:
+            return
+        f.seek(pos)
+        cola = f.read(fin - pos)
+        campos = next(csv.reader([cola.decode("utf-8", "replace")], delimiter=";", quotechar='"'), [])
+        cortada = (len(campos) != n_campos or not campos[-1].strip()
+                   or any(linea.encode("utf-8").startswith(cola) for linea in pendientes))
+        if cortada:
+            f.truncate(pos)
+        else:
+            f.write(b"\n")
+        _fsync(f)
+
+
+class IdsVolcados:
+    """Ids que ya están en clientes.csv, leídos de forma incremental.
+
+    Solo se leen las líneas añadidas desde la última vez (el CSV solo crece
+    por el final), y las altas que vuelca el propio proceso se anotan sin
+    releerlas: un checkpoint no vuelve a recorrer el CSV entero.
+    """
+    def __init__(self, csv_path: str = CLIENTES_CSV):
+        self.csv_path = csv_path
+        self.ids: Set[str] = set()
+        self.leido = 0   # bytes del CSV ya incorporados
+
+    def actualizar(self) -> Set[str]:
+        """Incorpora las líneas nuevas del CSV (con su bloqueo tomado) y devuelve los ids."""
+        if _tam(self.csv_path) < self.leido:
+            self.ids, self.leido = set(), 0  # El fichero se ha sustituido
+        try:
+            with open(self.csv_path, "rb") as f:
+                f.seek(self.leido)
+                for linea in f:
+                    if not linea.endswith(b"\n"):
+                        break
+                    self.ids.add(linea.split(b";", 1)[0].strip().decode("utf-8"))
+                    self.leido += len(linea)
+        except FileNotFoundError:
+            pass
+        return self.ids
+
+    def anotar(self, lineas: List[str], tam: int):
+        """Registra las líneas que se acaban de añadir al CSV, que ahora mide tam bytes."""
+        self.ids.update(l.split(";", 1)[0] for l in lineas)
+        self.leido = tam
+
+
+@instrumentado("volcado_wal_clientes", lambda a, k, r: {"filas": r})
+def recuperar_wal(csv_path: str = CLIENTES_CSV, wal_path: str = CLIENTES_WAL, volcados: IdsVolcados = None) -> int:
+    """Vuelca al CSV las altas del WAL que aún no estén en él y vacía el WAL.
+
+    Es idempotente: las líneas cuyo id ya figura en el CSV se ignoran.
+    Devuelve el número de altas recuperadas. Se hace con el bloqueo del CSV
+    tomado, que es el mismo con el que se escribe en el WAL. Con volcados
+    (ver IdsVolcados) el CSV solo se lee desde la última vez.
+    """
+    with bloqueo(csv_path):
+        return _recuperar_wal(csv_path, wal_path, volcados)
+
+def _recuperar_wal(csv_path: str, wal_path: str, volcados: IdsVolcados = None) -> int:
+    lineas = leer_wal(wal_path)
+    if not lineas:
+        if os.path.exists(wal_path) and os.path.getsize(wal_path):
+            _vaciar(wal_path)
+        return 0
+    # Una línea cortada al final del CSV se descarta antes de buscar ids y de añadir
+    reparar_final(csv_path, len(CABECERA_CLIENTES), lineas)
+    volcados = volcados or IdsVolcados(csv_path)
+    existentes = volcados.actualizar()
+    nuevas = [l for l in lineas if l.split(";", 1)[0] not in existentes]
+    if nuevas:
+        file_exists = os.path.exists(csv_path)
+        with open(csv_path, "a", newline="", encoding="utf-8") as f:
+            if not file_exists:
+                f.write(_linea_csv(CABECERA_CLIENTES))
+            f.writelines(nuevas)
+            _fsync(f)
+            volcados.anotar(nuevas, os.fstat(f.fileno()).st_size)
+    _vaciar(wal_path)
+    return len(nuevas)
+
+
+class SecuenciaIds:
+    """Secuencia persistente de ids: evita buscar el máximo en toda la lista en cada alta.
+
+    El último id asignado vive en un fichero compartido por todos los
+    procesos: cada siguiente() lo lee, lo incrementa y lo reescribe con su
+    bloqueo tomado, así que dos procesos nunca reciben el mismo id. Solo se
+    hace fsync al sincronizar; tras una caída se toma el mayor entre el valor
+    guardado y el mayor id conocido, así que los ids que se perdieron sin
+    sincronizar (junto con sus altas) pueden reutilizarse.
+    """
+    def __init__(self, path: str = CLIENTES_SEQ, minimo: int = 0):
+        self.path = path
+        with bloqueo(path, exclusivo=False):
+            self.actual = max(self._leer(), minimo)
+
+    def _leer(self) -> int:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _escribir(self, fsync: bool):
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(str(self.actual))
+            if fsync:
+                _fsync(f)
+
+    def siguiente(self) -> int:
+        with bloqueo(self.path):
+            self.actual = max(self._leer(), self.actual) + 1
+            self._escribir(fsync=False)
+            return self.actual
+
+    def guardar(self, fsync: bool = True):
+        with bloqueo(self.path):
+            self.actual = max(self._leer(), self.actual)  # Nunca hacia atrás si otro proceso asignó más
+            self._escribir(fsync)
+
+
+class EscritorClientes:
+    """Escritor de altas de clientes con WAL y fsync por lotes.
+
+    durabilidad:
+      - "siempre": fsync del WAL en cada alta.
+      - "lote": fsync cada tam_lote altas (y al cerrar).
+      - "ninguna": sin fsync; solo se vuelca en checkpoint()/cerrar().
+    Las altas se ven en clientes.csv tras checkpoint() o cerrar(). Hasta que
+    se sincronizan se guardan en memoria y se escriben en el WAL de una vez,
+    con el bloqueo del CSV, para no intercalarse con las de otros procesos.
+    """
+    def __init__(self, clientes=None, durabilidad: str = "lote", tam_lote: int = TAM_LOTE_FSYNC,
+                 csv_path: str = CLIENTES_CSV, wal_path: str = CLIENTES_WAL, seq_path: str = CLIENTES_SEQ):
+        if durabilidad not in DURABILIDADES:
+            raise ValueError(f"Durabilidad desconocida: {durabilidad}")
+        self.csv_path = csv_path
+        self.wal_path = wal_path
+        self.durabilidad = durabilidad
+        self.tam_lote = tam_lote
+        self.volcados = IdsVolcados(csv_path)
+        recuperar_wal(csv_path, wal_path, self.volcados)
+        if not clientes:
+            ids = (int(r[0]) for r in iter_csv(csv_path, tam_consistente(csv_path)) if r and r[0].strip().isdigit())
+        elif hasattr(clientes, "ids"):
+            ids = clientes.ids()  # FilasPerezosas (tablas bajo demanda): sin parsear las filas
+        else:
+            ids = (c.id for c in clientes)
+        self.secuencia = SecuenciaIds(seq_path, max(ids, default=0))
+        self.pendientes: List[str] = []
+
+    def siguiente_id(self) -> int:
+        return self.secuencia.siguiente()
+
+    def anadir(self, c: Cliente):
+        """Registra el alta en el WAL (la sincroniza según la durabilidad)."""
+        resto = _linea_csv([c.id, c.nombre, c.email, c.fecha_alta.strftime(DATE_FMT), int(c.activo)])
+        self.pendientes.append(f"{zlib.crc32(resto.encode('utf-8')):08x};{resto}")
+        if self.durabilidad == "siempre" or (self.durabilidad == "lote" and len(self.pendientes) >= self.tam_lote):
+            self.sincronizar()
+
+    def sincronizar(self):
+        """Escribe las altas pendientes en el WAL y hace fsync del WAL y de la secuencia de ids."""
+        fsync = self.durabilidad != "ninguna"
+        if self.pendientes:
+            # Se abre en cada sincronización: otro proceso puede vaciar o borrar el WAL entre medias
+            with bloqueo(self.csv_path), open(self.wal_path, "a", encoding="utf-8", newline="") as wal:
+                wal.write("".join(self.pendientes))
+                if fsync:
+                    _fsync(wal)
+        self.secuencia.guardar(fsync)
+        self.pendientes = []
+
+    def checkpoint(self):
+        """Vuelca el WAL a clientes.csv y lo vacía."""
+        self.sincronizar()
+        recuperar_wal(self.csv_path, self.wal_path, self.volcados)
+
+    def cerrar(self):
+        self.checkpoint()
+        with bloqueo(self.csv_path):
+            if os.path.exists(self.wal_path) and os.path.getsize(self.wal_path) == 0:
+                os.remove(self.wal_path)
@@ -0,0 +1,203 @@
+"""Snapshot binario de los datos ya parseados del CRM (data/crm.snapshot).
+
+Formato: MAGIC | longitud de la cabecera (u32) | cabecera JSON | secciones.
+La cabecera guarda la firma (tamaño, mtime y sha256) de cada CSV y, por
+cada sección, su tipo de array, desplazamiento y longitud. Las columnas de
+ventas se guardan tal cual (tobytes) alineadas a 8 bytes, de modo que se
+pueden leer de golpe o mapear con mmap. En modo streaming las ventas no
+están en memoria y no se guardan: se guarda su IndiceVentasCSV, que es lo
+que cuesta una pasada sobre ventas.csv, así que el snapshot también evita
+esa pasada. Cada snapshot sirve solo para el modo con el que se guardó.
+"""
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import struct
+import sys
+from array import array
+from datetime import date
+from typing import Dict
+
+from almacen import (COLUMNAS_INDICE, VentasColumnar, IndiceFechas, IndiceVentasCSV, VentasCSV, FilasPerezosas,
+                     cargar_clientes, cargar_eventos)
+from comun import CLIENTES_CSV, EVENTOS_CSV, VENTAS_CSV, SNAPSHOT_BIN, COLUMNAS_VENTAS, Cliente, Evento, _tam, _len
+from instrumentacion import instrumentado
+
+SNAPSHOT_MAGIC = b"CRMSNAP1"
+COLUMNAS_INDICE_CSV = ("inicios", "minimos", "maximos", "fechas", "acum_ventas", "acum_unidades", "acum_ingresos")
+
+def hash_fichero(path: str) -> str:
+    """sha256 del contenido de un fichero, leído por bloques."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+def firma_csv(path: str) -> Dict:
+    """Tamaño, mtime y hash de un CSV (o None si no existe)."""
+    if not os.path.exists(path):
+        return None
+    st = os.stat(path)
+    return {"tam": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": hash_fichero(path)}
+
+def _firma_vigente(path: str, guardada: Dict) -> bool:
+    """Compara un CSV con su firma guardada; solo calcula el hash si cambió el mtime."""
+    if guardada is None or not os.path.exists(path):
+        return guardada is None and not os.path.exists(path)
+    st = os.stat(path)
+    if st.st_size != guardada["tam"]:
+        return False
+    if st.st_mtime_ns == guardada["mtime_ns"]:
+        return True
+    return hash_fichero(path) == guardada["sha256"]
+
+def guardar_snapshot(firmas: Dict, clientes, eventos, ventas, path: str = SNAPSHOT_BIN):
+    """Escribe el snapshot binario (de forma atómica, vía fichero temporal).
+
+    ventas es un VentasColumnar o, en modo streaming, un VentasCSV ya indexado.
+    """
+    secciones = []
+    cuerpos = []
+    offset = 0
+    streaming = None
+
+    def seccion(nombre, tipo, datos: bytes):
+        nonlocal offset
+        relleno = -len(datos) % 8
+        secciones.append({"nombre": nombre, "tipo": tipo, "offset": offset, "longitud": len(datos)})
+        cuerpos.append(datos + b"\0" * relleno)
+        offset += len(datos) + relleno
+
+    if isinstance(ventas, VentasCSV):
+        indice = ventas.indexar()
+        streaming = {"fin": indice.fin, "tam_lote": ventas.tam_lote}
+        for col in COLUMNAS_INDICE_CSV:
+            arr = getattr(indice, col)
+            seccion("streaming." + col, _tipo_columna(arr), arr.tobytes())
+        seccion("streaming.eventos", "q", array("q", indice.por_evento).tobytes())
+        seccion("streaming.ingresos_eventos", "d", array("d", indice.por_evento.values()).tobytes())
+    else:
+        for col in COLUMNAS_VENTAS:
+            arr = getattr(ventas, col)
+            seccion("ventas." + col, _tipo_columna(arr), arr.tobytes())
+    if isinstance(ventas, VentasColumnar) and ventas._indice is not None and not ventas._indice.pendientes:
+        for col in COLUMNAS_INDICE:
+            arr = getattr(ventas._indice, col)
+            seccion("indice." + col, _tipo_columna(arr), arr.tobytes())
+    # Las tablas perezosas no se guardan: parsearlas enteras es lo que evitan
+    if not isinstance(clientes, FilasPerezosas):
+        filas_cli = [(c.id, c.nombre, c.email, c.fecha_alta.toordinal(), c.activo) for c in clientes]
+        seccion("clientes", "pickle", pickle.dumps(filas_cli, pickle.HIGHEST_PROTOCOL))
+    if not isinstance(eventos, FilasPerezosas):
+        filas_evt = [(e.id, e.nombre, e.categoria, e.fecha_evento.toordinal(), e.precio) for e in eventos]
+        seccion("eventos", "pickle", pickle.dumps(filas_evt, pickle.HIGHEST_PROTOCOL))
+
+    cabecera = json.dumps({"version": 1, "byteorder": sys.byteorder, "fuentes": firmas,
+                           "streaming": streaming, "secciones": secciones}).encode("utf-8")
+    inicio = len(SNAPSHOT_MAGIC) + 4 + len(cabecera)
+    cabecera += b" " * (-inicio % 8)
+    tmp = f"{path}.{os.getpid()}.tmp"  # Un temporal por proceso: pueden guardar a la vez
+    with open(tmp, "wb") as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(struct.pack("<I", len(cabecera)))
+        f.write(cabecera)
+        for cuerpo in cuerpos:
+            f.write(cuerpo)
+    os.replace(tmp, path)
+
+def _tipo_columna(col) -> str:
+    # Las columnas son arrays o, en un snapshot compartido, memoryviews del mmap
+    return col.typecode if isinstance(col, array) else col.format
+
+@instrumentado("cargar_snapshot", lambda a, k, r: {"filas": _len(r[2]) if r else 0, "bytes_leidos": _tam(a[0] if a else k.get("path", SNAPSHOT_BIN)) if r else 0})
+def cargar_snapshot(path: str = SNAPSHOT_BIN, compartido: bool = False, perezosas: bool = False,
+                    streaming: bool = False):
+    """Carga el snapshot si sigue siendo válido para los CSV actuales; si no, devuelve None.
+
+    Con streaming=True las ventas son un VentasCSV con el índice del
+    snapshot; un snapshot guardado en el otro modo no sirve (devuelve None).
+
+    Si solo ha cambiado clientes.csv (altas de otro proceso) se aprovechan
+    eventos y ventas y los clientes se leen del CSV. Con perezosas=True
+    clientes y eventos no se sacan del snapshot sino que se leen del CSV bajo
+    demanda (ver TablaPerezosa). Con compartido=True las
+    columnas de ventas y del índice no se copian: son vistas de solo lectura
+    sobre el fichero mapeado con mmap, de modo que varios procesos lectores
+    comparten las mismas páginas de memoria. Aunque otro proceso reemplace el
+    snapshot, el mapeo sigue viendo el fichero que se abrió.
+    """
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                return None
+            (n,) = struct.unpack("<I", f.read(4))
+            cab = json.loads(f.read(n))
+            if cab.get("version") != 1 or cab.get("byteorder") != sys.byteorder:
+                return None
+            if bool(cab.get("streaming")) != streaming:
+                return None
+            fuentes = cab["fuentes"]
+            for nombre, csv_path in (("eventos", EVENTOS_CSV), ("ventas", VENTAS_CSV)):
+                if not _firma_vigente(csv_path, fuentes.get(nombre)):
+                    return None
+            clientes_vigentes = _firma_vigente(CLIENTES_CSV, fuentes.get("clientes"))
+            inicio = f.tell()
+            if compartido:
+                datos = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))[inicio:]
+            else:
+                datos = f.read()
+    except (OSError, ValueError, KeyError, struct.error):
+        return None
+
+    def leer(sec):
+        return memoryview(datos)[sec["offset"]:sec["offset"] + sec["longitud"]]
+
+    def columna(sec) -> array:
+        if compartido:
+            return leer(sec).cast(sec["tipo"])
+        col = array(sec["tipo"])
+        col.frombytes(leer(sec))
+        return col
+
+    ventas = VentasColumnar()
+    indice = {}
+    indice_csv = {}
+    clientes, eventos, cli_index, evt_index = [], [], {}, {}
+    # Un snapshot guardado con tablas perezosas no lleva clientes ni eventos
+    nombres = {sec["nombre"] for sec in cab["secciones"]}
+    clientes_snapshot = clientes_vigentes and not perezosas and "clientes" in nombres
+    eventos_snapshot = not perezosas and "eventos" in nombres
+    if not clientes_snapshot:
+        clientes, cli_index = cargar_clientes(CLIENTES_CSV, perezosas)
+    if not eventos_snapshot:
+        eventos, evt_index = cargar_eventos(EVENTOS_CSV, perezosas)
+    for sec in cab["secciones"]:
+        grupo, _, col = sec["nombre"].partition(".")
+        if grupo == "ventas":
+            setattr(ventas, col, columna(sec))
+        elif grupo == "indice":
+            indice[col] = columna(sec)
+        elif grupo == "streaming":
+            indice_csv[col] = columna(sec)
+        elif grupo == "clientes" and clientes_snapshot:
+            for id_, nombre, email, f_alta, activo in pickle.loads(leer(sec)):
+                c = Cliente(id_, nombre, email, date.fromordinal(f_alta), activo)
+                clientes.append(c)
+                cli_index[id_] = c
+        elif grupo == "eventos" and eventos_snapshot:
+            for id_, nombre, categoria, fecha, precio in pickle.loads(leer(sec)):
+                e = Evento(id_, nombre, categoria, date.fromordinal(fecha), precio)
+                eventos.append(e)
+                evt_index[id_] = e
+    if streaming:
+        ventas = VentasCSV(VENTAS_CSV, cab["streaming"]["tam_lote"])
+        por_evento = dict(zip(indice_csv.pop("eventos"), indice_csv.pop("ingresos_eventos")))
+        ventas._indice = IndiceVentasCSV(cab["streaming"]["fin"], por_evento=por_evento, **indice_csv)
+    elif len(indice) == len(COLUMNAS_INDICE):
+        ventas._indice = IndiceFechas(ventas, indice)
+    else:
+        ventas.indexar()
+    return clientes, eventos, ventas, cli_index, evt_index
@@ -0,0 +1,9 @@
+"""Benchmarks de las prácticas con datos sintéticos.
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks --tamanos 10k 1m --salida resultados.json
+
+Genera (con semilla fija) horarios.csv y los CSV del Mini-CRM, mide cada
+caso en un proceso nuevo y escribe los resultados en JSON.
+"""
@@ -0,0 +1,161 @@
+"""Casos de benchmark: cada uno prepara sus datos y devuelve (función a medir, filas procesadas).
+
+Se ejecutan con el directorio de trabajo en la carpeta generada por
+generadores.preparar(), que contiene horarios.csv y data/.
+"""
+import csv
+import importlib.util
+import os
+import sys
+from datetime import date
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def cargar_practica(nombre: str, ruta: str):
+    """Importa un script de práctica por ruta (no son paquetes).
+
+    Su carpeta se añade a sys.path para que los procesos hijos arrancados con
+    spawn (ver cargar_ventas_paralelo) puedan importarlo por su nombre.
+    """
+    if nombre in sys.modules:
+        return sys.modules[nombre]
+    carpeta = os.path.dirname(os.path.join(RAIZ, ruta))
+    if carpeta not in sys.path:
+        sys.path.insert(0, carpeta)
+    spec = importlib.util.spec_from_file_location(nombre, os.path.join(RAIZ, ruta))
+    modulo = importlib.util.module_from_spec(spec)
+    sys.modules[nombre] = modulo
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+def practica3():
+    return cargar_practica("Practica3", os.path.join("Practica3", "Practica3.py"))
+
+
+def final():
+    return cargar_practica("Final", os.path.join("PracticaFinal", "Final.py"))
+
+
+def _filas_csv(path: str) -> int:
+    with open(path, encoding="utf-8") as f:
+        return sum(1 for _ in f) - 1
+
+
+# --- Practica2 ---
+def caso_contar_entradas():
+    p2 = cargar_practica("Practica2", os.path.join("Practica2", "Practica2.py"))
+    horarios = {}
+    with open("horarios.csv", newline="", encoding="utf-8") as f:
+        lector = csv.reader(f, delimiter=";")
+        next(lector)
+        for nombre, _, entrada, salida in lector:
+            horarios.setdefault(nombre, (entrada, salida))
+    p2.horarios = horarios
+    p2.input = lambda *_: "9"
+
+    def contar():
+        # Sin el histograma de la repetición anterior: se mide también su cálculo
+        p2._entradas_acumuladas = None
+        p2.contar_entradas()
+    return contar, len(horarios)
+
+
+# --- Practica3 ---
+def caso_leer_csv():
+    p3 = practica3()
+    return (lambda: p3.leer_csv("horarios.csv")), _filas_csv("horarios.csv")
+
+
+def caso_resumen_semanal():
+    p3 = practica3()
+    registros = p3.leer_csv("horarios.csv")
+    return (lambda: p3.resumen_semanal(registros)), len(registros)
+
+
+# --- PracticaFinal ---
+def _datos_final():
+    f = final()
+    return f, f.cargar_datos(usar_snapshot=False, procesos=1)
+
+
+def caso_cargar_datos():
+    f = final()
+    return (lambda: f.cargar_datos(usar_snapshot=False, procesos=1)), _filas_csv(f.VENTAS_CSV)
+
+
+def caso_clientes_bajo_demanda():
+    f = final()
+    ids = [int(r[0]) for r in f.iter_csv(f.CLIENTES_CSV)]
+    consultados = ids[::max(1, len(ids) // 1000)]
+
+    def consultar():
+        # Indexar clientes.csv y leer unos mil clientes sueltos
+        _, cli_index = f.cargar_clientes(f.CLIENTES_CSV, perezosa=True)
+        return [cli_index[cid].nombre for cid in consultados]
+    return consultar, len(ids)
+
+
+def caso_cargar_datos_snapshot():
+    f = final()
+    f.cargar_datos(procesos=1)  # escribe el snapshot
+    return (lambda: f.cargar_datos(procesos=1)), _filas_csv(f.VENTAS_CSV)
+
+
+def caso_filtrar_sqlite():
+    f = final()
+    if os.path.exists(f.BASE_SQLITE):
+        os.remove(f.BASE_SQLITE)
+    f.crear_base_sqlite()
+    ventas = f.VentasSQLite()
+    # Agregado y listado de un mes de ventas a mitad del periodo generado
+    desde, hasta = date(2024, 9, 1), date(2024, 9, 30)
+    return (lambda: (ventas.agregado_rango(desde, hasta), sum(1 for _ in ventas.filas_rango(desde, hasta))),
+            len(ventas))
+
+
+def caso_estadisticas():
+    f, (clientes, eventos, ventas, cli_index, evt_index) = _datos_final()
+    return (lambda: f.estadisticas(eventos, ventas)), len(ventas)
+
+
+def caso_filtrar_ventas_por_rango():
+    f, (clientes, eventos, ventas, cli_index, evt_index) = _datos_final()
+    respuestas = []
+    f.input = lambda *_: respuestas.pop(0)
+
+    def filtrar():
+        # Un mes de ventas a mitad del periodo generado
+        respuestas[:] = [date(2024, 9, 1).isoformat(), date(2024, 9, 30).isoformat()]
+        f.filtrar_ventas_por_rango(ventas, cli_index, evt_index)
+    return filtrar, len(ventas)
+
+
+def caso_exportar_informe():
+    f, (clientes, eventos, ventas, cli_index, evt_index) = _datos_final()
+    return (lambda: f.exportar_informe(eventos, ventas, None, "evento", evt_index, cli_index)), len(ventas)
+
+
+def caso_periodos_cubo():
+    f, (clientes, eventos, ventas, cli_index, evt_index) = _datos_final()
+    cubo = f.CuboVentas.desde_ventas(ventas, evt_index)
+    # Un panel: cada mes, semana y día de un semestre, total y por categoría
+    desde, hasta = date(2024, 3, 1), date(2024, 8, 31)
+    categorias = [None] + sorted({e.categoria for e in eventos})
+    return (lambda: [cubo.consultar(g, desde, hasta, c) for g in f.GRANULARIDADES for c in categorias]), len(ventas)
+
+
+CASOS = {
+    "practica2.contar_entradas": caso_contar_entradas,
+    "practica3.leer_csv": caso_leer_csv,
+    "practica3.resumen_semanal": caso_resumen_semanal,
+    "final.cargar_datos": caso_cargar_datos,
+    "final.cargar_datos_snapshot": caso_cargar_datos_snapshot,
+    "final.clientes_bajo_demanda": caso_clientes_bajo_demanda,
+    "final.estadisticas": caso_estadisticas,
+    "final.filtrar_ventas_por_rango": caso_filtrar_ventas_por_rango,
+    "final.filtrar_sqlite": caso_filtrar_sqlite,
+    "final.exportar_informe": caso_exportar_informe,
+    "final.periodos_cubo": caso_periodos_cubo,
+}
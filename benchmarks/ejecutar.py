@@ -0,0 +1,88 @@
+"""Ejecuta los benchmarks y escribe los resultados en JSON.
+
+Cada caso se mide en un proceso nuevo (spawn) para que el pico de RSS sea
+solo suyo. Con --tracemalloc se miden además las asignaciones de Python
+(pico de memoria trazada y nº de bloques), a costa de ralentizar el caso.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from multiprocessing import get_context
+
+from benchmarks import generadores
+from benchmarks.casos import CASOS
+
+
+def _rss_pico_kb() -> int:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss  # macOS lo da en bytes
+
+
+def medir(caso: str, base: str, con_tracemalloc: bool, repeticiones: int) -> dict:
+    """Prepara y mide un caso (se ejecuta en el proceso hijo)."""
+    os.chdir(base)
+    with open(os.devnull, "w", encoding="utf-8") as nulo, redirect_stdout(nulo):
+        funcion, filas = CASOS[caso]()
+        rss_preparado = _rss_pico_kb()
+        if con_tracemalloc:
+            tracemalloc.start()
+        tiempos = []
+        for _ in range(repeticiones):
+            t0 = time.perf_counter()
+            funcion()
+            tiempos.append(time.perf_counter() - t0)
+        resultado = {}
+        if con_tracemalloc:
+            _, pico = tracemalloc.get_traced_memory()
+            bloques = sum(s.count for s in tracemalloc.take_snapshot().statistics("filename"))
+            tracemalloc.stop()
+            resultado.update(asignaciones_pico_bytes=pico, bloques_vivos=bloques)
+    mejor = min(tiempos)
+    resultado.update(
+        caso=caso, filas=filas, segundos=mejor, segundos_todos=tiempos,
+        filas_por_segundo=filas / mejor if mejor else None,
+        rss_preparado_kb=rss_preparado, rss_pico_kb=_rss_pico_kb(),
+    )
+    return resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmarks de las prácticas con datos sintéticos.")
+    parser.add_argument("--tamanos", nargs="+", choices=tuple(generadores.TAMANOS), default=["10k"])
+    parser.add_argument("--casos", nargs="+", choices=tuple(CASOS), default=list(CASOS))
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--tracemalloc", action="store_true", help="medir también las asignaciones")
+    parser.add_argument("--datos", default=os.path.join(tempfile.gettempdir(), "crm_benchmarks"),
+                        help="carpeta donde se generan (y reutilizan) los datos")
+    parser.add_argument("--salida", help="fichero JSON de resultados (por defecto, stdout)")
+    args = parser.parse_args(argv)
+
+    informe = {"python": platform.python_version(), "plataforma": platform.platform(),
+               "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"), "semilla": args.semilla, "resultados": []}
+    ctx = get_context("spawn")
+    for tamano in args.tamanos:
+        print(f"Generando datos {tamano}...", file=sys.stderr)
+        base = generadores.preparar(args.datos, tamano, args.semilla)
+        for caso in args.casos:
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                r = pool.submit(medir, caso, base, args.tracemalloc, args.repeticiones).result()
+            r["tamano"] = tamano
+            informe["resultados"].append(r)
+            print(f"  {caso:32s} {r['segundos']:9.4f} s  {r['rss_pico_kb'] / 1024:8.1f} MiB", file=sys.stderr)
+
+    texto = json.dumps(informe, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    else:
+        print(texto)
+
@@ -0,0 +1,135 @@
+"""Prueba de estrés de la concurrencia del CRM: bloqueos, ids y lecturas consistentes.
+
+    python -m benchmarks.estres_concurrencia --escritores 24 --lectores 12 --altas 200
+
+Copia los datos sintéticos de 10k ventas a una carpeta temporal y lanza a la
+vez procesos escritores y lectores:
+
+  - Los escritores dan altas de clientes. Dos de cada tres usan
+    EscritorClientes (WAL), con durabilidades distintas y checkpoints
+    frecuentes. El tercero usa SecuenciaIds + append_row_csv.
+  - Los lectores releen clientes.csv con lectura consistente y cargan el
+    snapshot compartido (mmap) una y otra vez.
+
+Al terminar comprueba que no hay ids repetidos, que están todas las altas,
+que ninguna línea quedó cortada y que el WAL quedó vacío. Sale con código 1
+si algo falla.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from datetime import date
+from multiprocessing import get_context
+
+from benchmarks.casos import final
+from benchmarks.generadores import preparar
+
+DURABILIDADES = ("siempre", "lote", "ninguna")
+
+
+def escritor(base: str, n: int, altas: int) -> list:
+    """Da `altas` altas y devuelve los ids que recibió."""
+    os.chdir(base)
+    f = final()
+    ids = []
+    if n % 3 == 2:
+        secuencia = f.SecuenciaIds(f.CLIENTES_SEQ)
+        for i in range(altas):
+            cid = secuencia.siguiente()
+            f.append_row_csv(f.CLIENTES_CSV, f.CABECERA_CLIENTES,
+                             [cid, f"Escritor {n}-{i}", f"e{n}.{i}@estres.es", "2025-01-01", 1])
+            ids.append(cid)
+        return ids
+    esc = f.EscritorClientes(None, durabilidad=DURABILIDADES[n % 3], tam_lote=7)
+    for i in range(altas):
+        c = f.Cliente(esc.siguiente_id(), f"Escritor {n}-{i}", f"e{n}.{i}@estres.es", date(2025, 1, 1), True)
+        esc.anadir(c)
+        ids.append(c.id)
+        if i % 25 == 24:
+            esc.checkpoint()
+    esc.cerrar()
+    return ids
+
+
+def lector(base: str, lecturas: int, n_ventas: int) -> dict:
+    """Relee clientes y el snapshot; devuelve las anomalías encontradas."""
+    os.chdir(base)
+    f = final()
+    errores = []
+    filas_vistas = 0
+    for _ in range(lecturas):
+        ids = set()
+        for r in f.iter_csv(f.CLIENTES_CSV, f.tam_consistente(f.CLIENTES_CSV)):
+            if len(r) != 5 or not r[0].isdigit() or not f.email_valido(r[2]):
+                errores.append(f"fila cortada: {r}")
+                continue
+            if r[0] in ids:
+                errores.append(f"id repetido en una lectura: {r[0]}")
+            ids.add(r[0])
+        filas_vistas += len(ids)
+        with redirect_stdout(open(os.devnull, "w")):
+            datos = f.cargar_snapshot(compartido=True)
+        if datos is None:
+            errores.append("snapshot no válido")
+        elif len(datos[2]) != n_ventas:
+            errores.append(f"snapshot con {len(datos[2])} ventas")
+    return {"errores": errores, "filas_vistas": filas_vistas}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.estres_concurrencia")
+    parser.add_argument("--escritores", type=int, default=24)
+    parser.add_argument("--lectores", type=int, default=12)
+    parser.add_argument("--altas", type=int, default=200, help="altas por escritor")
+    parser.add_argument("--lecturas", type=int, default=20, help="lecturas por lector")
+    parser.add_argument("--semilla", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    datos = preparar(os.path.join(tempfile.gettempdir(), "crm_benchmarks"), "10k", args.semilla)
+    base = tempfile.mkdtemp(prefix="crm_estres_")
+    shutil.copytree(os.path.join(datos, "data"), os.path.join(base, "data"))
+    os.chdir(base)
+    f = final()
+    with redirect_stdout(sys.stderr):
+        clientes, _, ventas, _, _ = f.cargar_datos(procesos=1)  # Deja escrito el snapshot
+    iniciales = {c.id for c in clientes}
+
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.escritores + args.lectores, mp_context=get_context("spawn")) as pool:
+        lecturas = [pool.submit(lector, base, args.lecturas, len(ventas)) for _ in range(args.lectores)]
+        escrituras = [pool.submit(escritor, base, n, args.altas) for n in range(args.escritores)]
+        asignados = [cid for fut in escrituras for cid in fut.result()]
+        resultados = [fut.result() for fut in lecturas]
+    segundos = time.perf_counter() - t0
+
+    fallos = [e for r in resultados for e in r["errores"]]
+    if len(set(asignados)) != len(asignados):
+        fallos.append(f"{len(asignados) - len(set(asignados))} ids asignados dos veces")
+    if iniciales & set(asignados):
+        fallos.append("ids nuevos que ya existían")
+    filas = list(f.iter_csv(f.CLIENTES_CSV))
+    ids_csv = [int(r[0]) for r in filas]
+    if len(ids_csv) != len(set(ids_csv)):
+        fallos.append("ids repetidos en clientes.csv")
+    if set(ids_csv) != iniciales | set(asignados):
+        fallos.append(f"clientes.csv tiene {len(ids_csv)} clientes, se esperaban {len(iniciales) + len(asignados)}")
+    if any(len(r) != 5 for r in filas):
+        fallos.append("líneas cortadas en clientes.csv")
+    if os.path.exists(f.CLIENTES_WAL) and os.path.getsize(f.CLIENTES_WAL):
+        fallos.append("el WAL no quedó vacío")
+
+    print(f"{args.escritores} escritores, {args.lectores} lectores: {len(asignados)} altas en {segundos:.2f} s "
+          f"({len(asignados) / segundos:.0f} altas/s), {sum(r['filas_vistas'] for r in resultados)} filas leídas")
+    for fallo in fallos[:20]:
+        print(f"FALLO: {fallo}")
+    shutil.rmtree(base, ignore_errors=True)
+    sys.exit(1 if fallos else 0)
+
+
+if __name__ == "__main__":
+    main()
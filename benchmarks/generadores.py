@@ -0,0 +1,107 @@
+"""Generadores de datos sintéticos (reproducibles con semilla) para los benchmarks."""
+import csv
+import os
+import random
+from datetime import date, timedelta
+from itertools import accumulate
+
+# Tamaños con nombre: nº de filas de horarios.csv y de ventas.csv
+TAMANOS = {"10k": 10_000, "1m": 1_000_000, "50m": 50_000_000}
+
+DIAS = ["Lunes", "Martes", "Miercoles", "Jueves", "Viernes", "Sabado", "Domingo"]
+CATEGORIAS = ["Tecnología", "Marketing", "Música", "Deporte", "Formación", "Gastronomía"]
+BLOQUE = 100_000  # Filas generadas por llamada a random.choices
+
+
+def pesos_zipf(n: int, s: float = 1.1):
+    """Pesos acumulados de una distribución tipo Zipf sobre n elementos."""
+    return list(accumulate(1 / (i ** s) for i in range(1, n + 1)))
+
+
+def generar_horarios(path: str, filas: int, semilla: int = 42):
+    """horarios.csv con turnos de ~250 días por empleado; más turnos entre semana."""
+    rnd = random.Random(semilla)
+    n_empleados = max(10, filas // 250)
+    empleados = [f"Emp{i:06d}" for i in range(1, n_empleados + 1)]
+    pesos_dias = [20, 20, 20, 20, 20, 6, 3]
+    entradas = list(range(5, 14))
+    pesos_entradas = [1, 4, 10, 12, 8, 4, 2, 2, 1]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f, delimiter=";")
+        w.writerow(["nombre_empleado", "dia", "hora_entrada", "hora_salida"])
+        hechas = 0
+        while hechas < filas:
+            n = min(BLOQUE, filas - hechas)
+            emps = rnd.choices(empleados, k=n)
+            dias = rnd.choices(DIAS, weights=pesos_dias, k=n)
+            ents = rnd.choices(entradas, weights=pesos_entradas, k=n)
+            w.writerows((e, d, h, min(23, h + rnd.randint(4, 9))) for e, d, h in zip(emps, dias, ents))
+            hechas += n
+
+
+def generar_crm(data_dir: str, ventas: int, semilla: int = 42):
+    """clientes.csv, eventos.csv y ventas.csv con popularidad sesgada (Zipf).
+
+    Hay ~1 cliente por cada 20 ventas y ~1 evento por cada 500. Las ventas
+    cubren dos años, están ordenadas por fecha (como una exportación real) y
+    la mayoría son de 1 o 2 unidades.
+    """
+    rnd = random.Random(semilla)
+    os.makedirs(data_dir, exist_ok=True)
+    n_clientes = max(100, ventas // 20)
+    n_eventos = max(20, ventas // 500)
+    inicio = date(2024, 1, 1)
+
+    with open(os.path.join(data_dir, "clientes.csv"), "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f, delimiter=";")
+        w.writerow(["id", "nombre", "email", "fecha_alta", "activo"])
+        for i in range(1, n_clientes + 1):
+            alta = inicio - timedelta(days=rnd.randint(0, 2000))
+            w.writerow([i, f"Cliente {i}", f"cliente{i}@example.com", alta.isoformat(), int(rnd.random() < 0.85)])
+
+    precios = {}
+    with open(os.path.join(data_dir, "eventos.csv"), "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f, delimiter=";")
+        w.writerow(["id", "nombre", "categoria", "fecha", "precio"])
+        for i in range(1, n_eventos + 1):
+            precios[i] = round(rnd.uniform(10, 300), 2)
+            fecha = inicio + timedelta(days=rnd.randint(0, 1000))
+            w.writerow([i, f"Evento {i}", rnd.choice(CATEGORIAS), fecha.isoformat(), f"{precios[i]:.2f}"])
+
+    cum_clientes = pesos_zipf(n_clientes)
+    cum_eventos = pesos_zipf(n_eventos)
+    ids_clientes = range(1, n_clientes + 1)
+    ids_eventos = range(1, n_eventos + 1)
+    dias = 730
+    with open(os.path.join(data_dir, "ventas.csv"), "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f, delimiter=";")
+        w.writerow(["id", "cliente_id", "evento_id", "fecha", "unidades", "precio_unitario"])
+        hechas = 0
+        while hechas < ventas:
+            n = min(BLOQUE, ventas - hechas)
+            clis = rnd.choices(ids_clientes, cum_weights=cum_clientes, k=n)
+            evts = rnd.choices(ids_eventos, cum_weights=cum_eventos, k=n)
+            uds = rnd.choices((1, 2, 3, 4, 6), weights=(50, 30, 10, 6, 4), k=n)
+            filas = []
+            for k in range(n):
+                i = hechas + k
+                fecha = inicio + timedelta(days=i * dias // ventas)
+                precio = precios[evts[k]]
+                if rnd.random() < 0.1:
+                    precio = round(precio * 0.8, 2)  # descuento
+                filas.append((i + 1, clis[k], evts[k], fecha.isoformat(), uds[k], f"{precio:.2f}"))
+            w.writerows(filas)
+            hechas += n
+
+
+def preparar(directorio: str, tamano: str, semilla: int = 42) -> str:
+    """Genera (si no existen ya con la misma semilla) los datos de un tamaño y devuelve su carpeta."""
+    filas = TAMANOS[tamano]
+    base = os.path.join(directorio, f"{tamano}-s{semilla}")
+    marca = os.path.join(base, ".completo")
+    if not os.path.exists(marca):
+        os.makedirs(base, exist_ok=True)
+        generar_horarios(os.path.join(base, "horarios.csv"), filas, semilla)
+        generar_crm(os.path.join(base, "data"), filas, semilla)
+        open(marca, "w").close()
+    return base
@@ -0,0 +1,68 @@
+"""Comparación de memoria: RegistroHorario original (con __dict__) frente al compacto.
+
+    python -m benchmarks.memoria_registros --registros 1000000 10000000
+
+Cada medida se hace en un proceso nuevo: se crean N registros con cadenas
+nuevas en cada fila (como las devuelve csv.reader) y se mide el aumento del
+pico de RSS.
+"""
+import argparse
+import json
+import resource
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from benchmarks.casos import practica3
+from benchmarks.generadores import DIAS
+
+
+class RegistroHorarioOriginal:
+    """Copia de la clase anterior a __slots__, como referencia."""
+    def __init__(self, empleado, dia, entrada, salida):
+        self.empleado = empleado
+        self.dia = dia
+        self.entrada = entrada
+        self.salida = salida
+
+    def duracion(self):
+        return self.salida - self.entrada
+
+
+def _rss_kb() -> int:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def medir(clase: str, n: int) -> dict:
+    cls = RegistroHorarioOriginal if clase == "original" else practica3().RegistroHorario
+    n_empleados = max(10, n // 250)
+    antes = _rss_kb()
+    registros = []
+    for i in range(n):
+        # Cadenas nuevas en cada fila, igual que las que produce csv.reader
+        nombre = "".join(("Emp", str(100000 + i % n_empleados)))
+        dia = "".join(DIAS[i % 7])
+        registros.append(cls(nombre, dia, 8, 16))
+    despues = _rss_kb()
+    return {"clase": clase, "registros": n, "rss_kb": despues - antes,
+            "bytes_por_registro": (despues - antes) * 1024 / n}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.memoria_registros")
+    parser.add_argument("--registros", nargs="+", type=int, default=[1_000_000, 10_000_000])
+    args = parser.parse_args(argv)
+    resultados = []
+    for n in args.registros:
+        for clase in ("original", "compacta"):
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                r = pool.submit(medir, clase, n).result()
+            resultados.append(r)
+            print(f"{n:>11,} {clase:9s} {r['rss_kb'] / 1024:9.1f} MiB  {r['bytes_por_registro']:6.1f} B/registro",
+                  file=sys.stderr)
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Escritura de informes compartida por Practica3 y PracticaFinal.
+
+Cada informe se escribe en un fichero temporal junto al destino, con un
+buffer grande, y al terminar se renombra sobre el destino (os.replace es
+atómico). Si el proceso cae a mitad, el informe anterior sigue intacto y
+quien lo lea nunca ve un fichero cortado.
+
+Opcionalmente:
+  - compresion: "gz", "bz2", "xz" o "zst" (este último solo si la librería
+    estándar lo trae, Python 3.14+). Se añade la extensión al nombre.
+  - huella: resumen de los datos de entrada (ver huella() y
+    huella_ficheros()). Se guarda en <informe>.huella y, si coincide con la
+    de la última exportación, el informe no se vuelve a escribir.
+"""
+import bz2
+import csv
+import gzip
+import hashlib
+import io
+import json
+import lzma
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    from compression import zstd  # Solo en Python 3.14+
+except ImportError:
+    zstd = None
+
+BUFFER_ESCRITURA = 1 << 20  # Buffer de los ficheros de informe (1 MiB)
+NIVEL_COMPRESION = 6
+
+# compresion -> (extensión, función que envuelve el fichero binario)
+COMPRESIONES = {
+    # mtime=0: el mismo contenido produce siempre los mismos bytes
+    "gz": (".gz", lambda f: gzip.GzipFile(filename="", mode="wb", fileobj=f, mtime=0,
+                                          compresslevel=NIVEL_COMPRESION)),
+    "bz2": (".bz2", lambda f: bz2.BZ2File(f, "wb")),
+    "xz": (".xz", lambda f: lzma.LZMAFile(f, "wb", preset=NIVEL_COMPRESION)),
+}
+if zstd is not None:
+    COMPRESIONES["zst"] = (".zst", lambda f: zstd.ZstdFile(f, "wb"))
+
+
+def huella(*partes) -> str:
+    """sha256 de los valores indicados (cualquier cosa que json pueda serializar)."""
+    texto = json.dumps(partes, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def huella_ficheros(rutas) -> list:
+    """Ruta, tamaño y mtime de cada fichero de entrada (sin leerlos).
+
+    Debe tomarse antes de leerlos: si cambian durante la lectura, la huella
+    no coincidirá la próxima vez y el informe se reescribirá.
+    """
+    estado = []
+    for ruta in rutas:
+        try:
+            st = os.stat(ruta)
+        except FileNotFoundError:
+            estado.append([os.path.abspath(ruta), None, None])
+        else:
+            estado.append([os.path.abspath(ruta), st.st_size, st.st_mtime_ns])
+    return estado
+
+
+def ruta_informe(path: str, compresion: str = None) -> str:
+    """Nombre final del informe (con la extensión de la compresión, si hay)."""
+    if compresion is None:
+        return path
+    if compresion not in COMPRESIONES:
+        raise ValueError(f"Compresión no disponible: {compresion}")
+    return path + COMPRESIONES[compresion][0]
+
+
+def _path_huella(path: str) -> str:
+    return path + ".huella"
+
+
+def informe_vigente(path: str, huella_actual: str, compresion: str = None) -> bool:
+    """True si el informe existe y se generó a partir de la misma huella."""
+    if huella_actual is None:
+        return False
+    path = ruta_informe(path, compresion)
+    try:
+        with open(_path_huella(path), encoding="utf-8") as f:
+            return f.read().strip() == huella_actual and os.path.exists(path)
+    except FileNotFoundError:
+        return False
+
+
+@contextmanager
+def abrir_atomico(path: str, compresion: str = None, huella_actual: str = None, encoding: str = "utf-8"):
+    """Abre un fichero de texto temporal que sustituye a path al salir sin errores.
+
+    Si hay una excepción, el temporal se borra y path no se toca. Con
+    huella_actual, tras el renombrado se guarda la huella del informe.
+    """
+    path = ruta_informe(path, compresion)
+    # Un temporal por proceso e hilo: pueden exportar el mismo informe a la vez
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    crudo = open(tmp, "wb", buffering=BUFFER_ESCRITURA)
+    try:
+        binario = COMPRESIONES[compresion][1](crudo) if compresion else crudo
+        with io.TextIOWrapper(binario, encoding=encoding, newline="") as f:
+            yield f
+        crudo.close()  # Los envoltorios de compresión no cierran el fichero que reciben
+        # La huella anterior deja de valer antes de sustituir el informe
+        if os.path.exists(_path_huella(path)):
+            os.remove(_path_huella(path))
+        os.replace(tmp, path)
+    except BaseException:
+        crudo.close()
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    if huella_actual is not None:
+        with open(_path_huella(path), "w", encoding="utf-8") as f:
+            f.write(huella_actual + "\n")
+
+
+def escribir_csv(path: str, cabecera, filas, delimiter: str = ";", compresion: str = None,
+                 huella_actual: str = None, **formato) -> bool:
+    """Escribe un CSV de forma atómica; devuelve False si ya estaba al día.
+
+    filas puede ser un generador: se escribe a medida que se produce. Los
+    parámetros de formato extra se pasan a csv.writer.
+    """
+    if informe_vigente(path, huella_actual, compresion):
+        return False
+    with abrir_atomico(path, compresion, huella_actual) as f:
+        escritor = csv.writer(f, delimiter=delimiter, **formato)
+        if cabecera is not None:
+            escritor.writerow(cabecera)
+        escritor.writerows(filas)
+    return True
@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for carpeta in ("", "Practica2", "Practica3", "PracticaFinal"):
+    ruta = os.path.join(RAIZ, carpeta)
+    if ruta not in sys.path:
+        sys.path.insert(0, ruta)
+
+
+@pytest.fixture
+def datos(tmp_path, monkeypatch):
+    """Carpeta de trabajo vacía con data/, como la que usa Final.py."""
+    (tmp_path / "data").mkdir()
+    monkeypatch.chdir(tmp_path)
+    return tmp_path / "data"
+
+
+@pytest.fixture
+def csvs(datos):
+    """data/ con unos pocos clientes, eventos y ventas."""
+    (datos / "clientes.csv").write_text("id;nombre;email;fecha_alta;activo\n"
+                                        "1;Ana;ana@gmail.com;2024-01-01;1\n2;Luis;luis@gmail.com;2024-02-01;0\n")
+    (datos / "eventos.csv").write_text("id;nombre;categoria;fecha_evento;precio\n"
+                                       "1;Concierto;Música;2025-06-01;30\n2;Obra;Teatro;2025-07-01;20\n")
+    (datos / "ventas.csv").write_text("id;cliente_id;evento_id;fecha;unidades;precio_unitario\n"
+                                      "1;1;1;2025-01-01;2;30.0\n2;2;2;2025-01-05;1;20.0\n3;1;2;2025-01-03;4;20.0\n")
+    return datos
@@ -0,0 +1,68 @@
+import csv
+import io
+import json
+import random
+
+import pytest
+
+import Final
+import almacen
+import comun
+from analitica import AnaliticaVentas, SketchCuantiles
+
+
+@pytest.mark.parametrize("error", [0.01, 0.05])
+def test_sketch_cuantiles_dentro_del_error(error):
+    rnd = random.Random(3)
+    valores = [round(rnd.lognormvariate(4, 1.2), 2) for _ in range(20_000)]
+    sketch = SketchCuantiles(error).agregar_todos(valores)
+    ordenados = sorted(valores)
+    for q in (0.0, 0.1, 0.5, 0.9, 0.95, 0.99, 1.0):
+        exacto = ordenados[int(q * (len(ordenados) - 1))]
+        assert abs(sketch.cuantil(q) - exacto) <= error * exacto + 1e-9
+
+
+def test_sketch_fusionado_igual_que_uno_solo():
+    rnd = random.Random(5)
+    valores = [rnd.randint(0, 500) * 1.5 for _ in range(5_000)]
+    entero = SketchCuantiles().agregar_todos(valores)
+    partes = SketchCuantiles().agregar_todos(valores[:1234])
+    partes.fusionar(SketchCuantiles().agregar_todos(valores[1234:]))
+    assert all(entero.cuantil(q) == partes.cuantil(q) for q in comun.PERCENTILES)
+    with pytest.raises(ValueError):
+        entero.fusionar(SketchCuantiles(0.05))
+
+
+def test_analitica_coincide_con_un_recuento_directo():
+    rnd = random.Random(9)
+    ventas = almacen.VentasColumnar()
+    for i in range(2_000):
+        ventas.append_fila(i, rnd.randint(1, 50), rnd.randint(1, 10), 739000 + i % 30, rnd.randint(1, 5),
+                           rnd.choice([9.5, 20.0, 35.25]))
+    analitica = AnaliticaVentas.desde_ventas(ventas)
+    por_cliente = {}
+    for v in ventas:
+        por_cliente[v.cliente_id] = por_cliente.get(v.cliente_id, 0) + v.total
+    esperado = sorted(por_cliente.items(), key=lambda kv: -kv[1])[:comun.TOP_N]
+    assert [cid for cid, _ in analitica.top_clientes()] == [cid for cid, _ in esperado]
+    # Igual sumando venta a venta (streaming)
+    una_a_una = AnaliticaVentas.desde_ventas(list(ventas))
+    assert una_a_una.top_clientes() == pytest.approx(analitica.top_clientes())
+    assert una_a_una.percentiles() == analitica.percentiles()
+
+
+@pytest.mark.parametrize("formato", ["json", "csv"])
+def test_stats_incluye_rankings_y_percentiles_en_todos_los_formatos(csvs, capsys, formato):
+    Final.main(["--sin-snapshot", "stats", "--formato", formato])
+    salida = capsys.readouterr().out
+    cuerpo = salida[salida.index("{"):] if formato == "json" else salida[salida.index("metrica;"):]
+    if formato == "json":
+        datos = json.loads(cuerpo)
+        assert datos["top_clientes"][0] == {"id": 1, "nombre": "Ana", "ingresos": 140.0}
+        assert [e["nombre"] for e in datos["top_eventos_por_categoria"]["Teatro"]] == ["Obra"]
+        assert set(datos["percentiles"]["ingresos"]) == {"p50", "p95", "p99"}
+    else:
+        filas = {r[0]: r[1:] for r in csv.reader(io.StringIO(cuerpo), delimiter=";")}
+        assert filas["top_clientes_1"] == ["140.00", "Ana"]
+        assert filas["top_eventos_Teatro_2"] == ["100.00", "Obra"]
+        assert {"percentiles_ingresos_p50", "percentiles_unidades_p99"} <= filas.keys()
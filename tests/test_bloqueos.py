@@ -0,0 +1,28 @@
+import os
+import stat
+
+import persistencia
+
+
+def test_lectura_no_crea_lock(datos):
+    path = datos / "clientes.csv"
+    path.write_text("id;nombre;email;fecha_alta;activo\n1;Ana;ana@gmail.com;2024-01-01;1\n")
+    assert persistencia.tam_consistente(str(path)) == path.stat().st_size
+    assert not os.path.exists(str(path) + ".lock")
+
+
+def test_lectura_en_carpeta_de_solo_lectura(datos):
+    path = datos / "clientes.csv"
+    path.write_text("id;nombre;email;fecha_alta;activo\n")
+    os.chmod(datos, stat.S_IRUSR | stat.S_IXUSR)
+    try:
+        assert persistencia.tam_consistente(str(path)) == path.stat().st_size
+    finally:
+        os.chmod(datos, stat.S_IRWXU)
+
+
+def test_escritura_crea_lock_y_lectura_lo_usa(datos):
+    path = datos / "eventos.csv"
+    persistencia.append_row_csv(str(path), ["id", "nombre"], [1, "Teatro"])
+    assert os.path.exists(str(path) + ".lock")
+    assert persistencia.tam_consistente(str(path)) == path.stat().st_size
@@ -0,0 +1,31 @@
+import almacen
+
+VENTAS = ("id;cliente_id;evento_id;fecha;unidades;precio_unitario\n"
+          "1;1;1;2025-01-01;2;10.0\n"
+          "2;1;x;2025-01-02;1;5\n"
+          "3;2;1;2025-01-03;1;5\n"
+          "4;1;1;2025-13-01;1;5\n"
+          "5;2;2;2025-01-02;3;1.5\n")
+
+
+def _errores(texto):
+    return [l for l in texto.splitlines() if l.startswith("Error en venta")]
+
+
+def test_errores_con_numero_de_linea_en_carga_serie_y_paralela(datos, capsys):
+    path = str(datos / "ventas.csv")
+    (datos / "ventas.csv").write_text(VENTAS)
+    serie = almacen.cargar_ventas_columnar(path, tam_lote=2)
+    errores_serie = _errores(capsys.readouterr().out)
+    paralela = almacen.cargar_ventas_paralelo(path, procesos=2)
+    errores_paralela = _errores(capsys.readouterr().out)
+    assert errores_serie == errores_paralela
+    assert [e.split("(línea ")[1].split(")")[0] for e in errores_serie] == ["3", "5"]
+    assert list(serie.id) == list(paralela.id) == [1, 3, 5]
+
+
+def test_lotes_en_streaming_informan_de_la_linea(datos, capsys):
+    (datos / "ventas.csv").write_text(VENTAS)
+    ids = [v.id for lote in almacen.iter_lotes_ventas(str(datos / "ventas.csv"), tam_lote=2) for v in lote]
+    assert ids == [1, 3, 5]
+    assert "(línea 3)" in capsys.readouterr().out
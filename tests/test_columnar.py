@@ -0,0 +1,39 @@
+import math
+from datetime import date
+
+import pytest
+
+import almacen
+import comun
+
+
+@pytest.fixture
+def ventas():
+    return [comun.Venta(1, 1, 1, date(2025, 1, 1), 2, 30.0), comun.Venta(2, 2, 2, date(2025, 1, 5), 1, 20.0),
+            comun.Venta(3, 1, 2, date(2025, 1, 3), 4, 20.0), comun.Venta(4, 3, 1, date(1999, 12, 31), 1, 0.1)]
+
+
+def test_filas_iguales_que_los_objetos(ventas):
+    columnar = almacen.VentasColumnar()
+    columnar.extend(ventas)
+    assert len(columnar) == 4
+    for v, c in zip(ventas, columnar):
+        assert (c.id, c.cliente_id, c.evento_id, c.fecha_venta, c.unidades, c.precio_unitario) == \
+               (v.id, v.cliente_id, v.evento_id, v.fecha_venta, v.unidades, v.precio_unitario)
+    assert str(columnar[2]) == str(ventas[2])
+
+
+def test_agregados_vectorizados(ventas):
+    columnar = almacen.VentasColumnar()
+    columnar.extend(ventas)
+    assert list(columnar.totales()) == pytest.approx([v.total for v in ventas])
+    assert math.isclose(columnar.ingresos_totales(), sum(v.total for v in ventas))
+    assert columnar.ingresos_por_evento() == pytest.approx({1: 60.1, 2: 100.0})
+    mascara = columnar.mascara_fechas(date(2025, 1, 1), date(2025, 1, 3))
+    assert [v.id for v in columnar.filtrar(mascara)] == [1, 3]
+
+
+def test_carga_columnar_igual_que_por_objetos(csvs):
+    objetos = [almacen.parse_venta(r) for r in comun.iter_csv(comun.VENTAS_CSV)]
+    columnar = almacen.cargar_ventas_columnar(comun.VENTAS_CSV, tam_lote=2)
+    assert [str(v) for v in objetos] == [str(v) for v in columnar]
@@ -0,0 +1,126 @@
+import math
+import random
+from collections import defaultdict
+from datetime import date, timedelta
+
+import pytest
+
+import almacen
+import comun
+from cubo import CuboVentas, cargar_cubo, inicio_periodo, leer_cubo
+
+EVENTOS = {1: "Música", 2: "Música", 3: "Teatro", 4: "Deporte", 5: "Teatro"}
+
+
+@pytest.fixture
+def evt_index():
+    return {eid: comun.Evento(eid, f"Evento {eid}", cat, date(2025, 12, 1), 10.0) for eid, cat in EVENTOS.items()}
+
+
+@pytest.fixture
+def ventas():
+    """Ventas desordenadas de 2024 y 2025, algunas de un evento que no está en eventos.csv."""
+    rnd = random.Random(11)
+    inicio = date(2024, 11, 1)
+    ventas = almacen.VentasColumnar()
+    for i in range(1, 2001):
+        fecha = inicio + timedelta(days=rnd.randint(0, 200))
+        ventas.append(comun.Venta(i, rnd.randint(1, 50), rnd.randint(1, 6), fecha, rnd.randint(1, 5),
+                                  round(rnd.uniform(5, 90), 2)))
+    return ventas
+
+
+def a_mano(ventas, granularidad, desde=None, hasta=None, categoria=None, evento_id=None, categorias=EVENTOS):
+    """{inicio del periodo: [ventas, unidades, ingresos]} sumando venta a venta."""
+    grupos = defaultdict(lambda: [0, 0, 0.0])
+    for v in ventas:
+        if evento_id is not None and v.evento_id != evento_id:
+            continue
+        if categoria is not None and categorias.get(v.evento_id, "?") != categoria:
+            continue
+        p = date.fromordinal(inicio_periodo(granularidad, v.fecha_venta.toordinal()))
+        if (desde and p < date.fromordinal(inicio_periodo(granularidad, desde.toordinal()))) or (hasta and p > hasta):
+            continue
+        g = grupos[p]
+        g[0] += 1
+        g[1] += v.unidades
+        g[2] += v.total
+    return grupos
+
+
+def comparar(filas, esperado):
+    assert [f[0] for f in filas] == sorted(esperado)
+    for p, n, uds, ingresos in filas:
+        assert (n, uds) == tuple(esperado[p][:2])
+        assert math.isclose(ingresos, esperado[p][2], abs_tol=1e-6)
+
+
+CONSULTAS = [{}, {"categoria": "Música"}, {"categoria": "?"}, {"evento_id": 3}, {"evento_id": 6},
+             {"categoria": "Teatro", "evento_id": 5}, {"categoria": "Teatro", "evento_id": 1},
+             {"desde": date(2024, 12, 10), "hasta": date(2025, 2, 14)},
+             {"desde": date(2025, 1, 15), "hasta": date(2025, 1, 15), "categoria": "Deporte"},
+             {"desde": date(2025, 2, 1), "hasta": date(2025, 1, 1)}]
+
+
+@pytest.mark.parametrize("granularidad", comun.GRANULARIDADES)
+@pytest.mark.parametrize("filtro", CONSULTAS)
+def test_consultar_coincide_con_las_ventas(ventas, evt_index, granularidad, filtro):
+    cubo = CuboVentas.desde_ventas(ventas, evt_index)
+    comparar(cubo.consultar(granularidad, **filtro), a_mano(ventas, granularidad, **filtro))
+
+
+@pytest.mark.parametrize("filtro", CONSULTAS)
+def test_total_de_un_rango_exacto(ventas, evt_index, filtro):
+    cubo = CuboVentas.desde_ventas(ventas, evt_index)
+    desde, hasta = filtro.get("desde", date(2024, 12, 3)), filtro.get("hasta", date(2025, 3, 20))
+    esperado = [(v.unidades, v.total) for v in ventas if desde <= v.fecha_venta <= hasta
+                and filtro.get("evento_id", v.evento_id) == v.evento_id
+                and filtro.get("categoria", EVENTOS.get(v.evento_id, "?")) == EVENTOS.get(v.evento_id, "?")]
+    n, uds, ingresos = cubo.total(desde, hasta, filtro.get("categoria"), filtro.get("evento_id"))
+    assert (n, uds) == (len(esperado), sum(u for u, _ in esperado))
+    assert math.isclose(ingresos, sum(t for _, t in esperado), abs_tol=1e-6)
+
+
+def test_ventas_anadidas_despues(ventas, evt_index):
+    """Las ventas nuevas cuentan antes y después de fundir las pendientes."""
+    cubo = CuboVentas.desde_ventas(ventas, evt_index)
+    nuevas = [comun.Venta(5000 + i, 1, i % 6 + 1, date(2024, 10, 1) + timedelta(days=i * 7), 2, 12.5)
+              for i in range(40)]
+    for v in nuevas:
+        cubo.add_venta(v)
+    assert cubo.pendientes
+    todas = list(ventas) + nuevas
+    for g in comun.GRANULARIDADES:
+        comparar(cubo.consultar(g, categoria="Teatro"), a_mano(todas, g, categoria="Teatro"))
+    cubo.fundir()
+    assert not cubo.pendientes
+    for g in comun.GRANULARIDADES:
+        comparar(cubo.consultar(g), a_mano(todas, g))
+
+
+def test_cargar_cubo_incremental(datos, ventas, evt_index):
+    path = datos / "ventas.csv"
+    lineas = ["id;cliente_id;evento_id;fecha;unidades;precio_unitario"]
+    lineas += [f"{v.id};{v.cliente_id};{v.evento_id};{v.fecha_venta};{v.unidades};{v.precio_unitario}" for v in ventas]
+    path.write_text("\n".join(lineas[:1001]) + "\n")
+    cubo_path = str(datos / "ventas.cubo")
+    primero = cargar_cubo(evt_index, str(path), cubo_path)
+    comparar(primero.consultar("mes"), a_mano(list(ventas)[:1000], "mes"))
+    with open(path, "a") as f:
+        f.write("\n".join(lineas[1001:]) + "\n")
+    cubo = cargar_cubo(evt_index, str(path), cubo_path)
+    for g in comun.GRANULARIDADES:
+        comparar(cubo.consultar(g, categoria="Música"), a_mano(ventas, g, categoria="Música"))
+    releido = leer_cubo(cubo_path)
+    assert releido.celdas_dia() == cubo.celdas_dia()
+    assert releido.fuente == cubo.fuente
+
+
+def test_recategorizar(ventas, evt_index):
+    cubo = CuboVentas.desde_ventas(ventas, evt_index)
+    evt_index[3].categoria = "Música"
+    assert cubo.recategorizar(evt_index)
+    categorias = {**EVENTOS, 3: "Música"}
+    comparar(cubo.consultar("semana", categoria="Música"),
+             a_mano(ventas, "semana", categoria="Música", categorias=categorias))
+    assert not cubo.recategorizar(evt_index)
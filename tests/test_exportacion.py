@@ -0,0 +1,90 @@
+import gzip
+import os
+
+import pytest
+
+import exportacion
+
+
+def test_error_a_mitad_deja_el_informe_anterior(tmp_path):
+    path = str(tmp_path / "informe.csv")
+    assert exportacion.escribir_csv(path, ["a", "b"], [[1, 2]])
+
+    def filas():
+        yield [3, 4]
+        raise RuntimeError("fallo al generar")
+
+    with pytest.raises(RuntimeError):
+        exportacion.escribir_csv(path, ["a", "b"], filas())
+    with open(path, newline="") as f:
+        assert f.read() == "a;b\r\n1;2\r\n"
+    assert os.listdir(tmp_path) == ["informe.csv"]
+
+
+def test_huella_evita_reescribir(tmp_path):
+    entrada = tmp_path / "datos.csv"
+    entrada.write_text("x\n")
+    path = str(tmp_path / "informe.csv")
+    h = exportacion.huella(exportacion.huella_ficheros([entrada]), "por evento")
+    assert not exportacion.informe_vigente(path, h)
+    assert exportacion.escribir_csv(path, ["a"], [[1]], huella_actual=h)
+    assert exportacion.informe_vigente(path, h)
+    assert not exportacion.escribir_csv(path, ["a"], [[2]], huella_actual=h)
+    with open(path) as f:
+        assert f.read().splitlines() == ["a", "1"]
+
+    # Si la entrada cambia, la huella ya no coincide y el informe se reescribe
+    entrada.write_text("x\ny\n")
+    h2 = exportacion.huella(exportacion.huella_ficheros([entrada]), "por evento")
+    assert h2 != h and not exportacion.informe_vigente(path, h2)
+    assert exportacion.escribir_csv(path, ["a"], [[2]], huella_actual=h2)
+    with open(path) as f:
+        assert f.read().splitlines() == ["a", "2"]
+
+
+def test_fallo_descarta_la_huella_anterior(tmp_path):
+    path = str(tmp_path / "informe.csv")
+    exportacion.escribir_csv(path, ["a"], [[1]], huella_actual="h1")
+    with pytest.raises(ValueError):
+        with exportacion.abrir_atomico(path, huella_actual="h2") as f:
+            f.write("a\n")
+            raise ValueError
+    assert exportacion.informe_vigente(path, "h1")
+    assert not exportacion.informe_vigente(path, "h2")
+
+
+def test_sin_informe_no_esta_vigente(tmp_path):
+    path = str(tmp_path / "informe.csv")
+    exportacion.escribir_csv(path, ["a"], [[1]], huella_actual="h")
+    os.remove(path)
+    assert not exportacion.informe_vigente(path, "h")
+    assert not exportacion.informe_vigente(path, None)
+
+
+@pytest.mark.parametrize("compresion", sorted(exportacion.COMPRESIONES))
+def test_compresion(tmp_path, compresion):
+    path = str(tmp_path / "informe.csv")
+    assert exportacion.escribir_csv(path, ["a", "b"], [[1, "ñ"]], compresion=compresion, huella_actual="h")
+    final = exportacion.ruta_informe(path, compresion)
+    assert final.endswith(exportacion.COMPRESIONES[compresion][0])
+    assert exportacion.informe_vigente(path, "h", compresion)
+    assert not os.path.exists(path)
+    if compresion == "gz":
+        with gzip.open(final, "rt", encoding="utf-8", newline="") as f:
+            assert f.read() == "a;b\r\n1;ñ\r\n"
+
+
+def test_gz_reproducible(tmp_path):
+    """Con mtime=0, el mismo contenido da los mismos bytes."""
+    contenidos = []
+    for nombre in ("uno.csv", "dos.csv"):
+        path = str(tmp_path / nombre)
+        exportacion.escribir_csv(path, ["a"], [[1]], compresion="gz")
+        with open(path + ".gz", "rb") as f:
+            contenidos.append(f.read())
+    assert contenidos[0] == contenidos[1]
+
+
+def test_compresion_desconocida(tmp_path):
+    with pytest.raises(ValueError):
+        exportacion.ruta_informe(str(tmp_path / "informe.csv"), "rar")
@@ -0,0 +1,68 @@
+import math
+import random
+from datetime import date, timedelta
+
+import pytest
+
+import Final
+import almacen
+import comun
+
+RANGOS = [(date(2025, 1, 10), date(2025, 1, 20)), (date(2024, 1, 1), date(2026, 1, 1)),
+          (date(2025, 3, 1), date(2025, 3, 1)), (date(2030, 1, 1), date(2030, 2, 1)),
+          (date(2025, 2, 1), date(2025, 1, 1))]
+
+
+def ventas_aleatorias(rnd, desde, n):
+    inicio = date(2025, 1, 1)
+    return [comun.Venta(i, rnd.randint(1, 30), rnd.randint(1, 8), inicio + timedelta(days=rnd.randint(0, 90)),
+                        rnd.randint(1, 4), round(rnd.uniform(5, 90), 2)) for i in range(desde, desde + n)]
+
+
+def comprobar(columnar, ventas):
+    for f_ini, f_fin in RANGOS:
+        dentro = [v for v in ventas if f_ini <= v.fecha_venta <= f_fin]
+        obtenidas = list(columnar.rango(f_ini, f_fin))
+        assert sorted(v.id for v in obtenidas) == sorted(v.id for v in dentro)
+        assert [v.fecha_venta for v in obtenidas] == sorted(v.fecha_venta for v in dentro)
+        n, uds, ingresos = columnar.agregado_rango(f_ini, f_fin)
+        assert (n, uds) == (len(dentro), sum(v.unidades for v in dentro))
+        assert math.isclose(ingresos, sum(v.total for v in dentro), abs_tol=1e-6)
+
+
+def test_indice_coincide_con_un_recorrido():
+    ventas = ventas_aleatorias(random.Random(3), 1, 1000)
+    columnar = almacen.VentasColumnar()
+    columnar.extend(ventas)
+    comprobar(columnar, ventas)
+
+
+@pytest.mark.parametrize("minimo", [4, 1024])
+def test_altas_desordenadas_despues_de_indexar(monkeypatch, minimo):
+    """Con pocas pendientes se consultan aparte; con muchas se reconstruye el índice."""
+    monkeypatch.setattr(almacen, "MIN_PENDIENTES_INDICE", minimo)
+    rnd = random.Random(5)
+    ventas = sorted(ventas_aleatorias(rnd, 1, 300), key=lambda v: v.fecha_venta)
+    columnar = almacen.VentasColumnar()
+    columnar.extend(ventas)
+    indice = columnar.indexar()
+    for v in ventas_aleatorias(rnd, 301, 100):
+        columnar.append(v)
+        ventas.append(v)
+    if minimo == 4:
+        assert len(indice.pendientes) <= max(minimo, len(indice.fechas) // 64)
+    else:
+        assert indice.pendientes
+    comprobar(columnar, ventas)
+    indice.reconstruir()
+    assert not indice.pendientes
+    comprobar(columnar, ventas)
+
+
+def test_ventas_en_rango_sin_indice_ni_columnas():
+    ventas = ventas_aleatorias(random.Random(9), 1, 200)
+    columnar = almacen.VentasColumnar()
+    columnar.extend(ventas)
+    f_ini, f_fin = RANGOS[0]
+    assert sorted(v.id for v in Final.ventas_en_rango(ventas, f_ini, f_fin)) == \
+           sorted(v.id for v in Final.ventas_en_rango(columnar, f_ini, f_fin))
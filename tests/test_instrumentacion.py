@@ -0,0 +1,31 @@
+import json
+
+import instrumentacion
+
+
+def test_etapas_en_log_json_y_prometheus(tmp_path, monkeypatch):
+    inst = instrumentacion.Instrumentacion()
+    inst.activa, inst.destino = True, str(tmp_path / "metricas.jsonl")
+    monkeypatch.setattr(instrumentacion, "INSTRUMENTACION", inst)
+
+    @instrumentacion.instrumentado("sumar", lambda a, k, r: {"filas": len(a[0])})
+    def sumar(valores):
+        return sum(valores)
+
+    assert sumar([1, 2, 3]) == 6
+    assert sumar([4]) == 4
+    lineas = [json.loads(l) for l in open(inst.destino)]
+    assert [(l["etapa"], l["filas"]) for l in lineas] == [("sumar", 3), ("sumar", 1)]
+    assert inst.etapas["sumar"]["llamadas"] == 2
+    assert 'crm_etapa_filas_total{etapa="sumar"} 4' in inst.texto_prometheus()
+
+
+def test_desactivada_no_registra(monkeypatch):
+    inst = instrumentacion.Instrumentacion()
+    monkeypatch.setattr(instrumentacion, "INSTRUMENTACION", inst)
+
+    @instrumentacion.instrumentado("nada", lambda a, k, r: 1 / 0)
+    def nada():
+        return 1
+
+    assert nada() == 1 and inst.etapas == {}
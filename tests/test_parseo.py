@@ -0,0 +1,49 @@
+from array import array
+from datetime import date, datetime
+
+import pytest
+
+import almacen
+import comun
+
+
+@pytest.mark.parametrize("texto", ["2025-01-31", "2024-02-29", "0001-01-01", "9999-12-31", " 2025-03-04 ", "2025-3-4"])
+def test_parse_date_igual_que_strptime(texto):
+    assert comun.parse_date(texto) == datetime.strptime(texto.strip(), comun.DATE_FMT).date()
+    assert comun.parse_date(texto) == comun.parse_date(texto)  # Segunda vez, desde la caché
+
+
+@pytest.mark.parametrize("texto", ["2025-02-30", "2023-02-29", "2025-13-01", "2025/01/01", "25-01-01", "", "abcd-ef-gh",
+                                   "2025-01-01T00:00"])
+def test_parse_date_mismos_errores_que_strptime(texto):
+    with pytest.raises(ValueError) as esperado:
+        datetime.strptime(texto.strip(), comun.DATE_FMT)
+    with pytest.raises(ValueError) as obtenido:
+        comun.parse_date(texto)
+    assert str(obtenido.value) == str(esperado.value)
+
+
+def test_cache_de_fechas_acotada(monkeypatch):
+    monkeypatch.setattr(comun, "_CACHE_FECHAS", {})
+    monkeypatch.setattr(comun, "MAX_CACHE_FECHAS", 3)
+    for dia in range(1, 10):
+        assert comun.parse_date(f"2025-01-{dia:02d}") == date(2025, 1, dia)
+    assert len(comun._CACHE_FECHAS) == 3
+
+
+def test_parse_lote_ventas():
+    columnas = comun.parse_lote_ventas([["1", "2", "3", "2025-01-01", "4", "5.5"],
+                                        ["2", "7", "8", "2025-01-02", "1", "10"]])
+    assert [c.typecode for c in columnas] == ["q", "q", "q", "i", "i", "d"]
+    assert columnas == (array("q", [1, 2]), array("q", [2, 7]), array("q", [3, 8]),
+                        array("i", [date(2025, 1, 1).toordinal(), date(2025, 1, 2).toordinal()]),
+                        array("i", [4, 1]), array("d", [5.5, 10.0]))
+
+
+def test_lote_con_una_fila_mala_conserva_las_demas():
+    ventas = almacen.VentasColumnar()
+    lote = [["1", "2", "3", "2025-01-01", "4", "5.5"], ["2", "7", "x", "2025-01-02", "1", "10"],
+            ["3", "7", "8", "2025-02-30", "1", "10"], ["4", "7", "8", "2025-01-03", "2", "1.5"]]
+    errores = almacen.anadir_lote_ventas(ventas, lote, [2, 3, 4, 5])
+    assert [v.id for v in ventas] == [1, 4]
+    assert [linea for linea, _, _ in errores] == [3, 4]
@@ -0,0 +1,16 @@
+import Practica2
+
+
+def test_entradas_acumuladas_siguen_los_cambios_de_horarios(monkeypatch):
+    horarios = {"Ana": ("08", "14"), "Luis": ("10", "18")}
+    monkeypatch.setattr(Practica2, "horarios", horarios)
+    assert Practica2.contar_entradas_lote([7, 8, 10]) == [0, 1, 2]
+    horarios["Eva"] = ("07", "15")
+    assert Practica2.contar_entradas_lote([7, 8, 10]) == [1, 2, 3]
+    monkeypatch.setattr(Practica2, "horarios", {"Raúl": ("12", "20")})
+    assert Practica2.contar_entradas_lote([11, 12]) == [0, 1]
+
+
+def test_entradas_acumuladas_de_otros_registros():
+    assert Practica2.entradas_acumuladas({"Ana": ("09", "17")})[8:10] == [0, 1]
+    assert Practica2.entradas_acumuladas()[23] == len(Practica2.horarios)
@@ -0,0 +1,48 @@
+import Practica3
+
+HORARIOS = ("nombre_empleado;dia;hora_entrada;hora_salida\n"
+            "Ana;Lunes;8;16\nLuis;Lunes;9;17\nAna;Martes;8;15\nCarlos;Sabado;9;15\n")
+
+
+def test_menu_no_pide_rutas_con_la_entrada_por_tuberia(tmp_path, monkeypatch, capsys):
+    (tmp_path / "semana.csv").write_text(HORARIOS)
+    monkeypatch.chdir(tmp_path)
+    respuestas = iter(["1", "2", "0"])
+    monkeypatch.setattr("builtins.input", lambda _="": next(respuestas))
+    Practica3.menu(["semana.csv"])
+    salida = capsys.readouterr().out
+    assert "Se han leído 4 registros" in salida
+    assert "Programa finalizado." in salida
+
+
+def test_registro_conserva_la_grafia_del_dia(tmp_path):
+    (tmp_path / "semana.csv").write_text(HORARIOS)
+    registros = Practica3.leer_csv(str(tmp_path / "semana.csv"))
+    assert [r.dia for r in registros] == ["Lunes", "Lunes", "Martes", "Sabado"]
+    assert registros[3].dia_semana == Practica3.Dia.SABADO
+    assert Practica3.RegistroHorario("Eva", Practica3.Dia.MIERCOLES, 8, 9).dia == "Miércoles"
+
+
+def test_dia_no_valido():
+    try:
+        Practica3.RegistroHorario("Eva", "Festivo", 8, 9)
+    except ValueError as e:
+        assert "Festivo" in str(e)
+    else:
+        raise AssertionError("Se esperaba ValueError")
+
+
+def test_consulta_por_dias_admite_ambas_grafias(tmp_path):
+    (tmp_path / "semana.csv").write_text(HORARIOS)
+    agregador = Practica3.AgregadorHorarios(informes=("en_dos_dias.csv",))
+    for r in Practica3.leer_csv(str(tmp_path / "semana.csv")):
+        agregador.agregar(r)
+    indice = agregador.indice_dias
+    assert indice.consultar("Sábado") == indice.consultar("Sabado") != 0
+    assert set(agregador.empleados_por_dia) == {"Lunes", "Martes", "Sabado"}
+
+
+def test_en_dos_dias_desde_empleados_por_dia(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    Practica3.empleados_en_dos_dias({"Lunes": {"Ana", "Luis"}, "Viernes": {"Ana"}, "Sabado": {"Luis"}})
+    assert (tmp_path / "en_dos_dias.csv").read_text().split() == ["Empleado", "Ana"]
@@ -0,0 +1,66 @@
+import os
+from datetime import date
+
+import pytest
+
+import almacen
+import comun
+import persistencia
+import snapshot
+
+
+def _guardar(streaming=False):
+    firmas = {nombre: snapshot.firma_csv(path) for nombre, path in
+              (("clientes", comun.CLIENTES_CSV), ("eventos", comun.EVENTOS_CSV), ("ventas", comun.VENTAS_CSV))}
+    clientes, _ = almacen.cargar_clientes()
+    eventos, _ = almacen.cargar_eventos()
+    ventas = almacen.cargar_ventas(streaming=streaming, procesos=1)
+    snapshot.guardar_snapshot(firmas, clientes, eventos, ventas)
+    return ventas
+
+
+@pytest.mark.parametrize("compartido", [False, True])
+def test_snapshot_conserva_ventas_e_indice(csvs, compartido):
+    ventas = _guardar()
+    clientes, eventos, cargadas, cli_index, evt_index = snapshot.cargar_snapshot(compartido=compartido)
+    assert [c.nombre for c in clientes] == ["Ana", "Luis"] and set(evt_index) == {1, 2}
+    assert list(cargadas.id) == list(ventas.id)
+    assert cargadas.agregado_rango(date(2025, 1, 2), date(2025, 1, 5)) == (2, 5, 100.0)
+
+
+def test_snapshot_invalido_si_cambian_ventas(csvs):
+    _guardar()
+    with open(comun.VENTAS_CSV, "a") as f:
+        f.write("4;2;1;2025-01-09;1;30.0\n")
+    assert snapshot.cargar_snapshot() is None
+
+
+def test_snapshot_invalido_si_cambia_el_contenido_con_el_mismo_tamano(csvs):
+    _guardar()
+    texto = (csvs / "eventos.csv").read_text().replace("Obra", "Cine")
+    (csvs / "eventos.csv").write_text(texto)
+    os.utime(comun.EVENTOS_CSV, ns=(1, 1))
+    assert snapshot.cargar_snapshot() is None
+
+
+def test_snapshot_mismo_contenido_con_otro_mtime_sigue_valido(csvs):
+    _guardar()
+    os.utime(comun.VENTAS_CSV, ns=(1, 1))
+    assert snapshot.cargar_snapshot() is not None
+
+
+def test_altas_de_clientes_no_invalidan_ventas(csvs):
+    _guardar()
+    persistencia.append_row_csv(comun.CLIENTES_CSV, comun.CABECERA_CLIENTES, [3, "Eva", "eva@gmail.com", "2024-03-01", 1])
+    clientes, _, ventas, cli_index, _ = snapshot.cargar_snapshot()
+    assert 3 in cli_index and len(ventas) == 3
+
+
+def test_snapshot_en_streaming(csvs):
+    _guardar(streaming=True)
+    assert snapshot.cargar_snapshot() is None  # Guardado en el otro modo
+    _, _, ventas, _, _ = snapshot.cargar_snapshot(streaming=True)
+    assert isinstance(ventas, almacen.VentasCSV)
+    assert len(ventas) == 3 and ventas.ingresos_por_evento() == {1: 60.0, 2: 100.0}
+    assert ventas.agregado_rango(date(2025, 1, 2), date(2025, 1, 5)) == (2, 5, 100.0)
+    assert [v.id for v in ventas.rango(date(2025, 1, 2), date(2025, 1, 5))] == [2, 3]
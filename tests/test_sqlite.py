@@ -0,0 +1,79 @@
+import math
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from multiprocessing import get_context
+
+import pytest
+
+import almacen
+import almacen_sqlite
+import comun
+
+
+@pytest.fixture
+def base(csvs, capsys):
+    almacen_sqlite.crear_base_sqlite()
+    capsys.readouterr()
+    return almacen_sqlite.VentasSQLite()
+
+
+def dar_altas(directorio: str, n: int, altas: int, durabilidad: str) -> list:
+    """Altas desde otro proceso con su propia conexión; devuelve los ids recibidos."""
+    os.chdir(directorio)
+    esc = almacen_sqlite.EscritorClientesSQLite(almacen_sqlite.VentasSQLite(), durabilidad, tam_lote=5)
+    ids = []
+    for i in range(altas):
+        c = comun.Cliente(esc.siguiente_id(), f"Proceso {n}-{i}", f"p{n}.{i}@gmail.com", date(2025, 1, 1), True)
+        esc.anadir(c)
+        ids.append(c.id)
+    esc.cerrar()
+    return ids
+
+
+def test_consultas_como_en_columnar(base):
+    columnar = almacen.cargar_ventas_columnar(comun.VENTAS_CSV)
+    assert len(base) == len(columnar) == 3
+    assert math.isclose(base.ingresos_totales(), columnar.ingresos_totales())
+    assert base.ingresos_por_evento() == pytest.approx(columnar.ingresos_por_evento())
+    f_ini, f_fin = date(2025, 1, 2), date(2025, 1, 5)
+    assert base.agregado_rango(f_ini, f_fin) == pytest.approx(columnar.agregado_rango(f_ini, f_fin))
+    assert [v.id for v in base.rango(f_ini, f_fin)] == [v.id for v in columnar.rango(f_ini, f_fin)] == [3, 2]
+
+
+def test_totales_con_triggers(base):
+    base.append(comun.Venta(4, 2, 1, date(2025, 1, 3), 3, 30.0))
+    assert base.agregado_rango(date(2025, 1, 3), date(2025, 1, 3)) == (2, 7, 170.0)
+    assert base.ingresos_por_evento() == pytest.approx({1: 150.0, 2: 100.0})
+
+
+def test_ids_unicos_entre_hilos(base):
+    ids, cerrojo = [], threading.Lock()
+
+    def escritor(n):
+        esc = almacen_sqlite.nuevo_escritor_clientes(None, almacen_sqlite.VentasSQLite(), "siempre")
+        for i in range(30):
+            c = comun.Cliente(esc.siguiente_id(), f"Hilo {n}-{i}", f"h{n}.{i}@gmail.com", date(2025, 1, 1), True)
+            esc.anadir(c)
+            with cerrojo:
+                ids.append(c.id)
+        esc.cerrar()
+
+    hilos = [threading.Thread(target=escritor, args=(n,)) for n in range(4)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    assert sorted(ids) == list(range(3, 123))
+    clientes, _ = base.clientes()
+    assert [c.id for c in clientes] == list(range(1, 123))
+
+
+def test_ids_unicos_entre_procesos(base, datos):
+    with ProcessPoolExecutor(4, mp_context=get_context("spawn")) as pool:
+        trabajos = [pool.submit(dar_altas, str(datos.parent), n, 25, ("siempre", "lote")[n % 2]) for n in range(4)]
+        ids = [i for t in trabajos for i in t.result()]
+    assert sorted(ids) == list(range(3, 103))
+    clientes, _ = base.clientes()
+    assert len(clientes) == 102 and len({c.id for c in clientes}) == 102
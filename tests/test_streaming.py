@@ -0,0 +1,70 @@
+import math
+import random
+from datetime import date, timedelta
+
+import pytest
+
+import almacen
+import analitica
+
+
+@pytest.fixture
+def ventas_csv(datos):
+    rnd = random.Random(7)
+    inicio = date(2025, 1, 1)
+    lineas = ["id;cliente_id;evento_id;fecha;unidades;precio_unitario"]
+    for i in range(1, 501):
+        # Casi ordenadas por fecha, con algunas fuera de sitio
+        dia = i // 5 + (rnd.randint(-20, 20) if i % 17 == 0 else 0)
+        fecha = inicio + timedelta(days=max(dia, 0))
+        lineas.append(f"{i};{rnd.randint(1, 30)};{rnd.randint(1, 8)};{fecha};{rnd.randint(1, 4)};{rnd.uniform(5, 90):.2f}")
+    lineas.insert(200, "999;1;x;2025-02-01;1;1")
+    path = datos / "ventas.csv"
+    path.write_text("\n".join(lineas) + "\n")
+    return str(path)
+
+
+def test_indice_streaming_coincide_con_columnar(ventas_csv, capsys):
+    columnar = almacen.cargar_ventas_columnar(ventas_csv)
+    streaming = almacen.VentasCSV(ventas_csv, tam_lote=32)
+    assert len(streaming) == len(columnar) == 500
+    errores = capsys.readouterr().out.splitlines()
+    assert len(errores) == 2 and errores[0] == errores[1] and "(línea 201)" in errores[0]
+    assert math.isclose(streaming.ingresos_totales(), columnar.ingresos_totales())
+    esperado = columnar.ingresos_por_evento()
+    obtenido = streaming.ingresos_por_evento()
+    assert esperado.keys() == obtenido.keys()
+    assert all(math.isclose(esperado[k], obtenido[k]) for k in esperado)
+    for f_ini, f_fin in [(date(2025, 1, 10), date(2025, 1, 20)), (date(2024, 1, 1), date(2026, 1, 1)),
+                         (date(2025, 3, 1), date(2025, 3, 1)), (date(2030, 1, 1), date(2030, 2, 1)),
+                         (date(2025, 2, 1), date(2025, 1, 1))]:
+        n, uds, ingresos = streaming.agregado_rango(f_ini, f_fin)
+        n_c, uds_c, ingresos_c = columnar.agregado_rango(f_ini, f_fin)
+        assert (n, uds) == (n_c, uds_c) and math.isclose(ingresos, ingresos_c, abs_tol=1e-9)
+        assert sorted(v.id for v in streaming.rango(f_ini, f_fin)) == sorted(v.id for v in columnar.rango(f_ini, f_fin))
+
+
+def test_rango_streaming_lee_solo_algunos_bloques(ventas_csv):
+    streaming = almacen.VentasCSV(ventas_csv, tam_lote=32)
+    indice = streaming.indexar()
+    rangos = indice.bloques_rango(date(2025, 1, 10), date(2025, 1, 12))
+    assert sum(fin - inicio for inicio, fin in rangos) < indice.fin // 2
+
+
+def test_acumulador_en_streaming_usa_el_indice(ventas_csv):
+    streaming = almacen.cargar_ventas(ventas_csv, streaming=True)
+    acc = analitica.AcumuladorEstadisticas.desde_datos([], [], streaming)
+    assert acc.n_ventas == 500
+    assert math.isclose(acc.ingresos_totales, almacen.cargar_ventas_columnar(ventas_csv).ingresos_totales())
+
+
+def test_indice_streaming_en_paralelo(ventas_csv, capsys):
+    serie = almacen.VentasCSV(ventas_csv, tam_lote=32).indexar()
+    errores_serie = capsys.readouterr().out
+    paralelo = almacen.VentasCSV(ventas_csv, tam_lote=32).indexar(procesos=3)
+    assert capsys.readouterr().out == errores_serie
+    assert len(paralelo) == len(serie) and paralelo.fin == serie.fin
+    assert list(paralelo.fechas) == list(serie.fechas)
+    assert list(paralelo.acum_unidades) == list(serie.acum_unidades)
+    assert all(math.isclose(a, b) for a, b in zip(paralelo.acum_ingresos, serie.acum_ingresos))
+    assert paralelo.por_evento.keys() == serie.por_evento.keys()
@@ -0,0 +1,79 @@
+import datetime as dt
+import zlib
+
+import comun
+import persistencia
+
+
+def _linea_wal(resto):
+    return f"{zlib.crc32(resto.encode('utf-8')):08x};{resto}"
+
+
+def test_wal_descarta_desde_la_primera_linea_corrupta(datos):
+    wal = datos / "clientes.wal"
+    buena = "1;Ana;ana@gmail.com;2024-01-01;1\n"
+    mala = "2;Luis;luis@gmail.com;2024-01-02;1\n"
+    wal.write_text(_linea_wal(buena) + "00000000;" + mala + _linea_wal("3;Eva;eva@gmail.com;2024-01-03;1\n"))
+    assert persistencia.leer_wal(str(wal)) == [buena]
+
+
+def test_wal_ignora_linea_sin_salto(datos):
+    wal = datos / "clientes.wal"
+    buena = "1;Ana;ana@gmail.com;2024-01-01;1\n"
+    wal.write_text(_linea_wal(buena) + _linea_wal("2;Luis;luis@gmail.com;2024-01-02;1\n")[:-5])
+    assert persistencia.leer_wal(str(wal)) == [buena]
+
+
+def test_recuperar_wal_es_idempotente(datos):
+    csv_path, wal_path = datos / "clientes.csv", datos / "clientes.wal"
+    csv_path.write_text("id;nombre;email;fecha_alta;activo\n1;Ana;ana@gmail.com;2024-01-01;1\n")
+    lineas = ["1;Ana;ana@gmail.com;2024-01-01;1\n", "2;Luis;luis@gmail.com;2024-01-02;1\n"]
+    wal_path.write_text("".join(_linea_wal(l) for l in lineas))
+    assert persistencia.recuperar_wal(str(csv_path), str(wal_path)) == 1
+    assert persistencia.recuperar_wal(str(csv_path), str(wal_path)) == 0
+    assert csv_path.read_text().splitlines()[1:] == [l.rstrip("\n") for l in lineas]
+    assert wal_path.read_text() == ""
+
+
+def test_escritura_cortada_se_recorta_y_se_reaplica(datos):
+    csv_path, wal_path = datos / "clientes.csv", datos / "clientes.wal"
+    csv_path.write_text("id;nombre;email;fecha_alta;activo\n1;Ana;ana@gmail.com;2024-01-01;1\n2;Lu")
+    lineas = ["2;Luis;luis@gmail.com;2024-01-02;1\n", "3;Eva;eva@gmail.com;2024-01-03;0\n"]
+    wal_path.write_text("".join(_linea_wal(l) for l in lineas))
+    assert persistencia.recuperar_wal(str(csv_path), str(wal_path)) == 2
+    assert csv_path.read_text().splitlines() == [
+        "id;nombre;email;fecha_alta;activo",
+        "1;Ana;ana@gmail.com;2024-01-01;1",
+        "2;Luis;luis@gmail.com;2024-01-02;1",
+        "3;Eva;eva@gmail.com;2024-01-03;0",
+    ]
+
+
+def test_fila_completa_sin_salto_se_conserva(datos):
+    csv_path = datos / "clientes.csv"
+    csv_path.write_text("id;nombre;email;fecha_alta;activo\n4;Victor;888@gmail.com;2001-12-01;1")
+    escritor = persistencia.EscritorClientes(csv_path=str(csv_path), wal_path=str(datos / "clientes.wal"),
+                                      seq_path=str(datos / "clientes.seq"))
+    cid = escritor.siguiente_id()
+    escritor.anadir(comun.Cliente(cid, "Eva", "eva@gmail.com", dt.date(2024, 1, 3), True))
+    escritor.cerrar()
+    filas = [l.split(";")[:2] for l in csv_path.read_text().splitlines()[1:]]
+    assert filas == [["4", "Victor"], [str(cid), "Eva"]]
+    assert cid == 5
+
+
+def test_append_row_csv_conserva_fila_sin_salto(datos):
+    path = datos / "eventos.csv"
+    path.write_text("id;nombre\n1;Concierto")
+    persistencia.append_row_csv(str(path), ["id", "nombre"], [2, "Teatro"])
+    assert path.read_text().splitlines() == ["id;nombre", "1;Concierto", "2;Teatro"]
+
+
+def test_append_row_csv_recorta_media_fila(datos):
+    path = datos / "clientes.csv"
+    path.write_text("id;nombre;email;fecha_alta;activo\n1;Ana;ana@gmail.com;2024-01-01;1\n2;Luis;lu")
+    persistencia.append_row_csv(str(path), comun.CABECERA_CLIENTES, [2, "Luis", "luis@gmail.com", "2024-01-02", 1])
+    assert path.read_text().splitlines()[1:] == [
+        "1;Ana;ana@gmail.com;2024-01-01;1",
+        "2;Luis;luis@gmail.com;2024-01-02;1",
+    ]